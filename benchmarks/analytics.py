@@ -0,0 +1,109 @@
+import os
+import statistics
+import sys
+import time
+import warnings
+from datetime import date
+
+# Occupancy analytics over 100k billboards booked back to back, with gaps, for five years.
+#   python benchmarks/analytics.py
+# Builds the snapshot from synthetic columns (what the service loads from the database) and
+# times the queries the API allows (ANALYTICS_MAX_ROWS) over the whole five years, cold (the
+# first query of a group_by builds its groups and running totals) and warm.
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from src.persistence.occupancy import OccupancySnapshot, period_starts, to_day  # noqa: E402
+
+BILLBOARDS = 100_000
+PER_LOCATION = 10
+CITIES = 500
+STATES = 50
+COUNTRIES = 5
+BOOKINGS_PER_BILLBOARD = 60
+FIRST_DAY = date(2026, 1, 1)
+LAST_DAY = date(2030, 12, 31)
+QUERIES = [
+    ("all", "day"),
+    ("country", "week"),
+    ("state", "week"),
+    ("city", "month"),
+    ("city", "quarter"),
+    ("location", "year"),
+    ("billboard", "total"),
+]
+
+
+def synthetic_snapshot(rng):
+    billboard_rows = [
+        (
+            f"bill_{n:06d}",
+            f"loc_{n // PER_LOCATION:05d}",
+            f"C{n % COUNTRIES}",
+            f"S{n % STATES}",
+            f"City {n % CITIES}",
+            float(rng.integers(20, 500)),
+        )
+        for n in range(BILLBOARDS)
+    ]
+    # Each billboard alternates a gap of 0-30 days with a booking of 7-30 days, so its bookings
+    # never overlap; those starting after the last day are dropped.
+    gaps = rng.integers(0, 31, size=(BILLBOARDS, BOOKINGS_PER_BILLBOARD))
+    lengths = rng.integers(7, 31, size=(BILLBOARDS, BOOKINGS_PER_BILLBOARD))
+    ends = to_day(FIRST_DAY) + np.cumsum(gaps + lengths, axis=1)
+    starts = ends - lengths
+    kept = starts <= to_day(LAST_DAY)
+    billboard_ids = np.repeat(
+        np.array([row[0] for row in billboard_rows], dtype=object), BOOKINGS_PER_BILLBOARD
+    )[kept.ravel()]
+    started = time.perf_counter()
+    snapshot = OccupancySnapshot.build(
+        None, billboard_rows, billboard_ids.tolist(), starts[kept].tolist(), ends[kept].tolist()
+    )
+    return snapshot, time.perf_counter() - started
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main():
+    rng = np.random.default_rng(18)
+    snapshot, elapsed = synthetic_snapshot(rng)
+    size = sum(
+        column.nbytes
+        for column in (
+            snapshot.booking_billboards,
+            snapshot.booking_starts,
+            snapshot.booking_ends,
+            snapshot.booking_prices,
+        )
+    )
+    print(
+        f"{BILLBOARDS:,} billboards, {len(snapshot.booking_starts):,} bookings "
+        f"{FIRST_DAY}..{LAST_DAY}: snapshot built in {elapsed:.2f}s, "
+        f"booking columns {size / 2**20:.0f} MiB"
+    )
+    for group_by, period in QUERIES:
+        periods = len(period_starts(FIRST_DAY, LAST_DAY, period))
+        started = time.perf_counter()
+        rows = snapshot.occupancy(group_by, period, FIRST_DAY, LAST_DAY)
+        cold = time.perf_counter() - started
+        warm = timed(lambda: snapshot.occupancy(group_by, period, FIRST_DAY, LAST_DAY), 5)
+        path = "running totals" if snapshot._running_total(group_by) is not None else "expanded"
+        print(
+            f"{group_by}/{period}: {len(rows):,} rows ({snapshot.group_count(group_by):,} groups "
+            f"x {periods:,} periods, {path}): cold {cold * 1e3:.0f} ms, warm {warm * 1e3:.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    warnings.simplefilter("ignore")
+    main()
@@ -0,0 +1,187 @@
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+import warnings
+from datetime import date, timedelta
+
+# Availability index against the SQL path at 10k campaigns x 10k billboards x 1M bookings.
+#   python benchmarks/availability_index.py
+# prints the in-memory numbers; with BENCH_DATABASE_URL=postgresql+asyncpg://... it also times
+# the available billboards query both ways and a reload from that database, after seeding it
+# unless it already holds the data (its tables are dropped and recreated).
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.persistence.availability_index import AvailabilityIndex  # noqa: E402
+
+CAMPAIGNS = 10_000
+BILLBOARDS = 10_000
+PER_CAMPAIGN = 100
+FIRST_DAY = date(2030, 1, 1)
+
+
+def synthetic_bookings():
+    # Campaign c books the 100 billboards of group c // 100 for a week, every other week from a
+    # day that depends on the group: bookings of a billboard never overlap, and about half the
+    # billboards are free on any day of the first four years.
+    for campaign in range(CAMPAIGNS):
+        group, slot = divmod(campaign, PER_CAMPAIGN)
+        start = FIRST_DAY + timedelta(days=group % 14, weeks=2 * slot)
+        for offset in range(PER_CAMPAIGN):
+            yield (
+                f"bill_{group * PER_CAMPAIGN + offset}",
+                f"cam_{campaign}",
+                start,
+                start + timedelta(days=6),
+            )
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def random_period(rng):
+    start = FIRST_DAY + timedelta(days=rng.randrange(1400))
+    return start, start + timedelta(days=rng.randrange(0, 7))
+
+
+def in_memory():
+    bookings = list(synthetic_bookings())
+    index = AvailabilityIndex()
+    started = time.perf_counter()
+    index.replace(bookings)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    measured = AvailabilityIndex()
+    measured.replace(bookings)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del measured
+    print(f"replace, {len(bookings):,} bookings: {elapsed:.2f}s, {memory / 2**20:.0f} MiB")
+
+    rng = random.Random(1)
+    queries = [(f"bill_{rng.randrange(BILLBOARDS)}", *random_period(rng)) for _ in range(100_000)]
+    started = time.perf_counter()
+    for billboard_id, start, end in queries:
+        index.is_free(billboard_id, start, end)
+    print(f"is_free: {(time.perf_counter() - started) / len(queries) * 1e6:.2f} us per billboard")
+    seconds = timed(lambda: index.busy_billboards(*random_period(rng)), 20)
+    print(f"busy_billboards: {seconds * 1e3:.1f} ms")
+
+    # A reload with 10k updates made while it read: the replay is part of the swap.
+    print(f"replace again: {timed(lambda: index.replace(bookings), 3):.2f}s")
+    since = index.begin_replace()
+    for n in range(10_000):
+        index.add(f"bill_{n}", f"cam_new_{n}", date(2035, 1, 1), date(2035, 1, 7))
+    started = time.perf_counter()
+    index.replace(bookings, since)
+    elapsed = time.perf_counter() - started
+    index.end_replace()
+    bookings = index.stats()["bookings"]
+    print(f"replace with 10,000 updates to replay: {elapsed:.2f}s, {bookings:,} bookings")
+
+
+async def against_database(url):
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlmodel import SQLModel
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    from src.persistence import models  # noqa: F401
+    from src.persistence.availability_index import availability_index
+    from src.persistence.repositories import CampaignBillboardRepository
+
+    engine = create_async_engine(url)
+    async with engine.begin() as connection:
+        seeded = await connection.scalar(
+            text("SELECT to_regclass('campaign_billboards') IS NOT NULL")
+        )
+        if seeded:
+            seeded = (
+                await connection.scalar(text("SELECT count(*) FROM campaign_billboards"))
+                == CAMPAIGNS * PER_CAMPAIGN
+            )
+        if not seeded:
+            await connection.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+            await connection.run_sync(SQLModel.metadata.drop_all)
+            await connection.run_sync(SQLModel.metadata.create_all)
+    if not seeded:
+        await seed(url)
+
+    rng = random.Random(2)
+    periods = [random_period(rng) for _ in range(20)]
+    async with AsyncSession(engine) as session:
+        repository = CampaignBillboardRepository(session)
+        for label, loaded in (("SQL", False), ("index", True)):
+            if loaded:
+                started = time.perf_counter()
+                since = availability_index.begin_replace()
+                availability_index.replace(await repository.get_active_bookings(), since)
+                availability_index.end_replace()
+                print(f"reload from the database: {time.perf_counter() - started:.2f}s")
+            availability_index.loaded = loaded
+            samples, rows = [], 0
+            for period in periods:
+                started = time.perf_counter()
+                rows += len(await repository.get_available_billboard_rows(*period))
+                samples.append(time.perf_counter() - started)
+            print(
+                f"available billboards, {label}: {statistics.median(samples) * 1e3:.1f} ms median, "
+                f"{rows / len(periods):,.0f} rows on average"
+            )
+    await engine.dispose()
+
+
+async def seed(url):
+    import asyncpg
+
+    started = time.perf_counter()
+    connection = await asyncpg.connect(url.replace("postgresql+asyncpg", "postgresql"))
+    await connection.copy_records_to_table(
+        "locations",
+        records=[("loc_0", "1 Main St", "Springfield", "IL", "US", 39.78, -89.65, False)],
+        columns=["id", "address", "city", "state", "country_code", "lat", "lng", "is_deleted"],
+    )
+    await connection.copy_records_to_table(
+        "billboards",
+        records=[(f"bill_{n}", "loc_0", 10.0, 5.0, 100.0, False) for n in range(BILLBOARDS)],
+        columns=["id", "location_id", "width_mt", "height_mt", "dollars_per_day", "is_deleted"],
+    )
+    campaigns = {}
+    for billboard_id, campaign_id, start, end in synthetic_bookings():
+        campaigns[campaign_id] = (start, end)
+    await connection.copy_records_to_table(
+        "campaigns",
+        records=[
+            (campaign_id, campaign_id, start, end, False)
+            for campaign_id, (start, end) in campaigns.items()
+        ],
+        columns=["id", "name", "start_date", "end_date", "is_deleted"],
+    )
+    await connection.copy_records_to_table(
+        "campaign_billboards",
+        records=(
+            (campaign_id, billboard_id, asyncpg.Range(start, end + timedelta(days=1)), True)
+            for billboard_id, campaign_id, start, end in synthetic_bookings()
+        ),
+        columns=["campaign_id", "billboard_id", "booking_period", "is_active"],
+    )
+    await connection.execute("ANALYZE")
+    await connection.close()
+    print(f"seeded the database in {time.perf_counter() - started:.0f}s")
+
+
+if __name__ == "__main__":
+    warnings.simplefilter("ignore")
+    in_memory()
+    if os.getenv("BENCH_DATABASE_URL"):
+        asyncio.run(against_database(os.environ["BENCH_DATABASE_URL"]))
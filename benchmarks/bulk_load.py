@@ -0,0 +1,84 @@
+import asyncio
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+# POST /locations/bulk_load over a 1M-row CSV, one row in 1,000 invalid: rows per second, and
+# the memory the load holds at its peak, which should stay flat however long the file is.
+#   BENCH_DATABASE_URL=postgresql+asyncpg://... python benchmarks/bulk_load.py
+# Creates the tables if missing and deletes the rows it loaded. Runs the load twice: once for
+# the time, once under tracemalloc (which slows it down) for the peak of Python allocations.
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+from sqlmodel.ext.asyncio.session import AsyncSession  # noqa: E402
+
+from src.persistence import models  # noqa: E402, F401
+from src.services.bulk_import import bulk_batch_size  # noqa: E402
+from src.services.locations import LocationService  # noqa: E402
+
+ROWS = 1_000_000
+CITY = "Bulk load benchmark"
+
+
+def write_csv(path):
+    with open(path, "w") as csv_file:
+        csv_file.write("address,city,state,country_code,lat,lng\n")
+        for n in range(ROWS):
+            lat = "x" if n % 1000 == 999 else f"{25 + (n % 2400) / 100:.2f}"
+            csv_file.write(f"{n} Main St,{CITY},IL,US,{lat},{-124 + (n % 5700) / 100:.2f}\n")
+
+
+async def load(engine, path):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        with open(path, "rb") as csv_file:
+            started = time.perf_counter()
+            report = await LocationService(session).bulk_load_locations_from_csv(csv_file)
+            elapsed = time.perf_counter() - started
+    async with engine.begin() as connection:
+        await connection.execute(text("DELETE FROM locations WHERE city = :city"), {"city": CITY})
+    return report, elapsed
+
+
+async def main(url, path):
+    engine = create_async_engine(url)
+    async with engine.begin() as connection:
+        await connection.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+        await connection.run_sync(SQLModel.metadata.create_all)
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report, elapsed = await load(engine, path)
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(
+        f"{report['rows']:,} rows, {report['created']:,} created, {report['error_count']:,} "
+        f"errors, batches of {bulk_batch_size('locations'):,}: {elapsed:.1f}s, "
+        f"{report['rows'] / elapsed:,.0f} rows/s"
+    )
+    print(f"peak RSS grew by {(rss_after - rss_before) / 1024:.0f} MiB")
+
+    tracemalloc.start()
+    _, elapsed = await load(engine, path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"peak Python allocations: {peak / 2**20:.1f} MiB (traced run: {elapsed:.1f}s)")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    warnings.simplefilter("ignore")
+    if not os.getenv("BENCH_DATABASE_URL"):
+        sys.exit("Set BENCH_DATABASE_URL=postgresql+asyncpg://... to a database this may write to")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "locations.csv")
+        started = time.perf_counter()
+        write_csv(path)
+        size = os.path.getsize(path) / 2**20
+        print(f"wrote {ROWS:,} rows ({size:.0f} MiB) in {time.perf_counter() - started:.1f}s")
+        asyncio.run(main(os.environ["BENCH_DATABASE_URL"], path))
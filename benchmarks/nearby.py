@@ -0,0 +1,148 @@
+import asyncio
+import os
+import statistics
+import sys
+import time
+import warnings
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Nearby search over 1M locations.
+#   python benchmarks/nearby.py
+# times nearest_within over in-memory candidates; with BENCH_DATABASE_URL=postgresql+asyncpg://...
+# it also times /locations/nearby end to end through LocationService, after seeding that database
+# unless it already holds the data (its tables are dropped and recreated).
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.geo import nearest_within  # noqa: E402
+
+LOCATIONS = 1_000_000
+# Half the locations spread over the contiguous US, half around these cities.
+CITIES = [
+    (40.71, -74.01),
+    (34.05, -118.24),
+    (41.88, -87.63),
+    (29.76, -95.37),
+    (33.45, -112.07),
+    (39.95, -75.17),
+    (47.61, -122.33),
+    (25.76, -80.19),
+]
+RADII_KM = (1, 10, 50, 200)
+
+
+def synthetic_locations():
+    rng = np.random.default_rng(8)
+    spread = LOCATIONS // 2
+    lats = [rng.uniform(25, 49, spread)]
+    lngs = [rng.uniform(-124, -67, spread)]
+    per_city = (LOCATIONS - spread) // len(CITIES)
+    for lat, lng in CITIES:
+        lats.append(rng.normal(lat, 0.3, per_city))
+        lngs.append(rng.normal(lng, 0.3, per_city))
+    lats, lngs = np.concatenate(lats), np.concatenate(lngs)
+    ids = [f"loc_{n:07d}" for n in range(lats.size)]
+    return ids, lats, lngs
+
+
+def timed(fn, repeat=5):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), result
+
+
+def in_memory(ids, lats, lngs):
+    # The worst case: every location is a candidate, as if the bounding box held them all.
+    lat, lng = CITIES[0]
+    for radius in RADII_KM:
+        for offset in (0, 10_000):
+            seconds, (_, _, total) = timed(
+                lambda: nearest_within(lat, lng, radius, lats, lngs, ids, offset, 100)
+            )
+            print(
+                f"nearest_within, 1M candidates, {radius} km, offset {offset}: "
+                f"{seconds * 1e3:.1f} ms, {total:,} in range"
+            )
+
+
+async def against_database(url, ids, lats, lngs):
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlmodel import SQLModel
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    from src.persistence import models  # noqa: F401
+    from src.services.locations import LocationService
+
+    engine = create_async_engine(url)
+    async with engine.begin() as connection:
+        seeded = await connection.scalar(text("SELECT to_regclass('locations') IS NOT NULL"))
+        if seeded:
+            seeded = await connection.scalar(text("SELECT count(*) FROM locations")) == LOCATIONS
+        if not seeded:
+            await connection.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+            await connection.run_sync(SQLModel.metadata.drop_all)
+            await connection.run_sync(SQLModel.metadata.create_all)
+    if not seeded:
+        await seed(url, ids, lats, lngs)
+
+    lat, lng = CITIES[0]
+    async with AsyncSession(engine) as session:
+        service = LocationService(session)
+        for radius in RADII_KM:
+            samples = []
+            for _ in range(5):
+                started = time.perf_counter()
+                _, total = await service.get_nearby_locations(lat, lng, radius, 0, 100)
+                samples.append(time.perf_counter() - started)
+            median = statistics.median(samples)
+            print(
+                f"/locations/nearby, {radius} km: {median * 1e3:.1f} ms median, {total:,} in range"
+            )
+    await engine.dispose()
+
+
+async def seed(url, ids, lats, lngs):
+    import asyncpg
+
+    started = time.perf_counter()
+    created_at = datetime.now(timezone.utc)
+    connection = await asyncpg.connect(url.replace("postgresql+asyncpg", "postgresql"))
+    await connection.copy_records_to_table(
+        "locations",
+        records=(
+            (id, "1 Main St", "Springfield", "IL", "US", float(lat), float(lng), created_at, False)
+            for id, lat, lng in zip(ids, lats, lngs)
+        ),
+        columns=[
+            "id",
+            "address",
+            "city",
+            "state",
+            "country_code",
+            "lat",
+            "lng",
+            "created_at",
+            "is_deleted",
+        ],
+    )
+    # As created by the location coordinates migration.
+    await connection.execute(
+        "CREATE INDEX ix_locations_lat_lng ON locations (lat, lng) WHERE is_deleted = false"
+    )
+    await connection.execute("ANALYZE")
+    await connection.close()
+    print(f"seeded the database in {time.perf_counter() - started:.0f}s")
+
+
+if __name__ == "__main__":
+    warnings.simplefilter("ignore")
+    ids, lats, lngs = synthetic_locations()
+    in_memory(ids, lats, lngs)
+    if os.getenv("BENCH_DATABASE_URL"):
+        asyncio.run(against_database(os.environ["BENCH_DATABASE_URL"], ids, lats, lngs))
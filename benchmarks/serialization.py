@@ -0,0 +1,226 @@
+import asyncio
+import os
+import statistics
+import sys
+import time
+import warnings
+from datetime import date, datetime, timezone
+from typing import Any, Dict
+
+# The list endpoints' bodies built as before (Pydantic models per item, validated and encoded by
+# FastAPI under response_model) against the row path (dicts from rows, encoded by orjson).
+#   python benchmarks/serialization.py
+# Both start from rows already fetched and go through a FastAPI route in process, so only building
+# and encoding the body is timed. Each case also checks that the two bodies are the same bytes.
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+
+from src.domain.models.billboards import Billboard, BillboardLocationInfo  # noqa: E402
+from src.domain.models.campaigns import Campaign  # noqa: E402
+from src.domain.models.common import HATEOASLinkObject, HATEOASLinks  # noqa: E402
+from src.services.billboards import BILLBOARDS_HREF, LOCATIONS_HREF, billboard_row  # noqa: E402
+from src.services.campaigns import CampaignService  # noqa: E402
+from src.utils.serialization import json_response, link, links  # noqa: E402
+
+BILLBOARDS = 10_000
+CAMPAIGNS = 1_000
+BILLBOARDS_PER_CAMPAIGN = 10
+REPEAT = 10
+
+
+def billboard_rows(count):
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    return [
+        (
+            f"bill_{n:08d}",
+            f"loc_{n // 4:08d}",
+            10.0 + n % 7,
+            5.5,
+            100.25 + n % 100,
+            created_at,
+            f"{n} Main St",
+            "Springfield",
+            "IL",
+            "US",
+            39.78 + n / 1e6,
+            -89.65 - n / 1e6,
+        )
+        for n in range(count)
+    ]
+
+
+def billboard_model(row, actions):
+    id, location_id, width, height, price, created_at, *location = row
+    address, city, state, country_code, lat, lng = location
+    return Billboard(
+        id=id,
+        location_id=location_id,
+        width_mt=width,
+        height_mt=height,
+        dollars_per_day=price,
+        created_at=created_at,
+        location=BillboardLocationInfo(
+            address=address, city=city, state=state, country_code=country_code, lat=lat, lng=lng
+        ),
+        links=HATEOASLinks(
+            self=HATEOASLinkObject(name="self", method="GET", href=f"/api/v1/billboards/{id}"),
+            actions=actions,
+            related=[
+                HATEOASLinkObject(
+                    name="location", method="GET", href=f"/api/v1/locations/{location_id}"
+                )
+            ],
+        ),
+    )
+
+
+def billboards_before(rows):
+    return [
+        billboard_model(
+            row,
+            [
+                HATEOASLinkObject(
+                    name="update", method="PATCH", href=f"/api/v1/billboards/{row[0]}"
+                ),
+                HATEOASLinkObject(
+                    name="delete", method="DELETE", href=f"/api/v1/billboards/{row[0]}"
+                ),
+            ],
+        )
+        for row in rows
+    ]
+
+
+def billboards_after(rows):
+    return [
+        billboard_row(
+            row,
+            links(
+                link("self", "GET", BILLBOARDS_HREF + row[0]),
+                actions=[
+                    link("update", "PATCH", BILLBOARDS_HREF + row[0]),
+                    link("delete", "DELETE", BILLBOARDS_HREF + row[0]),
+                ],
+                related=[link("location", "GET", LOCATIONS_HREF + row[1])],
+            ),
+        )
+        for row in rows
+    ]
+
+
+def campaign_rows(count):
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    return [
+        (f"camp_{n:08d}", f"Campaign {n}", date(2030, 1, 1), date(2030, 1, 31), created_at)
+        for n in range(count)
+    ]
+
+
+def campaigns_before(rows, billboards):
+    campaigns = []
+    for id, name, start_date, end_date, created_at in rows:
+        models = [
+            billboard_model(
+                row,
+                [
+                    HATEOASLinkObject(
+                        name="remove_from_campaign",
+                        method="POST",
+                        href=f"/api/v1/campaigns/{id}/remove/{row[0]}",
+                    )
+                ],
+            )
+            for row in billboards
+        ]
+        days = (end_date - start_date).days + 1
+        campaigns.append(
+            Campaign(
+                id=id,
+                name=name,
+                start_date=start_date,
+                end_date=end_date,
+                created_at=created_at,
+                billboards=models,
+                total_dollar_amount=sum(row[4] * days for row in billboards),
+                links=HATEOASLinks(
+                    self=HATEOASLinkObject(
+                        name="self", method="GET", href=f"/api/v1/campaigns/{id}"
+                    ),
+                    actions=[
+                        HATEOASLinkObject(
+                            name="search_billboards",
+                            method="GET",
+                            href=f"/api/v1/availability/{id}",
+                        ),
+                        HATEOASLinkObject(
+                            name="update", method="PATCH", href=f"/api/v1/campaigns/{id}"
+                        ),
+                        HATEOASLinkObject(
+                            name="delete", method="DELETE", href=f"/api/v1/campaigns/{id}"
+                        ),
+                    ],
+                ),
+            )
+        )
+    return campaigns
+
+
+def campaigns_after(rows, billboards):
+    service = CampaignService(None)
+    return [service._to_row(row, billboards) for row in rows]
+
+
+def app_for(before, after) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/before", response_model=Dict[str, Any])
+    async def get_before():
+        return {"data": before()}
+
+    @app.get("/after", response_model=Dict[str, Any])
+    async def get_after():
+        return json_response({"data": after()})
+
+    return app
+
+
+async def compare(label, before, after):
+    transport = httpx.ASGITransport(app=app_for(before, after))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        bodies, medians = {}, {}
+        for path in ("/before", "/after"):
+            samples = []
+            for _ in range(REPEAT):
+                started = time.perf_counter()
+                response = await http.get(path)
+                samples.append(time.perf_counter() - started)
+            bodies[path], medians[path] = response.content, statistics.median(samples)
+    same = "same bytes" if bodies["/before"] == bodies["/after"] else "BODIES DIFFER"
+    print(
+        f"{label}: {medians['/before'] * 1e3:.0f} -> {medians['/after'] * 1e3:.0f} ms median "
+        f"({medians['/before'] / medians['/after']:.1f}x), {len(bodies['/after']):,} bytes, {same}"
+    )
+
+
+async def main():
+    billboards = billboard_rows(BILLBOARDS)
+    await compare(
+        f"{BILLBOARDS:,} billboards",
+        lambda: billboards_before(billboards),
+        lambda: billboards_after(billboards),
+    )
+    campaigns = campaign_rows(CAMPAIGNS)
+    booked = billboards[:BILLBOARDS_PER_CAMPAIGN]
+    await compare(
+        f"{CAMPAIGNS:,} campaigns of {BILLBOARDS_PER_CAMPAIGN} billboards",
+        lambda: campaigns_before(campaigns, booked),
+        lambda: campaigns_after(campaigns, booked),
+    )
+
+
+if __name__ == "__main__":
+    warnings.simplefilter("ignore")
+    asyncio.run(main())
@@ -0,0 +1,181 @@
+import asyncio
+import os
+import statistics
+import sys
+import time
+import warnings
+from collections import Counter
+
+# Repository writes as they were (commit and refresh per write, delete reading the row first)
+# against the unit of work, in round trips and latency.
+#   BENCH_DATABASE_URL=postgresql+asyncpg://... python benchmarks/writes.py
+# Creates the tables if missing and deletes the rows it wrote. Round trips are what a remote
+# database (Supabase) charges for: each one costs the network latency on top of these numbers.
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, text  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+from sqlmodel.ext.asyncio.session import AsyncSession  # noqa: E402
+
+from src.persistence.models import Billboard, Location  # noqa: E402
+from src.persistence.repositories import BillboardRepository, LocationRepository  # noqa: E402
+from src.persistence.transactions import unit_of_work  # noqa: E402
+from src.utils.uuid import generate_prefixed_uuid  # noqa: E402
+
+REPEAT = 200
+BILLBOARDS_PER_LOCATION = 10
+
+
+def new_location() -> Location:
+    return Location(
+        id=generate_prefixed_uuid("loc"),
+        address="1 Main St",
+        city="Springfield",
+        state="IL",
+        country_code="US",
+        lat=39.78,
+        lng=-89.65,
+    )
+
+
+def new_billboard(location_id: str) -> Billboard:
+    return Billboard(
+        id=generate_prefixed_uuid("bill"),
+        location_id=location_id,
+        width_mt=10,
+        height_mt=5,
+        dollars_per_day=100,
+    )
+
+
+# As BaseRepository wrote before the unit of work.
+async def create_before(session, obj):
+    session.add(obj)
+    await session.commit()
+    await session.refresh(obj)
+    return obj
+
+
+async def update_before(session, obj):
+    session.add(obj)
+    await session.commit()
+    await session.refresh(obj)
+    return obj
+
+
+async def delete_before(session, id):
+    obj = await LocationRepository(Location, session).get(id)
+    if obj:
+        obj.is_deleted = True
+        session.add(obj)
+        await session.commit()
+
+
+async def run(engine, round_trips, expire_on_commit, operation):
+    # Median latency of operation, each time on a new session, and its round trips.
+    samples = []
+    round_trips.clear()
+    for _ in range(REPEAT):
+        async with AsyncSession(engine, expire_on_commit=expire_on_commit) as session:
+            started = time.perf_counter()
+            await operation(session)
+            samples.append(time.perf_counter() - started)
+    return statistics.median(samples), sum(round_trips.values()) / REPEAT
+
+
+async def main(url):
+    engine = create_async_engine(url, pool_size=1)
+    round_trips = Counter()
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def on_statement(*args):
+        round_trips["statements"] += 1
+
+    # asyncpg sends BEGIN at the first statement, COMMIT and ROLLBACK when asked.
+    for name in ("begin", "commit", "rollback"):
+        event.listen(engine.sync_engine, name, lambda *args, name=name: round_trips.update([name]))
+
+    async with engine.begin() as connection:
+        await connection.run_sync(SQLModel.metadata.create_all)
+    written = []
+
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        target = await LocationRepository(Location, session).create(new_location())
+        written.append(target.id)
+
+    async def create_after(session):
+        written.append((await LocationRepository(Location, session).create(new_location())).id)
+
+    async def create_old(session):
+        written.append((await create_before(session, new_location())).id)
+
+    async def update_after(session):
+        await LocationRepository(Location, session).update_values(
+            target.id, {"address": "2 Main St"}
+        )
+
+    async def update_old(session):
+        obj = await LocationRepository(Location, session).get(target.id)
+        obj.address = "2 Main St"
+        await update_before(session, obj)
+
+    async def delete_after(session):
+        location = await LocationRepository(Location, session).create(new_location())
+        written.append(location.id)
+        await LocationRepository(Location, session).delete(location.id)
+
+    async def delete_old(session):
+        location = await create_before(session, new_location())
+        written.append(location.id)
+        await delete_before(session, location.id)
+
+    async def location_with_billboards_after(session):
+        async with unit_of_work(session):
+            location = await LocationRepository(Location, session).create(new_location())
+            await BillboardRepository(Billboard, session).create_many(
+                [new_billboard(location.id) for _ in range(BILLBOARDS_PER_LOCATION)]
+            )
+        written.append(location.id)
+
+    async def location_with_billboards_old(session):
+        location_id = (await create_before(session, new_location())).id
+        for _ in range(BILLBOARDS_PER_LOCATION):
+            await create_before(session, new_billboard(location_id))
+        written.append(location_id)
+
+    # Deleting includes creating the location it deletes, both ways.
+    cases = [
+        ("create a location", create_old, create_after),
+        ("update a location", update_old, update_after),
+        ("create and delete a location", delete_old, delete_after),
+        (
+            f"create a location with {BILLBOARDS_PER_LOCATION} billboards",
+            location_with_billboards_old,
+            location_with_billboards_after,
+        ),
+    ]
+    for label, before, after in cases:
+        before_seconds, before_trips = await run(engine, round_trips, True, before)
+        after_seconds, after_trips = await run(engine, round_trips, False, after)
+        print(
+            f"{label}: {before_trips:.0f} -> {after_trips:.0f} round trips, "
+            f"{before_seconds * 1e3:.2f} -> {after_seconds * 1e3:.2f} ms median"
+        )
+
+    async with engine.begin() as connection:
+        await connection.execute(
+            text("DELETE FROM billboards WHERE location_id = ANY(:ids)"), {"ids": written}
+        )
+        await connection.execute(
+            text("DELETE FROM locations WHERE id = ANY(:ids)"), {"ids": written}
+        )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    warnings.simplefilter("ignore")
+    if not os.getenv("BENCH_DATABASE_URL"):
+        sys.exit("Set BENCH_DATABASE_URL=postgresql+asyncpg://... to a database this may write to")
+    asyncio.run(main(os.environ["BENCH_DATABASE_URL"]))
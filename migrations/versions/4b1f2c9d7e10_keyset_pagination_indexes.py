@@ -0,0 +1,37 @@
+"""Keyset pagination indexes
+
+Revision ID: 4b1f2c9d7e10
+Revises: cee3426cdd74
+Create Date: 2025-07-14 10:12:43.128907
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "4b1f2c9d7e10"
+down_revision: Union[str, Sequence[str], None] = "cee3426cdd74"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # List endpoints page by (created_at, id) over non deleted rows only.
+    for table in ("locations", "billboards", "campaigns"):
+        op.create_index(
+            f"ix_{table}_created_at_id",
+            table,
+            ["created_at", "id"],
+            unique=False,
+            postgresql_where=sa.text("is_deleted = false"),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ("campaigns", "billboards", "locations"):
+        op.drop_index(f"ix_{table}_created_at_id", table_name=table)
@@ -0,0 +1,35 @@
+"""Location coordinates index
+
+Revision ID: 7c3e5a1b9d42
+Revises: 4b1f2c9d7e10
+Create Date: 2025-07-16 09:41:05.502311
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7c3e5a1b9d42"
+down_revision: Union[str, Sequence[str], None] = "4b1f2c9d7e10"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Serves the bounding-box prefilter of the nearby searches.
+    op.create_index(
+        "ix_locations_lat_lng",
+        "locations",
+        ["lat", "lng"],
+        unique=False,
+        postgresql_where=sa.text("is_deleted = false"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_locations_lat_lng", table_name="locations")
@@ -0,0 +1,90 @@
+"""Booking period exclusion constraint
+
+Revision ID: c4a8e2f1d6b7
+Revises: 9e2d4f6a8b13
+Create Date: 2025-07-22 10:12:44.318207
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "c4a8e2f1d6b7"
+down_revision: Union[str, Sequence[str], None] = "9e2d4f6a8b13"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Lets a GiST index hold the billboard_id equality next to the range overlap.
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    op.add_column(
+        "campaign_billboards", sa.Column("booking_period", postgresql.DATERANGE(), nullable=True)
+    )
+    op.add_column(
+        "campaign_billboards",
+        sa.Column("is_active", sa.Boolean(), server_default=sa.true(), nullable=False),
+    )
+    op.execute(
+        """
+        UPDATE campaign_billboards AS cb
+        SET booking_period = daterange(c.start_date, c.end_date, '[]'), is_active = NOT c.is_deleted
+        FROM campaigns AS c
+        WHERE c.id = cb.campaign_id
+        """
+    )
+    overlaps = (
+        op.get_bind()
+        .execute(
+            sa.text(
+                """
+        SELECT a.billboard_id, a.campaign_id, b.campaign_id
+        FROM campaign_billboards AS a
+        JOIN campaign_billboards AS b
+          ON b.billboard_id = a.billboard_id AND b.campaign_id > a.campaign_id
+         AND a.booking_period && b.booking_period
+        WHERE a.is_active AND b.is_active
+        LIMIT 20
+        """
+            )
+        )
+        .all()
+    )
+    if overlaps:
+        listed = ", ".join(
+            f"{billboard} in {first} and {second}" for billboard, first, second in overlaps
+        )
+        raise RuntimeError(f"Overlapping bookings must be removed before this migration: {listed}")
+    op.alter_column("campaign_billboards", "booking_period", nullable=False)
+    # Its GiST index also serves every "bookings of billboard X overlapping this period" probe.
+    op.execute(
+        """
+        ALTER TABLE campaign_billboards
+        ADD CONSTRAINT ex_campaign_billboards_no_overlap
+        EXCLUDE USING gist (billboard_id WITH =, booking_period WITH &&) WHERE (is_active)
+        """
+    )
+    # "Everything booked in this period" scans, e.g. the available billboards search, only
+    # constrain the range; led by billboard_id, the constraint's index serves those poorly.
+    op.create_index(
+        "ix_campaign_billboards_active_period",
+        "campaign_billboards",
+        ["booking_period"],
+        unique=False,
+        postgresql_using="gist",
+        postgresql_include=["billboard_id"],
+        postgresql_where=sa.text("is_active"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_campaign_billboards_active_period", table_name="campaign_billboards")
+    op.drop_constraint("ex_campaign_billboards_no_overlap", "campaign_billboards")
+    op.drop_column("campaign_billboards", "is_active")
+    op.drop_column("campaign_billboards", "booking_period")
@@ -0,0 +1,259 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from dotenv import load_dotenv
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from redis import asyncio as aioredis
+
+from src.utils.ttl_cache import TTLCache
+
+load_dotenv()
+
+# What each resource's GET responses embed; a write to any of them makes those entries stale.
+RESOURCES = ("locations", "billboards", "campaigns", "bookings")
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag")
+
+    def __init__(self, body: bytes, etag: str):
+        self.body = body
+        self.etag = etag
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        maxsize: int,
+        default_ttl: float,
+        ttls: Dict[str, float],
+        redis_url: Optional[str] = None,
+    ):
+        self.default_ttl = default_ttl
+        self.ttls = ttls
+        self.local: TTLCache[CachedResponse] = TTLCache(maxsize, max([default_ttl, *ttls.values()]))
+        self.redis = aioredis.from_url(redis_url) if redis_url else None
+        self.prefix = "advertising-api:cache"
+        self._generations: Dict[str, int] = defaultdict(int)
+        # When this worker last saw each resource change: its own writes, or (with Redis) a
+        # shared generation that moved since the previous read.
+        self._changed_at: Dict[str, float] = {}
+        self._seen_generations: Dict[str, int] = {}
+        self.stats: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"hits": 0, "misses": 0, "not_modified": 0}
+        )
+
+    def ttl_for(self, resource: str) -> float:
+        return self.ttls.get(resource, self.default_ttl)
+
+    async def key_for(self, request: Request, resources: Tuple[str, ...]) -> str:
+        query = urlencode(sorted(request.query_params.multi_items()))
+        generations = ".".join(
+            str(generation) for generation in await self._get_generations(resources)
+        )
+        return f"{request.url.path}?{query}#{generations}"
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self.local.get(key)
+        if entry is not None or self.redis is None:
+            return entry
+        try:
+            raw = await self.redis.get(f"{self.prefix}:entry:{key}")
+        except Exception as exc:
+            logging.warning(f"Response cache Redis read failed: {exc}")
+            return None
+        if raw is None:
+            return None
+        etag, _, body = raw.partition(b"\n")
+        entry = CachedResponse(body, etag.decode("ascii"))
+        self.local.set(key, entry)
+        return entry
+
+    async def set(self, key: str, entry: CachedResponse, ttl: float) -> None:
+        self.local.set(key, entry, ttl=ttl)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(
+                f"{self.prefix}:entry:{key}",
+                entry.etag.encode("ascii") + b"\n" + entry.body,
+                ex=max(1, int(ttl)),
+            )
+        except Exception as exc:
+            logging.warning(f"Response cache Redis write failed: {exc}")
+
+    async def invalidate(self, *resources: str) -> Optional[List[int]]:
+        # Entries are keyed on the generation of every resource they embed, so bumping a
+        # generation orphans exactly those entries; the LRU and Redis TTLs reclaim them.
+        # Returns the generations the bump produced, or None if Redis could not be reached.
+        for resource in resources:
+            self._generations[resource] += 1
+            self._changed_at[resource] = time.monotonic()
+        if self.redis is None:
+            return [self._generations[resource] for resource in resources]
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for resource in resources:
+                    pipe.incr(f"{self.prefix}:generation:{resource}")
+                return await pipe.execute()
+        except Exception as exc:
+            logging.warning(f"Response cache Redis invalidation failed: {exc}")
+            self.local.clear()
+            return None
+
+    async def _get_generations(self, resources: Tuple[str, ...], exact: bool = False) -> List[int]:
+        # exact: raise when Redis cannot be read, rather than fall back to this worker's own.
+        local = [self._generations[resource] for resource in resources]
+        if self.redis is None:
+            return local
+        try:
+            shared = await self.redis.mget(
+                [f"{self.prefix}:generation:{resource}" for resource in resources]
+            )
+        except Exception as exc:
+            if exact:
+                raise
+            logging.warning(f"Response cache Redis generation read failed: {exc}")
+            return local
+        generations = [int(value or 0) for value in shared]
+        for resource, generation in zip(resources, generations):
+            if self._seen_generations.setdefault(resource, generation) != generation:
+                self._seen_generations[resource] = generation
+                self._changed_at[resource] = time.monotonic()
+        return generations
+
+    def changed_within(self, resources: Tuple[str, ...], seconds: float) -> bool:
+        now = time.monotonic()
+        return any(
+            now - self._changed_at.get(resource, float("-inf")) < seconds for resource in resources
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        resources = {}
+        for resource, counts in self.stats.items():
+            lookups = counts["hits"] + counts["misses"]
+            resources[resource] = {
+                **counts,
+                "hit_rate": round(counts["hits"] / lookups, 4) if lookups else None,
+                "ttl_seconds": self.ttl_for(resource),
+            }
+        return {"entries": len(self.local), "redis": self.redis is not None, "resources": resources}
+
+
+def cache_enabled() -> bool:
+    return os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+def worker_count() -> int:
+    # Worker processes serving the app; uvicorn and gunicorn both take it from WEB_CONCURRENCY.
+    return int(os.getenv("WEB_CONCURRENCY", "1"))
+
+
+def cache_redis_url() -> Optional[str]:
+    # A write bumps its generations in the worker that made it and, through Redis, in the
+    # others. With several workers the shared REDIS_URL is used unless the cache has its own.
+    url = os.getenv("RESPONSE_CACHE_REDIS_URL")
+    if not url and worker_count() > 1:
+        url = os.getenv("REDIS_URL")
+    return url or None
+
+
+def check_cache_setup() -> None:
+    # Without Redis, another worker would keep serving what a write made stale until its TTL.
+    if cache_enabled() and response_cache.redis is None and worker_count() > 1:
+        raise RuntimeError(
+            "The response cache needs Redis with more than one worker: set "
+            "RESPONSE_CACHE_REDIS_URL or REDIS_URL, or RESPONSE_CACHE_ENABLED=false"
+        )
+
+
+def _load_ttls() -> Dict[str, float]:
+    return {
+        resource: float(os.environ[f"CACHE_TTL_{resource.upper()}"])
+        for resource in RESOURCES
+        if os.getenv(f"CACHE_TTL_{resource.upper()}")
+    }
+
+
+response_cache = ResponseCache(
+    maxsize=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048")),
+    default_ttl=float(os.getenv("CACHE_TTL_SECONDS", "60")),
+    ttls=_load_ttls(),
+    redis_url=cache_redis_url(),
+)
+
+
+async def invalidate_cache(*resources: str) -> Optional[List[int]]:
+    return await response_cache.invalidate(*resources)
+
+
+async def cache_generations(*resources: str, exact: bool = False) -> Tuple[int, ...]:
+    # Changes whenever any of the resources is written, in this worker or (with Redis) any other.
+    return tuple(await response_cache._get_generations(resources, exact))
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def _render(content: Any) -> bytes:
+    # Same encoding FastAPI's JSONResponse applies to a response_model=Dict[str, Any] result.
+    return json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def cached(*resources: str) -> Callable:
+    # Caches a GET handler's JSON body under its path and query string. The first resource
+    # picks the TTL and the stats bucket; all of them take part in invalidation.
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not cache_enabled():
+                return await func(*args, **kwargs)
+            request: Request = kwargs["request"]
+            stats = response_cache.stats[resources[0]]
+            key = await response_cache.key_for(request, resources)
+            entry = await response_cache.get(key)
+            if entry is None:
+                stats["misses"] += 1
+                result = await func(*args, **kwargs)
+                if isinstance(result, Response):
+                    if result.status_code != 200:
+                        return result
+                    body = bytes(result.body)
+                else:
+                    body = _render(result)
+                entry = CachedResponse(body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+                # A replica may not have replayed a write made just before; caching what it
+                # answered would serve the old rows under the new generation, to the writer too.
+                read_lag = getattr(request.state, "read_lag_seconds", 0)
+                if not read_lag or not response_cache.changed_within(resources, read_lag):
+                    await response_cache.set(key, entry, response_cache.ttl_for(resources[0]))
+            else:
+                stats["hits"] += 1
+            headers = {"ETag": entry.etag, "Cache-Control": "private, no-cache"}
+            if _etag_matches(request, entry.etag):
+                stats["not_modified"] += 1
+                return Response(status_code=304, headers=headers)
+            return Response(content=entry.body, media_type="application/json", headers=headers)
+
+        return wrapper
+
+    return decorator
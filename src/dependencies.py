@@ -1,34 +1,129 @@
 import os
+import threading
 from functools import lru_cache
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, Callable, Dict, List
 
 from dotenv import load_dotenv
+from fastapi import Request
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlmodel.ext.asyncio.session import AsyncSession
 from supabase import Client, create_client
 
+from src.limiter import get_rate_limit_key
+from src.metrics import instrument_engine
+from src.persistence.pool import engine_options, pool_settings, pool_snapshot
+from src.persistence.replicas import (
+    ReplicaRouter,
+    read_replica_urls,
+    replica_check_interval,
+    replica_connect_timeout,
+    replica_max_lag,
+    replica_sticky_redis_url,
+    replica_sticky_seconds,
+)
+from src.utils.executor import BoundedExecutor
+
 load_dotenv()
 
+
+_supabase_clients = threading.local()
+
+
+def thread_supabase() -> Client:
+    # The supabase client is not thread-safe, so each auth executor thread creates one of its own;
+    # call this from the thread that uses the client.
+    client = getattr(_supabase_clients, "client", None)
+    if client is None:
+        client = _supabase_clients.client = create_client(
+            os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY")
+        )
+    return client
+
+
+def get_supabase() -> Callable[[], Client]:
+    return thread_supabase
+
+
 @lru_cache
-def get_supabase() -> Client:
-    return create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+def get_auth_executor() -> BoundedExecutor:
+    # The supabase client is synchronous; its calls run here so they never block the event loop.
+    return BoundedExecutor(
+        name="supabase-auth",
+        max_workers=int(os.getenv("AUTH_EXECUTOR_WORKERS", "8")),
+        max_pending=int(os.getenv("AUTH_EXECUTOR_MAX_PENDING", "64")),
+        timeout=float(os.getenv("AUTH_TIMEOUT_SECONDS", "10")),
+    )
+
 
 @lru_cache
 def get_db_engine() -> AsyncEngine:
-    return create_async_engine(
-        os.getenv("SUPABASE_DB_URL"),
-        pool_size=5,
-        max_overflow=10,
-        connect_args={
-            "statement_cache_size": 0,
-            "server_settings": {
-                "statement_timeout": "60s",  
-                "idle_in_transaction_session_timeout": "30s" 
-            }
-        }
+    # Pool sizes, recycling, pre-ping and the statement caches come from DB_POOL_PROFILE.
+    engine = create_async_engine(os.getenv("SUPABASE_DB_URL"), **engine_options(pool_settings()))
+    instrument_engine(engine)
+    return engine
+
+
+@lru_cache
+def get_replica_router() -> ReplicaRouter:
+    engines = []
+    for url in read_replica_urls():
+        options = engine_options(pool_settings())
+        options["connect_args"]["timeout"] = replica_connect_timeout()
+        engine = create_async_engine(url, **options)
+        instrument_engine(engine)
+        engines.append(engine)
+    return ReplicaRouter(
+        engines,
+        replica_max_lag(),
+        replica_sticky_seconds(),
+        replica_check_interval(),
+        replica_connect_timeout(),
+        redis_url=replica_sticky_redis_url(),
     )
 
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
-    engine = get_db_engine()
-    async with AsyncSession(engine) as session:
+
+def pool_snapshots() -> List[Dict[str, Any]]:
+    # The primary's pool, then each replica's.
+    replicas = get_replica_router().replicas
+    return [
+        pool_snapshot(get_db_engine().pool, "primary"),
+        *(pool_snapshot(replica.engine.pool, replica.name) for replica in replicas),
+    ]
+
+
+def new_session() -> AsyncSession:
+    # Objects stay loaded after a commit, so writes return what they wrote without reading it
+    # back (an expired attribute would need a lazy load, which async sessions cannot do).
+    return AsyncSession(get_db_engine(), expire_on_commit=False)
+
+
+async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    async with new_session() as session:
+        replicas = get_replica_router()
+        if not replicas.replicas:
+            yield session
+            return
+        # The client's reads stay on the primary for a while after a commit. Marked once the
+        # handler is done, before the response goes out.
+        committed = []
+        event.listen(session.sync_session, "after_commit", lambda _: committed.append(True))
+        try:
+            yield session
+        finally:
+            if committed:
+                await replicas.mark_write(get_rate_limit_key(request))
+
+
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    # For GET handlers that only read: a session on a caught-up replica, unless the client wrote
+    # lately or no replica is available, then on the primary.
+    replicas = get_replica_router()
+    session = await replicas.read_session(get_rate_limit_key(request), get_db_engine())
+    if session is None:
+        session = new_session()
+    else:
+        # How far behind the primary what this request reads may be; see cached().
+        request.state.read_lag_seconds = replicas.sticky_seconds
+    async with session:
         yield session
@@ -1,9 +1,9 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
-from src.domain.models.common import HATEOASLinks
+from src.domain.models.common import BATCH_MAX_ITEMS, HATEOASLinks
 
 
 class BillboardBase(BaseModel):
@@ -12,6 +12,7 @@ class BillboardBase(BaseModel):
     height_mt: float
     dollars_per_day: float
 
+
 class BillboardLocationInfo(BaseModel):
     address: str
     city: str
@@ -20,17 +21,38 @@ class BillboardLocationInfo(BaseModel):
     lat: float
     lng: float
 
+
 class BillboardCreate(BillboardBase):
     pass
 
+
 class Billboard(BillboardBase):
     id: str
     created_at: datetime
     location: BillboardLocationInfo
     links: HATEOASLinks
 
+
+class NearbyBillboard(Billboard):
+    distance_km: float
+
+
 class BillboardUpdate(BaseModel):
     location_id: Optional[str] = None
-    width_mt: Optional[str] = None
-    height_mt: Optional[str] = None
-    dollars_per_day: Optional[str] = None
+    width_mt: Optional[float] = None
+    height_mt: Optional[float] = None
+    dollars_per_day: Optional[float] = None
+
+
+class BillboardBatchCreate(BaseModel):
+    items: List[BillboardCreate] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+    mode: Literal["all_or_nothing", "best_effort"] = "all_or_nothing"
+
+
+class BillboardBatchUpdateItem(BillboardUpdate):
+    id: str
+
+
+class BillboardBatchUpdate(BaseModel):
+    items: List[BillboardBatchUpdateItem] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+    mode: Literal["all_or_nothing", "best_effort"] = "all_or_nothing"
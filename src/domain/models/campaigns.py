@@ -1,10 +1,10 @@
 from datetime import date, datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from src.domain.models.billboards import Billboard
-from src.domain.models.common import HATEOASLinks
+from src.domain.models.common import BATCH_MAX_ITEMS, HATEOASLinks
 
 
 class CampaignBase(BaseModel):
@@ -12,9 +12,11 @@ class CampaignBase(BaseModel):
     start_date: date
     end_date: date
 
+
 class CampaignCreate(CampaignBase):
     pass
 
+
 class Campaign(CampaignBase):
     id: str
     name: str
@@ -25,7 +27,27 @@ class Campaign(CampaignBase):
     total_dollar_amount: Optional[float] = 0
     links: HATEOASLinks
 
+
 class CampaignUpdate(BaseModel):
     name: Optional[str] = None
     start_date: Optional[date] = None
     end_date: Optional[date] = None
+
+
+class CampaignBillboardsBatch(BaseModel):
+    billboard_ids: List[str] = Field(min_length=1, max_length=1000)
+    mode: Literal["all_or_nothing", "best_effort"] = "all_or_nothing"
+
+
+class CampaignBatchCreate(BaseModel):
+    items: List[CampaignCreate] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+    mode: Literal["all_or_nothing", "best_effort"] = "all_or_nothing"
+
+
+class CampaignBatchUpdateItem(CampaignUpdate):
+    id: str
+
+
+class CampaignBatchUpdate(BaseModel):
+    items: List[CampaignBatchUpdateItem] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+    mode: Literal["all_or_nothing", "best_effort"] = "all_or_nothing"
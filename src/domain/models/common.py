@@ -1,6 +1,9 @@
-from typing import List, Optional
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+# Largest number of items in one /batch request body.
+BATCH_MAX_ITEMS = 1000
 
 
 class HATEOASLinkObject(BaseModel):
@@ -8,7 +11,13 @@ class HATEOASLinkObject(BaseModel):
     method: str
     href: str
 
+
 class HATEOASLinks(BaseModel):
     self: Optional[HATEOASLinkObject] = None
     actions: Optional[List[HATEOASLinkObject]] = None
     related: Optional[List[HATEOASLinkObject]] = None
+
+
+class BatchDelete(BaseModel):
+    ids: List[str] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+    mode: Literal["all_or_nothing", "best_effort"] = "all_or_nothing"
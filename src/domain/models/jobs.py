@@ -0,0 +1,21 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+
+from src.domain.models.common import HATEOASLinks
+
+
+class Job(BaseModel):
+    id: str
+    kind: str
+    status: str
+    progress: Dict[str, Any]
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    attempts: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    duration_seconds: Optional[float] = None
+    links: HATEOASLinks
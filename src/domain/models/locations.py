@@ -1,9 +1,9 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
-from src.domain.models.common import HATEOASLinks
+from src.domain.models.common import BATCH_MAX_ITEMS, HATEOASLinks
 
 
 class LocationBase(BaseModel):
@@ -14,14 +14,21 @@ class LocationBase(BaseModel):
     lat: float
     lng: float
 
+
 class LocationCreate(LocationBase):
     pass
 
+
 class Location(LocationBase):
     id: str
     created_at: datetime
     links: HATEOASLinks
 
+
+class NearbyLocation(Location):
+    distance_km: float
+
+
 class LocationUpdate(BaseModel):
     address: Optional[str] = None
     city: Optional[str] = None
@@ -29,3 +36,17 @@ class LocationUpdate(BaseModel):
     country_code: Optional[str] = None
     lat: Optional[float] = None
     lng: Optional[float] = None
+
+
+class LocationBatchCreate(BaseModel):
+    items: List[LocationCreate] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+    mode: Literal["all_or_nothing", "best_effort"] = "all_or_nothing"
+
+
+class LocationBatchUpdateItem(LocationUpdate):
+    id: str
+
+
+class LocationBatchUpdate(BaseModel):
+    items: List[LocationBatchUpdateItem] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+    mode: Literal["all_or_nothing", "best_effort"] = "all_or_nothing"
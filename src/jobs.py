@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import os
+import shutil
+import socket
+import uuid
+from contextlib import suppress
+from datetime import datetime, timedelta
+from typing import IO, Any, Awaitable, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from src.dependencies import get_replica_router, new_session
+from src.limiter import user_client_key
+from src.persistence.models import Job
+from src.persistence.repositories import JobRepository
+
+load_dotenv()
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobFailed(Exception):
+    def __init__(self, message: str, result: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.result = result
+
+
+class JobContext:
+    def __init__(self, runner: "JobRunner", job: Job):
+        self.runner = runner
+        self.job = job
+
+    async def report(self, progress: Dict[str, Any]) -> None:
+        # Also the job's heartbeat; failures are logged, never raised into the handler.
+        try:
+            await self.runner._update(self.job.id, progress=progress)
+        except Exception as exc:
+            logging.warning(f"Could not record progress of job {self.job.id}: {exc}")
+
+
+JobHandler = Callable[[Job, JobContext], Awaitable[Dict[str, Any]]]
+
+
+class JobRunner:
+    def __init__(self, workers: int, max_queue: int, heartbeat_interval: float, stale_after: float):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.handlers: Dict[str, JobHandler] = {}
+        self.queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self.handlers[kind] = handler
+
+    async def start(self) -> None:
+        self.queue = asyncio.Queue(self.max_queue)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        try:
+            await self.resume()
+        except Exception as exc:
+            logging.warning(f"Could not resume unfinished jobs: {exc}")
+
+    async def stop(self) -> None:
+        # Interrupted jobs keep status "running"; once their heartbeat is stale the next start
+        # (of this or any other process) picks them up again.
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+        self.queue = None
+
+    def ensure_capacity(self) -> None:
+        if self.queue is None or self.queue.full():
+            raise JobQueueFull(
+                "Job queue is full" if self.queue is not None else "Job runner is not running"
+            )
+
+    async def submit(self, kind: str, params: Dict[str, Any], owner: Optional[str] = None) -> Job:
+        self.ensure_capacity()
+        async with new_session() as session:
+            job = await JobRepository(Job, session).create(
+                Job(kind=kind, params=params, owner=owner)
+            )
+        self.queue.put_nowait(job.id)
+        return job
+
+    async def resume(self) -> int:
+        async with new_session() as session:
+            ids = await JobRepository(Job, session).get_resumable_ids(self._stale_before())
+        resumed = 0
+        for id in ids:
+            if self.queue.full():
+                logging.warning(
+                    f"Job queue full, {len(ids) - resumed} unfinished jobs wait for the next start"
+                )
+                break
+            self.queue.put_nowait(id)
+            resumed += 1
+        if resumed:
+            logging.info(f"Resumed {resumed} unfinished jobs")
+        return resumed
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "instance": self.instance_id,
+            "running": self.queue is not None,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            id = await self.queue.get()
+            try:
+                await self._run(id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logging.exception(f"Job {id} could not be run: {exc}")
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, id: str) -> None:
+        async with new_session() as session:
+            job = await JobRepository(Job, session).claim(
+                id, self.instance_id, self._stale_before()
+            )
+        if job is None:
+            return  # finished, or being run by another process
+        handler = self.handlers.get(job.kind)
+        if handler is None:
+            await self._finish(id, "failed", error=f"Unknown job kind {job.kind!r}")
+            return
+        heartbeat = asyncio.create_task(self._heartbeat(id))
+        try:
+            result = await handler(job, JobContext(self, job))
+        except asyncio.CancelledError:
+            raise
+        except JobFailed as exc:
+            await self._finish(id, "failed", error=str(exc), result=exc.result)
+        except Exception as exc:
+            logging.exception(f"Job {id} failed: {exc}")
+            await self._finish(id, "failed", error=str(exc))
+        else:
+            await self._finish(id, "succeeded", result=result)
+        finally:
+            heartbeat.cancel()
+            if job.owner:
+                # What the job wrote is the owner's write as much as a request's would be.
+                await get_replica_router().mark_write(user_client_key(job.owner))
+
+    async def _heartbeat(self, id: str) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            with suppress(Exception):
+                await self._update(id)
+
+    async def _finish(self, id: str, status: str, **values: Any) -> None:
+        await self._update(id, status=status, finished_at=datetime.utcnow(), **values)
+
+    async def _update(self, id: str, **values: Any) -> bool:
+        async with new_session() as session:
+            return await JobRepository(Job, session).update_claimed(id, self.instance_id, **values)
+
+    def _stale_before(self) -> datetime:
+        return datetime.utcnow() - timedelta(seconds=self.stale_after)
+
+
+def jobs_enabled() -> bool:
+    return os.getenv("JOBS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+def jobs_spool_dir() -> str:
+    # Must outlive the process (and be shared by all workers on the host) for jobs to resume.
+    return os.getenv("JOBS_SPOOL_DIR", "/var/tmp/advertising-api/jobs")
+
+
+def spool_upload(upload: IO[bytes], suffix: str = "") -> str:
+    directory = jobs_spool_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{uuid.uuid4().hex}{suffix}")
+    upload.seek(0)
+    with open(path, "wb") as spooled:
+        shutil.copyfileobj(upload, spooled, 1024 * 1024)
+    return path
+
+
+job_runner = JobRunner(
+    workers=int(os.getenv("JOBS_WORKERS", "2")),
+    max_queue=int(os.getenv("JOBS_MAX_QUEUE", "100")),
+    heartbeat_interval=float(os.getenv("JOBS_HEARTBEAT_SECONDS", "15")),
+    stale_after=float(os.getenv("JOBS_STALE_SECONDS", "60")),
+)
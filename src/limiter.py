@@ -1,4 +1,44 @@
+import os
+
+from dotenv import load_dotenv
+from fastapi import Request
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
-limiter = Limiter(key_func=get_remote_address)
+load_dotenv()
+
+DEFAULT_RATE_LIMIT = os.getenv("RATE_LIMIT_DEFAULT", "100/minute")
+
+
+def user_client_key(sub: str) -> str:
+    return f"user:{sub}"
+
+
+def get_rate_limit_key(request: Request) -> str:
+    # request.state.user is set by the auth dependency, which FastAPI resolves before the
+    # limiter decorator runs; unauthenticated routes fall back to the client address.
+    user = getattr(request.state, "user", None)
+    if user and user.get("sub"):
+        return user_client_key(user["sub"])
+    return f"ip:{get_remote_address(request)}"
+
+
+def rate_limit(scope: str, route: str = None) -> str:
+    # RATE_LIMIT_<SCOPE>_<ROUTE>, then RATE_LIMIT_<SCOPE>, then RATE_LIMIT_DEFAULT.
+    names = [f"RATE_LIMIT_{scope}_{route}".upper()] if route else []
+    names.append(f"RATE_LIMIT_{scope}".upper())
+    for name in names:
+        value = os.getenv(name)
+        if value:
+            return value
+    return DEFAULT_RATE_LIMIT
+
+
+limiter = Limiter(
+    key_func=get_rate_limit_key,
+    # Shared storage keeps one set of counters across workers; memory:// is per process.
+    storage_uri=os.getenv("RATE_LIMIT_STORAGE_URI") or os.getenv("REDIS_URL") or "memory://",
+    strategy=os.getenv("RATE_LIMIT_STRATEGY", "moving-window"),
+    key_prefix="advertising-api",
+    in_memory_fallback_enabled=True,
+)
@@ -1,14 +1,67 @@
-from fastapi import FastAPI, Request
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from slowapi import _rate_limit_exceeded_handler
+
+from src.cache import check_cache_setup, response_cache
+from src.dependencies import get_auth_executor, get_replica_router, pool_snapshots
 from src.error_handlers import generic_exception_handler
-from src.limiter import limiter
+from src.jobs import job_runner, jobs_enabled
+from src.limiter import limiter, rate_limit
+from src.metrics import (
+    CONTENT_TYPE,
+    MetricsMiddleware,
+    metrics_access,
+    metrics_enabled,
+    render_metrics,
+)
+from src.persistence.replicas import check_replica_setup
+from src.routes.analytics import router as analytics_router
 from src.routes.auth import router as auth_router
 from src.routes.billboards import router as billboards_router
 from src.routes.campaigns import router as campaigns_router
+from src.routes.export import router as export_router
+from src.routes.internal import router as internal_router
+from src.routes.jobs import router as jobs_router
 from src.routes.locations import router as locations_router
+from src.services.availability import (
+    availability_index_enabled,
+    check_availability_setup,
+    load_availability_index,
+    refresh_availability_index_periodically,
+)
+from src.services.locations import BULK_LOAD_JOB, run_bulk_load_job
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    check_cache_setup()
+    check_availability_setup()
+    background_tasks = []
+    replicas = get_replica_router()
+    check_replica_setup(replicas)
+    if replicas.replicas:
+        # Replicas serve reads only once a probe has found them caught up.
+        await replicas.check()
+        background_tasks.append(asyncio.create_task(replicas.check_periodically()))
+    if availability_index_enabled():
+        await load_availability_index()
+        background_tasks.append(asyncio.create_task(refresh_availability_index_periodically()))
+    if jobs_enabled():
+        # Before start, which resumes unfinished jobs of these kinds.
+        job_runner.register(BULK_LOAD_JOB, run_bulk_load_job)
+        await job_runner.start()
+    yield
+    for task in background_tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await job_runner.stop()
 
-app = FastAPI(title="Advertising API", version="1.0.0")
+
+app = FastAPI(title="Advertising API", version="1.0.0", lifespan=lifespan)
 
 
 app.add_middleware(
@@ -19,6 +72,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Added last, so it is outermost and its latency covers CORS handling too.
+app.add_middleware(MetricsMiddleware)
+
 # Limiter setup
 app.state.limiter = limiter
 
@@ -31,14 +87,43 @@ app.include_router(auth_router, prefix="/api/v1")
 app.include_router(locations_router, prefix="/api/v1")
 app.include_router(billboards_router, prefix="/api/v1")
 app.include_router(campaigns_router, prefix="/api/v1")
+app.include_router(export_router, prefix="/api/v1")
+app.include_router(jobs_router, prefix="/api/v1")
+app.include_router(analytics_router, prefix="/api/v1")
+app.include_router(internal_router, prefix="/api/v1")
+
 
 @app.get("/health")
-@limiter.limit("100/minute")
+@limiter.limit(rate_limit("system", "health"))
 async def health(request: Request):
     return {"status": "ok"}
 
+
 @app.get("/version")
-@limiter.limit("100/minute")
+@limiter.limit(rate_limit("system", "version"))
 async def version(request: Request):
     return {"version": "1.0.0"}
 
+
+@app.get("/metrics", include_in_schema=False)
+@limiter.limit(rate_limit("system", "metrics"))
+async def metrics(request: Request):
+    # Prometheus scrape endpoint; counts are per worker process.
+    if not metrics_enabled():
+        raise HTTPException(status_code=404, detail="Not Found")
+    refused = metrics_access(
+        request.headers.get("authorization"), request.client.host if request.client else None
+    )
+    if refused == 401:
+        raise HTTPException(
+            status_code=401, detail="Unauthorized", headers={"WWW-Authenticate": "Bearer"}
+        )
+    if refused:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    body = render_metrics(
+        response_cache.snapshot(),
+        pool_snapshots(),
+        get_replica_router().snapshot(),
+        [get_auth_executor().snapshot()],
+    )
+    return Response(content=body, media_type=CONTENT_TYPE)
@@ -0,0 +1,413 @@
+import hmac
+import ipaddress
+import os
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.query_budget import current_queries, start_request
+
+# Prometheus text exposition (format 0.0.4), kept in-process without a client library. Every
+# observation happens on the event loop thread (SQLAlchemy's events run in the greenlet of the
+# awaiting coroutine), so the counters need no locks.
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def metrics_enabled() -> bool:
+    return os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+def metrics_token() -> Optional[str]:
+    return os.getenv("METRICS_TOKEN") or None
+
+
+def metrics_access(authorization: Optional[str], client_host: Optional[str]) -> Optional[int]:
+    # None if the scrape may proceed, else the status to refuse it with. With METRICS_TOKEN set
+    # it must come as a bearer token; without one, only clients on this host are answered (a
+    # sidecar, or a scraper reaching a port bound to localhost).
+    token = metrics_token()
+    if token:
+        scheme, _, credentials = (authorization or "").partition(" ")
+        if scheme.lower() == "bearer" and hmac.compare_digest(
+            credentials.strip().encode(), token.encode()
+        ):
+            return None
+        return 401
+    try:
+        return None if ipaddress.ip_address(client_host or "").is_loopback else 403
+    except ValueError:
+        return 403
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        if not self.labelnames:
+            self._values[()] = 0
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket (the last one is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._series.items()):
+            lines.extend(
+                render_histogram_series(
+                    self.name, self.labelnames, labels, self.buckets, counts, total
+                )
+            )
+        return lines
+
+
+def render_histogram_series(
+    name: str,
+    labelnames: Sequence[str],
+    labels: Sequence[str],
+    buckets: Sequence[float],
+    counts: Sequence[int],
+    total: float,
+) -> List[str]:
+    # counts holds one entry per bucket plus +Inf, not cumulative.
+    lines, cumulative = [], 0
+    for bound, count in zip([*map(_number, buckets), "+Inf"], counts):
+        cumulative += count
+        le = f'le="{bound}"'
+        lines.append(f"{name}_bucket{_labels(labelnames, labels, le)} {cumulative}")
+    lines.append(f"{name}_sum{_labels(labelnames, labels)} {_number(total)}")
+    lines.append(f"{name}_count{_labels(labelnames, labels)} {cumulative}")
+    return lines
+
+
+def render_samples(
+    name: str, help: str, kind: str, values: Iterable[Tuple[Sequence[str], Sequence[str], float]]
+) -> List[str]:
+    # A counter or gauge whose values are read from elsewhere: (label names, label values, value).
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for labelnames, labels, value in values:
+        lines.append(f"{name}{_labels(labelnames, labels)} {_number(value)}")
+    return lines
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to sending the last byte of its response.",
+    ("method", "route", "status"),
+)
+request_db_queries = Histogram(
+    "http_request_db_queries",
+    "SQL statements executed while handling a request.",
+    ("method", "route"),
+    QUERY_COUNT_BUCKETS,
+)
+request_db_duration = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent executing SQL statements while handling a request.",
+    ("method", "route"),
+)
+db_query_duration = Histogram(
+    "db_query_duration_seconds",
+    "Execution time of single SQL statements, in requests and background jobs alike.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+db_query_errors = Counter("db_query_errors_total", "SQL statements that raised an error.")
+auth_duration = Histogram(
+    "auth_verification_duration_seconds",
+    "Time to verify a bearer token, locally (JWT, cached claims included) or through Supabase.",
+    ("source",),
+)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    # Times every statement and charges it to the request it runs in, if any, whose query
+    # budget it also counts against.
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        queries = current_queries.get()
+        if queries is not None:
+            queries.record(statement)
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        _record_query(time.perf_counter() - context._metrics_started)
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def handle_error(exception_context):
+        db_query_errors.inc()
+        context = exception_context.execution_context
+        started = getattr(context, "_metrics_started", None)
+        if started is not None:
+            _record_query(time.perf_counter() - started)
+
+
+def _record_query(seconds: float) -> None:
+    db_query_duration.observe(seconds)
+    queries = current_queries.get()
+    if queries is not None:
+        queries.seconds += seconds
+
+
+class MetricsMiddleware:
+    # Plain ASGI rather than BaseHTTPMiddleware: no extra task or body buffering per request.
+    # Routes are labeled by their path template, so ids do not multiply the series. Also
+    # tracks each request's statements for its query budget.
+    def __init__(self, app):
+        self.app = app
+        self.record_metrics = metrics_enabled()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = [500]
+        queries = start_request(scope)
+        token = current_queries.set(queries)
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_queries.reset(token)
+            queries.warn()
+            if self.record_metrics:
+                route, method = queries.route, scope["method"]
+                request_duration.observe(
+                    time.perf_counter() - started, method, route, str(status[0])
+                )
+                request_db_queries.observe(queries.statements, method, route)
+                request_db_duration.observe(queries.seconds, method, route)
+
+
+def render_metrics(cache: Dict, pools: List[Dict], replicas: Dict, executors: List[Dict]) -> str:
+    # cache: ResponseCache.snapshot(); pools: pool_snapshot() of each engine's pool; replicas:
+    # ReplicaRouter.snapshot(); executors: BoundedExecutor.snapshot() of each thread pool.
+    lines = []
+    for metric in (
+        request_duration,
+        request_db_queries,
+        request_db_duration,
+        db_query_duration,
+        db_query_errors,
+        auth_duration,
+    ):
+        lines.extend(metric.render())
+    resources = sorted(cache["resources"].items())
+    lines.extend(
+        render_samples(
+            "response_cache_lookups_total",
+            "Cached GET lookups per resource: hit, miss, or hit answered 304 Not Modified.",
+            "counter",
+            (
+                (("resource", "result"), (resource, result), counts[key])
+                for resource, counts in resources
+                for result, key in (
+                    ("hit", "hits"),
+                    ("miss", "misses"),
+                    ("not_modified", "not_modified"),
+                )
+            ),
+        )
+    )
+    lines.extend(
+        render_samples(
+            "response_cache_hit_ratio",
+            "Share of cached GET lookups per resource answered from the cache.",
+            "gauge",
+            (
+                (("resource",), (resource,), counts["hit_rate"])
+                for resource, counts in resources
+                if counts["hit_rate"] is not None
+            ),
+        )
+    )
+    lines.extend(
+        render_samples(
+            "response_cache_entries",
+            "Responses held in this worker's cache.",
+            "gauge",
+            [((), (), cache["entries"])],
+        )
+    )
+    lines.extend(
+        render_samples(
+            "db_pool_connections",
+            "Database pool connections by state; overflow counts those beyond pool_size.",
+            "gauge",
+            (
+                (("pool", "state"), (pool["name"], state), pool[key])
+                for pool in pools
+                for state, key in (
+                    ("checked_in", "checked_in"),
+                    ("checked_out", "checked_out"),
+                    ("overflow", "overflow"),
+                )
+            ),
+        )
+    )
+    lines.extend(
+        render_samples(
+            "db_pool_size",
+            "Configured database pool size.",
+            "gauge",
+            ((("pool",), (pool["name"],), pool["size"]) for pool in pools),
+        )
+    )
+    lines.extend(
+        render_samples(
+            "db_pool_checkout_timeouts_total",
+            "Checkouts that gave up after pool_timeout.",
+            "counter",
+            ((("pool",), (pool["name"],), pool["timeouts"]) for pool in pools),
+        )
+    )
+    name = "db_pool_checkout_wait_seconds"
+    lines.extend(
+        [
+            f"# HELP {name} Time to get a connection from the pool, opening a new one included.",
+            f"# TYPE {name} histogram",
+        ]
+    )
+    for pool in pools:
+        labels = (("pool",), (pool["name"],))
+        # The pool's buckets are already cumulative.
+        for bound, count in pool["wait_seconds_buckets"].items():
+            le = f'le="{bound}"'
+            lines.append(f"{name}_bucket{_labels(*labels, le)} {count}")
+        lines.append(f"{name}_sum{_labels(*labels)} {_number(pool['wait_seconds_sum'])}")
+        lines.append(f"{name}_count{_labels(*labels)} {pool['checkouts']}")
+    lines.extend(
+        render_samples(
+            "db_read_sessions_total",
+            "Read sessions by where they went: replica, or the primary after a write, with no "
+            "replica available or after a failed connect.",
+            "counter",
+            (
+                (("target",), (target,), count)
+                for target, count in sorted(replicas["reads"].items())
+            ),
+        )
+    )
+    lines.extend(
+        render_samples(
+            "db_replica_available",
+            "1 while a read replica gets reads, 0 while it is down or behind.",
+            "gauge",
+            (
+                (("replica",), (replica["name"],), int(replica["available"]))
+                for replica in replicas["replicas"]
+            ),
+        )
+    )
+    lines.extend(
+        render_samples(
+            "db_replica_lag_seconds",
+            "Replay lag of each read replica at its last probe.",
+            "gauge",
+            (
+                (("replica",), (replica["name"],), replica["lag_seconds"])
+                for replica in replicas["replicas"]
+                if replica["lag_seconds"] is not None
+            ),
+        )
+    )
+    lines.extend(
+        render_samples(
+            "executor_calls_total",
+            "Blocking calls handed to a thread pool, by outcome: submitted, completed, failed, "
+            "timed out, or rejected while full.",
+            "counter",
+            (
+                (("executor", "result"), (executor["name"], result), executor[result])
+                for executor in executors
+                for result in ("submitted", "completed", "failed", "timed_out", "rejected")
+            ),
+        )
+    )
+    lines.extend(
+        render_samples(
+            "executor_in_flight",
+            "Calls running or queued in a thread pool, timed out ones included until they return.",
+            "gauge",
+            ((("executor",), (executor["name"],), executor["in_flight"]) for executor in executors),
+        )
+    )
+    lines.extend(
+        render_samples(
+            "executor_max_pending",
+            "Calls in flight above which a thread pool rejects new ones.",
+            "gauge",
+            (
+                (("executor",), (executor["name"],), executor["max_pending"])
+                for executor in executors
+            ),
+        )
+    )
+    lines.extend(
+        render_samples(
+            "executor_busy_seconds_total",
+            "Time calls spent in a thread pool, queueing included.",
+            "counter",
+            (
+                (("executor",), (executor["name"],), executor["busy_seconds"])
+                for executor in executors
+            ),
+        )
+    )
+    return "\n".join(lines) + "\n"
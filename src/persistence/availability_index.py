@@ -0,0 +1,181 @@
+import time
+from bisect import bisect_right
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# (billboard_id, campaign_id, start_date, end_date) of a booking on a live campaign.
+Booking = Tuple[str, str, date, date]
+
+
+class _BillboardIntervals:
+    # Bookings of one billboard sorted by start day. max_ends[i] is the latest end among the
+    # first i + 1 bookings, so "anything overlapping [start, end]" is a single bisect even if
+    # the data happens to hold overlapping bookings.
+    __slots__ = ("starts", "ends", "campaign_ids", "max_ends")
+
+    def __init__(self):
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        self.campaign_ids: List[str] = []
+        self.max_ends: List[int] = []
+
+    def add(self, campaign_id: str, start: int, end: int) -> None:
+        i = bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.campaign_ids.insert(i, campaign_id)
+        self._refresh_max_ends(i)
+
+    def remove(self, campaign_id: str) -> bool:
+        try:
+            i = self.campaign_ids.index(campaign_id)
+        except ValueError:
+            return False
+        del self.starts[i], self.ends[i], self.campaign_ids[i], self.max_ends[i]
+        self._refresh_max_ends(i)
+        return True
+
+    def is_free(self, start: int, end: int) -> bool:
+        i = bisect_right(self.starts, end)
+        return i == 0 or self.max_ends[i - 1] < start
+
+    def _refresh_max_ends(self, i: int) -> None:
+        del self.max_ends[i:]
+        running = self.max_ends[-1] if self.max_ends else None
+        for end in self.ends[i:]:
+            running = end if running is None or end > running else running
+            self.max_ends.append(running)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+
+class AvailabilityIndex:
+    def __init__(self):
+        self._by_billboard: Dict[str, _BillboardIntervals] = {}
+        self._by_campaign: Dict[str, Set[str]] = {}
+        self.loaded = False
+        self.loaded_at: Optional[float] = None
+        # Updates made while a reload reads the database, replayed onto what it read (see
+        # begin_replace), each with its sequence number.
+        self._sequence = 0
+        self._replacing = 0
+        self._journal: List[Tuple[int, str, Tuple[Any, ...]]] = []
+
+    def add(self, billboard_id: str, campaign_id: str, start_date: date, end_date: date) -> None:
+        self._record("add", billboard_id, campaign_id, start_date, end_date)
+        self._add(billboard_id, campaign_id, start_date, end_date)
+
+    def remove(self, billboard_id: str, campaign_id: str) -> None:
+        self._record("remove", billboard_id, campaign_id)
+        self._remove(billboard_id, campaign_id)
+
+    def remove_campaign(self, campaign_id: str) -> None:
+        self._record("remove_campaign", campaign_id)
+        self._remove_campaign(campaign_id)
+
+    def _record(self, operation: str, *args: Any) -> None:
+        self._sequence += 1
+        if self._replacing:
+            self._journal.append((self._sequence, operation, args))
+
+    def _add(self, billboard_id: str, campaign_id: str, start_date: date, end_date: date) -> None:
+        intervals = self._by_billboard.setdefault(billboard_id, _BillboardIntervals())
+        intervals.remove(campaign_id)
+        intervals.add(campaign_id, start_date.toordinal(), end_date.toordinal())
+        self._by_campaign.setdefault(campaign_id, set()).add(billboard_id)
+
+    def _remove(self, billboard_id: str, campaign_id: str) -> None:
+        intervals = self._by_billboard.get(billboard_id)
+        if intervals and intervals.remove(campaign_id) and not intervals:
+            del self._by_billboard[billboard_id]
+        billboards = self._by_campaign.get(campaign_id)
+        if billboards:
+            billboards.discard(billboard_id)
+            if not billboards:
+                del self._by_campaign[campaign_id]
+
+    def _remove_campaign(self, campaign_id: str) -> None:
+        for billboard_id in list(self._by_campaign.get(campaign_id, ())):
+            self._remove(billboard_id, campaign_id)
+
+    def holds(self, billboard_id: str, campaign_id: str) -> bool:
+        return billboard_id in self._by_campaign.get(campaign_id, ())
+
+    def is_free(self, billboard_id: str, start_date: date, end_date: date) -> bool:
+        intervals = self._by_billboard.get(billboard_id)
+        return intervals is None or intervals.is_free(start_date.toordinal(), end_date.toordinal())
+
+    def busy_billboards(self, start_date: date, end_date: date) -> Set[str]:
+        start, end = start_date.toordinal(), end_date.toordinal()
+        return {
+            billboard_id
+            for billboard_id, intervals in self._by_billboard.items()
+            if not intervals.is_free(start, end)
+        }
+
+    def begin_replace(self) -> int:
+        # Called before reading the bookings for replace(). Updates from then on are also kept
+        # aside, since the read may or may not see the writes behind them; every update is an
+        # upsert or delete of its bookings, so replaying them onto what was read is right either
+        # way. Pair with end_replace().
+        self._replacing += 1
+        return self._sequence
+
+    def end_replace(self) -> None:
+        self._replacing -= 1
+        if not self._replacing:
+            self._journal.clear()
+
+    def replace(self, bookings: Iterable[Booking], since: Optional[int] = None) -> int:
+        # since: what begin_replace() returned before the bookings were read.
+        grouped: Dict[str, List[Tuple[int, int, str]]] = {}
+        by_campaign: Dict[str, Set[str]] = {}
+        count = 0
+        for billboard_id, campaign_id, start_date, end_date in bookings:
+            grouped.setdefault(billboard_id, []).append(
+                (start_date.toordinal(), end_date.toordinal(), campaign_id)
+            )
+            by_campaign.setdefault(campaign_id, set()).add(billboard_id)
+            count += 1
+        by_billboard = {}
+        for billboard_id, rows in grouped.items():
+            rows.sort()
+            intervals = _BillboardIntervals()
+            intervals.starts = [start for start, _, _ in rows]
+            intervals.ends = [end for _, end, _ in rows]
+            intervals.campaign_ids = [campaign_id for _, _, campaign_id in rows]
+            intervals._refresh_max_ends(0)
+            by_billboard[billboard_id] = intervals
+        if since is not None:
+            rebuilt = AvailabilityIndex()
+            rebuilt._by_billboard, rebuilt._by_campaign = by_billboard, by_campaign
+            for sequence, operation, args in self._journal:
+                if sequence > since:
+                    getattr(rebuilt, f"_{operation}")(*args)
+        # Swapped in one step so concurrent readers never see a half-built index, and with no
+        # await since the replay so no update can slip in between.
+        self._by_billboard, self._by_campaign = by_billboard, by_campaign
+        self.loaded = True
+        self.loaded_at = time.time()
+        return count
+
+    def bookings(self) -> Set[Booking]:
+        return {
+            (billboard_id, campaign_id, date.fromordinal(start), date.fromordinal(end))
+            for billboard_id, intervals in self._by_billboard.items()
+            for campaign_id, start, end in zip(
+                intervals.campaign_ids, intervals.starts, intervals.ends
+            )
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.loaded,
+            "loaded_at": self.loaded_at,
+            "billboards": len(self._by_billboard),
+            "bookings": sum(len(intervals) for intervals in self._by_billboard.values()),
+        }
+
+
+availability_index = AvailabilityIndex()
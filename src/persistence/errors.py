@@ -0,0 +1,19 @@
+from typing import Optional
+
+# Postgres SQLSTATEs the repositories translate.
+UNIQUE_VIOLATION = "23505"
+EXCLUSION_VIOLATION = "23P01"
+SERIALIZATION_FAILURE = "40001"
+DEADLOCK_DETECTED = "40P01"
+LOCK_NOT_AVAILABLE = "55P03"  # lock_timeout expired
+# Failures that say nothing about the transaction itself: running it again may well succeed.
+RETRYABLE_SQLSTATES = (SERIALIZATION_FAILURE, DEADLOCK_DETECTED, LOCK_NOT_AVAILABLE)
+
+
+class BookingConflict(Exception):
+    """Raised when a booking would overlap another booking of the same billboard."""
+
+
+def sqlstate(exc: BaseException) -> Optional[str]:
+    # The asyncpg dialect copies the server's SQLSTATE onto the DBAPI error SQLAlchemy wraps.
+    return getattr(getattr(exc, "orig", None), "sqlstate", None)
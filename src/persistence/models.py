@@ -1,18 +1,42 @@
-from datetime import date, datetime
-from typing import TYPE_CHECKING, List, Optional
+from datetime import date, datetime, timezone
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
-from sqlmodel import TIMESTAMP, Column, Date, Field, Relationship, SQLModel
+from sqlalchemy import text, true
+from sqlalchemy.dialects.postgresql import DATERANGE, ExcludeConstraint
+from sqlmodel import JSON, TIMESTAMP, Column, Date, Field, Relationship, SQLModel
 
 if TYPE_CHECKING:
     from .models import Billboard, Campaign, CampaignBillboard, Location
 
+
+def utc_now() -> datetime:
+    # Aware, as the column reads back: a created object serializes like a fetched one.
+    return datetime.now(timezone.utc)
+
+
 class CampaignBillboard(SQLModel, table=True):
     __tablename__ = "campaign_billboards"
+    __table_args__ = (
+        # No two live bookings of a billboard may overlap; needs the btree_gist extension.
+        ExcludeConstraint(
+            ("billboard_id", "="),
+            ("booking_period", "&&"),
+            name="ex_campaign_billboards_no_overlap",
+            using="gist",
+            where=text("is_active"),
+        ),
+    )
     campaign_id: str = Field(foreign_key="campaigns.id", primary_key=True)
     billboard_id: str = Field(foreign_key="billboards.id", primary_key=True)
+    # The campaign's [start_date, end_date], copied here so the constraint can see it.
+    booking_period: Any = Field(sa_column=Column(DATERANGE, nullable=False))
+    is_active: bool = Field(
+        default=True, sa_column_kwargs={"server_default": true()}
+    )  # false once the campaign is deleted
     campaign: "Campaign" = Relationship(back_populates="billboard_links")
     billboard: "Billboard" = Relationship(back_populates="campaign_links")
 
+
 class Location(SQLModel, table=True):
     __tablename__ = "locations"
     id: str = Field(default=None, primary_key=True)  # loc_<uuid>
@@ -22,10 +46,13 @@ class Location(SQLModel, table=True):
     country_code: str
     lat: float
     lng: float
-    created_at: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(TIMESTAMP(timezone=True)))
+    created_at: datetime = Field(
+        default_factory=utc_now, sa_column=Column(TIMESTAMP(timezone=True))
+    )
     is_deleted: bool = Field(default=False)
     billboards: List["Billboard"] = Relationship(back_populates="location")
 
+
 class Billboard(SQLModel, table=True):
     __tablename__ = "billboards"
     id: str = Field(default=None, primary_key=True)  # bill_<uuid>
@@ -33,25 +60,52 @@ class Billboard(SQLModel, table=True):
     width_mt: float
     height_mt: float
     dollars_per_day: float
-    created_at: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(TIMESTAMP(timezone=True)))
+    created_at: datetime = Field(
+        default_factory=utc_now, sa_column=Column(TIMESTAMP(timezone=True))
+    )
     is_deleted: bool = Field(default=False)
     location: Optional["Location"] = Relationship(back_populates="billboards")
     campaign_links: List["CampaignBillboard"] = Relationship(back_populates="billboard")
     campaigns: List["Campaign"] = Relationship(
-        back_populates="billboards",
-        link_model=CampaignBillboard
+        back_populates="billboards", link_model=CampaignBillboard
     )
 
+
 class Campaign(SQLModel, table=True):
     __tablename__ = "campaigns"
     id: str = Field(default=None, primary_key=True)  # cam_<uuid>
     name: str
     start_date: date = Field(sa_column=Column(Date))
     end_date: date = Field(sa_column=Column(Date))
-    created_at: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(TIMESTAMP(timezone=True)))
+    created_at: datetime = Field(
+        default_factory=utc_now, sa_column=Column(TIMESTAMP(timezone=True))
+    )
     is_deleted: bool = Field(default=False)
     billboard_links: List["CampaignBillboard"] = Relationship(back_populates="campaign")
     billboards: List["Billboard"] = Relationship(
-        back_populates="campaigns",
-        link_model=CampaignBillboard
+        back_populates="campaigns", link_model=CampaignBillboard
+    )
+
+
+class Job(SQLModel, table=True):
+    __tablename__ = "jobs"
+    id: str = Field(default=None, primary_key=True)  # job_<uuid>
+    kind: str
+    status: str = Field(default="queued", index=True)  # queued | running | succeeded | failed
+    owner: Optional[str] = None
+    params: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
+    progress: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
+    result: Optional[Dict[str, Any]] = Field(default=None, sa_column=Column(JSON))
+    error: Optional[str] = None
+    attempts: int = Field(default=0)
+    claimed_by: Optional[str] = None
+    heartbeat_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(TIMESTAMP(timezone=True))
+    )
+    created_at: datetime = Field(
+        default_factory=utc_now, sa_column=Column(TIMESTAMP(timezone=True))
+    )
+    started_at: Optional[datetime] = Field(default=None, sa_column=Column(TIMESTAMP(timezone=True)))
+    finished_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(TIMESTAMP(timezone=True))
     )
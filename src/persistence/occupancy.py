@@ -0,0 +1,276 @@
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# The billboard columns that identify a group, for each group_by.
+GROUP_COLUMNS = {
+    "billboard": ("billboard_id",),
+    "location": ("location_id",),
+    "city": ("country_code", "state", "city"),
+    "state": ("country_code", "state"),
+    "country": ("country_code",),
+    "all": (),
+}
+PERIODS = ("day", "week", "month", "quarter", "year", "total")
+# Up to this many group x day cells (64 MB of prefix sums), a group_by gets per-day running totals
+# that answer any period as a difference; beyond it (e.g. per billboard) each query expands the
+# bookings into the periods they touch instead.
+DENSE_CELLS = 4_000_000
+
+
+def to_day(value: date) -> int:
+    return value.toordinal() - EPOCH_ORDINAL
+
+
+def from_day(day: int) -> date:
+    return date.fromordinal(day + EPOCH_ORDINAL)
+
+
+def period_starts(start: date, end: date, period: str) -> List[date]:
+    # First day of every period in [start, end]; the first one is clipped to start.
+    starts = [start]
+    if period == "total":
+        return starts
+    current = start
+    while True:
+        if period == "day":
+            current += timedelta(days=1)
+        elif period == "week":
+            current += timedelta(days=7 - current.weekday())
+        elif period == "month":
+            current = date(current.year + current.month // 12, current.month % 12 + 1, 1)
+        elif period == "quarter":
+            month = (current.month - 1) // 3 * 3 + 4
+            current = date(current.year + (month > 12), (month - 1) % 12 + 1, 1)
+        else:
+            current = date(current.year + 1, 1, 1)
+        if current > end:
+            return starts
+        starts.append(current)
+
+
+def period_label(start: date, end: date, period: str) -> str:
+    if period == "day":
+        return start.isoformat()
+    if period == "week":
+        year, week, _ = start.isocalendar()
+        return f"{year}-W{week:02d}"
+    if period == "month":
+        return f"{start.year}-{start.month:02d}"
+    if period == "quarter":
+        return f"{start.year}-Q{(start.month - 1) // 3 + 1}"
+    if period == "year":
+        return str(start.year)
+    return f"{start.isoformat()}/{end.isoformat()}"
+
+
+class OccupancySnapshot:
+    # Live billboards and their active bookings as NumPy columns, immutable once built: a new
+    # snapshot replaces it when bookings change. Bookings are half-open day ranges [start, end)
+    # in days since 1970-01-01, sorted by start, each pointing at its billboard's position in the
+    # billboard columns and carrying that billboard's dollars_per_day.
+    def __init__(
+        self,
+        key: Hashable,
+        billboards: Dict[str, Sequence[Any]],
+        dollars_per_day: np.ndarray,
+        booking_billboards: np.ndarray,
+        booking_starts: np.ndarray,
+        booking_ends: np.ndarray,
+    ):
+        order = np.argsort(booking_starts, kind="stable")
+        self.key = key
+        self.billboards = billboards
+        self.dollars_per_day = dollars_per_day
+        self.booking_billboards = booking_billboards[order]
+        self.booking_starts = booking_starts[order]
+        self.booking_ends = booking_ends[order]
+        self.booking_prices = dollars_per_day[self.booking_billboards]
+        self.loaded_at = time.time()
+        self._groups: Dict[str, Tuple[np.ndarray, List[Tuple]]] = {}
+        self._running_totals: Dict[str, Optional[Tuple[int, np.ndarray, np.ndarray]]] = {}
+
+    @classmethod
+    def build(
+        cls,
+        key: Hashable,
+        billboard_rows: Sequence[Tuple],
+        booking_billboard_ids: Sequence[str],
+        booking_starts: Sequence[int],
+        booking_ends: Sequence[int],
+    ) -> "OccupancySnapshot":
+        # billboard_rows: (billboard_id, location_id, country_code, state, city, dollars_per_day).
+        # Bookings of billboards missing from billboard_rows are dropped.
+        columns = list(zip(*billboard_rows)) or [()] * 6
+        billboards = dict(
+            zip(("billboard_id", "location_id", "country_code", "state", "city"), columns[:5])
+        )
+        positions = {billboard_id: i for i, billboard_id in enumerate(billboards["billboard_id"])}
+        booking_billboards = np.fromiter(
+            (positions.get(billboard_id, -1) for billboard_id in booking_billboard_ids),
+            dtype=np.int64,
+            count=len(booking_billboard_ids),
+        )
+        known = booking_billboards >= 0
+        return cls(
+            key,
+            billboards,
+            np.asarray(columns[5], dtype=float),
+            booking_billboards[known],
+            np.asarray(booking_starts, dtype=np.int64)[known],
+            np.asarray(booking_ends, dtype=np.int64)[known],
+        )
+
+    def group_count(self, group_by: str) -> int:
+        return len(self._group(group_by)[1])
+
+    def occupancy(self, group_by: str, period: str, start: date, end: date) -> List[Dict[str, Any]]:
+        # Per group and period: billboards in the group, billboard-days on offer, days booked,
+        # their ratio and the revenue of those days at each billboard's dollars_per_day.
+        codes, labels = self._group(group_by)
+        starts = period_starts(start, end, period)
+        bounds = np.array([to_day(value) for value in starts] + [to_day(end) + 1], dtype=np.int64)
+        groups = len(labels)
+        running_totals = self._running_total(group_by)
+        if running_totals is not None:
+            origin, booked_before, revenue_before = running_totals
+            # Days outside the bookings' span add nothing, so the bounds can be clamped into it.
+            columns = np.clip(bounds - origin, 0, booked_before.shape[1] - 1)
+            booked = booked_before[:, columns[1:]] - booked_before[:, columns[:-1]]
+            revenue = revenue_before[:, columns[1:]] - revenue_before[:, columns[:-1]]
+        else:
+            booked, revenue = self._count_expanded(codes, groups, bounds)
+        counts = np.bincount(codes, minlength=groups)
+        offered = counts[:, None] * np.diff(bounds)[None, :]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rates = np.round(booked / offered, 6)
+
+        columns = GROUP_COLUMNS[group_by]
+        period_rows = [
+            {
+                "period": period_label(value, from_day(next_start - 1), period),
+                "start_date": value.isoformat(),
+                "end_date": from_day(next_start - 1).isoformat(),
+            }
+            for value, next_start in zip(starts, bounds[1:].tolist())
+        ]
+        counts = counts.tolist()
+        cells = zip(
+            booked.ravel().tolist(),
+            offered.ravel().tolist(),
+            rates.ravel().tolist(),
+            np.round(revenue, 2).ravel().tolist(),
+        )
+        rows = []
+        for group, label in enumerate(labels):
+            group_fields = dict(zip(columns, label))
+            billboards = counts[group]
+            for period_fields, (booked_days, billboard_days, rate, booked_revenue) in zip(
+                period_rows, cells
+            ):
+                rows.append(
+                    {
+                        **group_fields,
+                        **period_fields,
+                        "billboards": billboards,
+                        "billboard_days": billboard_days,
+                        "booked_days": booked_days,
+                        "occupancy_rate": rate if billboard_days else None,
+                        "booked_revenue": booked_revenue,
+                    }
+                )
+        return rows
+
+    def _running_total(self, group_by: str) -> Optional[Tuple[int, np.ndarray, np.ndarray]]:
+        # (origin, booked, revenue): booked[g, d] is the billboard-days group g had booked before
+        # day origin + d, revenue[g, d] their revenue. Built once per group_by; None when the
+        # matrix would exceed DENSE_CELLS.
+        if group_by not in self._running_totals:
+            codes, labels = self._group(group_by)
+            groups = len(labels)
+            if not len(self.booking_starts):
+                origin, width = 0, 1
+            else:
+                origin = int(self.booking_starts[0])
+                width = int(self.booking_ends.max()) - origin + 1
+            if groups * width > DENSE_CELLS:
+                self._running_totals[group_by] = None
+                return None
+            # +1 on each booking's first day and -1 on the day after its last: a running sum of
+            # that is the billboards booked each day, and a running sum of those the days booked.
+            groups_of = codes[self.booking_billboards] * width
+            opens = groups_of + (self.booking_starts - origin)
+            closes = groups_of + (self.booking_ends - origin)
+            size = groups * width
+            changes = np.bincount(opens, minlength=size) - np.bincount(closes, minlength=size)
+            rate_changes = np.bincount(
+                opens, weights=self.booking_prices, minlength=size
+            ) - np.bincount(closes, weights=self.booking_prices, minlength=size)
+            booked, revenue = (
+                np.zeros((groups, width + 1), dtype=np.int64),
+                np.zeros((groups, width + 1)),
+            )
+            np.cumsum(np.cumsum(changes.reshape(groups, width), axis=1), axis=1, out=booked[:, 1:])
+            np.cumsum(
+                np.cumsum(rate_changes.reshape(groups, width), axis=1), axis=1, out=revenue[:, 1:]
+            )
+            self._running_totals[group_by] = (origin, booked, revenue)
+        return self._running_totals[group_by]
+
+    def _count_expanded(
+        self, codes: np.ndarray, groups: int, bounds: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # One entry per (booking, period it touches), holding the days of the booking in that
+        # period.
+        first, stop = bounds[0], bounds[-1]
+        # Sorted by start, so the bookings starting after the range are a suffix to cut off.
+        candidates = slice(0, np.searchsorted(self.booking_starts, stop))
+        starts = np.maximum(self.booking_starts[candidates], first)
+        ends = np.minimum(self.booking_ends[candidates], stop)
+        inside = ends > starts
+        starts, ends = starts[inside], ends[inside]
+        groups_of = codes[self.booking_billboards[candidates][inside]]
+        prices = self.booking_prices[candidates][inside]
+        periods = len(bounds) - 1
+        first_period = np.searchsorted(bounds, starts, side="right") - 1
+        last_period = np.searchsorted(bounds, ends - 1, side="right") - 1
+        spans = last_period - first_period + 1
+        booking = np.repeat(np.arange(len(starts)), spans)
+        period = (
+            first_period[booking]
+            + np.arange(len(booking))
+            - np.repeat(np.cumsum(spans) - spans, spans)
+        )
+        days = np.minimum(ends[booking], bounds[period + 1]) - np.maximum(
+            starts[booking], bounds[period]
+        )
+        cells = groups_of[booking] * periods + period
+        booked = np.bincount(cells, weights=days, minlength=groups * periods).reshape(
+            groups, periods
+        )
+        revenue = np.bincount(
+            cells, weights=days * prices[booking], minlength=groups * periods
+        ).reshape(groups, periods)
+        return np.rint(booked).astype(np.int64), revenue
+
+    def _group(self, group_by: str) -> Tuple[np.ndarray, List[Tuple]]:
+        # Group code of every billboard plus the sorted group labels, built once per snapshot.
+        if group_by not in self._groups:
+            columns = GROUP_COLUMNS[group_by]
+            keys = (
+                list(zip(*(self.billboards[column] for column in columns)))
+                if columns
+                else [()] * len(self.dollars_per_day)
+            )
+            labels = sorted(
+                set(keys), key=lambda key: tuple((value is None, value or "") for value in key)
+            )
+            if not labels:
+                labels = [()] if not columns else []
+            positions = {label: i for i, label in enumerate(labels)}
+            codes = np.fromiter((positions[key] for key in keys), dtype=np.int64, count=len(keys))
+            self._groups[group_by] = (codes, labels)
+        return self._groups[group_by]
@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from typing import Any, Dict
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Engine settings per deployment. DB_POOL_PROFILE picks one; DB_POOL_* variables override
+# single values of it.
+POOL_PROFILES: Dict[str, Dict[str, Any]] = {
+    # PgBouncer in transaction mode may hand each transaction a different server connection,
+    # so statements must not stay prepared across transactions.
+    "pgbouncer-transaction": {
+        "pool_size": 5,
+        "max_overflow": 10,
+        "pool_timeout": 30.0,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "statement_cache_size": 0,
+        "statement_timeout": "60s",
+    },
+    # Straight to Postgres: each connection prepares a statement once and reuses it.
+    "direct": {
+        "pool_size": 10,
+        "max_overflow": 10,
+        "pool_timeout": 30.0,
+        "pool_recycle": 3600,
+        "pool_pre_ping": True,
+        "statement_cache_size": 500,
+        "statement_timeout": "60s",
+    },
+    # Bulk loads and exports on a direct connection: few connections held for long statements,
+    # and a busy pool is waited for rather than failed.
+    "batch": {
+        "pool_size": 2,
+        "max_overflow": 2,
+        "pool_timeout": 300.0,
+        "pool_recycle": -1,
+        "pool_pre_ping": True,
+        "statement_cache_size": 500,
+        "statement_timeout": "600s",
+    },
+}
+DEFAULT_POOL_PROFILE = "pgbouncer-transaction"
+# Upper bounds, in seconds, of the connection wait histogram buckets.
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def pool_profile_name() -> str:
+    name = os.getenv("DB_POOL_PROFILE", DEFAULT_POOL_PROFILE)
+    if name not in POOL_PROFILES:
+        raise ValueError(
+            f"Unknown DB_POOL_PROFILE {name!r}; expected one of {', '.join(POOL_PROFILES)}"
+        )
+    return name
+
+
+def pool_settings() -> Dict[str, Any]:
+    settings = dict(POOL_PROFILES[pool_profile_name()])
+    overrides = {
+        "pool_size": ("DB_POOL_SIZE", int),
+        "max_overflow": ("DB_POOL_MAX_OVERFLOW", int),
+        "pool_timeout": ("DB_POOL_TIMEOUT_SECONDS", float),
+        "pool_recycle": ("DB_POOL_RECYCLE_SECONDS", int),
+        "pool_pre_ping": ("DB_POOL_PRE_PING", lambda value: value.lower() in ("1", "true", "yes")),
+        "statement_cache_size": ("DB_STATEMENT_CACHE_SIZE", int),
+        "statement_timeout": ("DB_STATEMENT_TIMEOUT", str),
+    }
+    for setting, (variable, parse) in overrides.items():
+        value = os.getenv(variable)
+        if value:
+            settings[setting] = parse(value)
+    return settings
+
+
+def engine_options(settings: Dict[str, Any]) -> Dict[str, Any]:
+    # create_async_engine keyword arguments for pool_settings().
+    connect_args: Dict[str, Any] = {
+        # asyncpg's own cache and SQLAlchemy's cache of asyncpg prepared statements.
+        "statement_cache_size": settings["statement_cache_size"],
+        "prepared_statement_cache_size": settings["statement_cache_size"],
+        "server_settings": {
+            "statement_timeout": settings["statement_timeout"],
+            "idle_in_transaction_session_timeout": "30s",
+        },
+    }
+    if not settings["statement_cache_size"]:
+        # Unique names, so a statement prepared on a server connection another client used
+        # before never collides with ours.
+        connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4().hex}__"
+    return {
+        "poolclass": InstrumentedAsyncPool,
+        "pool_size": settings["pool_size"],
+        "max_overflow": settings["max_overflow"],
+        "pool_timeout": settings["pool_timeout"],
+        "pool_recycle": settings["pool_recycle"],
+        "pool_pre_ping": settings["pool_pre_ping"],
+        "connect_args": connect_args,
+    }
+
+
+class PoolMetrics:
+    def __init__(self, buckets=WAIT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._bucket_counts = [0] * (len(buckets) + 1)
+        self._wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+        self._timeouts = 0
+
+    def observe_wait(self, seconds: float) -> None:
+        with self._lock:
+            self._bucket_counts[bisect_left(self.buckets, seconds)] += 1
+            self._wait_seconds += seconds
+            self._max_wait_seconds = max(self._max_wait_seconds, seconds)
+
+    def observe_timeout(self) -> None:
+        with self._lock:
+            self._timeouts += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        # Buckets are cumulative: each counts the checkouts that waited at most that long.
+        with self._lock:
+            counts = list(self._bucket_counts)
+            checkouts = sum(counts)
+            cumulative, buckets = 0, {}
+            for bound, count in zip([*map(str, self.buckets), "+Inf"], counts):
+                cumulative += count
+                buckets[bound] = cumulative
+            return {
+                "checkouts": checkouts,
+                "timeouts": self._timeouts,
+                "wait_seconds_sum": round(self._wait_seconds, 6),
+                "wait_seconds_max": round(self._max_wait_seconds, 6),
+                "wait_seconds_mean": round(self._wait_seconds / checkouts, 6)
+                if checkouts
+                else None,
+                "wait_seconds_buckets": buckets,
+            }
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    # Times every checkout: the wait for a free connection, plus opening a new one when the
+    # pool is below pool_size + max_overflow. Each engine's pool counts its own checkouts.
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self) -> "InstrumentedAsyncPool":
+        # dispose() swaps in a new pool; the engine's counts carry on.
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.observe_timeout()
+            raise
+        self.metrics.observe_wait(time.perf_counter() - started)
+        return connection
+
+
+def pool_snapshot(pool: InstrumentedAsyncPool, name: str) -> Dict[str, Any]:
+    # name: "primary", or the replica's.
+    return {
+        "name": name,
+        "profile": pool_profile_name(),
+        "settings": pool_settings(),
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        **pool.metrics.snapshot(),
+    }
@@ -0,0 +1,255 @@
+import asyncio
+import itertools
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from redis import asyncio as aioredis
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.cache import worker_count
+from src.utils.ttl_cache import TTLCache
+
+# Read replicas for GET traffic. READ_REPLICA_URLS lists them, comma separated; without any,
+# every read goes to the primary. A probe every READ_REPLICA_CHECK_SECONDS measures each one's
+# replay lag, and a replica that is down or further behind than READ_REPLICA_MAX_LAG_SECONDS gets
+# no reads until a later probe finds it back. A client that committed a write in the last
+# READ_REPLICA_STICKY_SECONDS reads from the primary, so it always sees what it wrote; the
+# marker is kept in REDIS_URL (or READ_REPLICA_STICKY_REDIS_URL), so whichever worker serves
+# the client's next read knows about the write.
+
+# Seconds behind the primary, or NULL when unknown. Nothing is behind while the receiver is
+# streaming and all it received has been replayed (after a restart the receive position starts
+# back at a segment boundary, below the replay one): an idle primary writes nothing, so the last
+# replay timestamp keeps ageing without the replica falling behind. A database that is not in
+# recovery (a stand-in for a replica) is never behind.
+LAG_QUERY = text(
+    "SELECT CASE"
+    " WHEN NOT pg_is_in_recovery() THEN 0"
+    " WHEN pg_last_wal_replay_lsn() >= pg_last_wal_receive_lsn()"
+    " AND EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN 0"
+    " ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())::float8"
+    " END"
+)
+MAX_STICKY_CLIENTS = 100_000
+
+
+def read_replica_urls() -> List[str]:
+    return [url.strip() for url in os.getenv("READ_REPLICA_URLS", "").split(",") if url.strip()]
+
+
+def replica_max_lag() -> float:
+    return float(os.getenv("READ_REPLICA_MAX_LAG_SECONDS", "5"))
+
+
+def replica_check_interval() -> float:
+    return float(os.getenv("READ_REPLICA_CHECK_SECONDS", "5"))
+
+
+def replica_connect_timeout() -> float:
+    # Also bounds each probe, so a replica that stopped answering is dropped within one.
+    return float(os.getenv("READ_REPLICA_CONNECT_TIMEOUT_SECONDS", "2"))
+
+
+def replica_sticky_seconds() -> float:
+    # A replica may fall behind by up to the lag bound between two probes.
+    value = os.getenv("READ_REPLICA_STICKY_SECONDS")
+    return float(value) if value else replica_max_lag() + replica_check_interval()
+
+
+def replica_sticky_redis_url() -> Optional[str]:
+    return os.getenv("READ_REPLICA_STICKY_REDIS_URL") or os.getenv("REDIS_URL") or None
+
+
+class Replica:
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.name = f"{engine.url.host}:{engine.url.port or 5432}/{engine.url.database}"
+        # Unavailable until the first probe says otherwise.
+        self.available = False
+        self.lag_seconds: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "available": self.available,
+            "lag_seconds": None if self.lag_seconds is None else round(self.lag_seconds, 3),
+            "checked_at": self.checked_at,
+            "error": self.error,
+        }
+
+
+class ReplicaSession(Session):
+    # Sync side of a read session on a replica. It connects at the first statement rather than
+    # when the request starts, so a response served from the cache checks out no connection; if
+    # the replica fails to connect then (it went down since its last probe), the statement goes
+    # to the primary, the session's own bind, instead.
+    def __init__(self, *args: Any, router: "ReplicaRouter", replica: Replica, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.router = router
+        self.replica: Optional[Replica] = replica
+        self.connected = False
+
+    def get_bind(self, *args: Any, **kwargs: Any):
+        if self.replica is not None:
+            return self.replica.engine.sync_engine
+        return super().get_bind(*args, **kwargs)
+
+    def _connection_for_bind(self, engine, execution_options=None, **kw: Any):
+        if self.connected or self.replica is None or engine is not self.replica.engine.sync_engine:
+            return super()._connection_for_bind(engine, execution_options, **kw)
+        try:
+            connection = super()._connection_for_bind(engine, execution_options, **kw)
+        except Exception as exc:
+            self.router._set_unavailable(self.replica, exc)
+            self.router.reads["primary_connect_failed"] += 1
+            self.replica = None
+            return super()._connection_for_bind(self.bind, execution_options, **kw)
+        self.connected = True
+        self.router.reads["replica"] += 1
+        return connection
+
+
+class ReplicaRouter:
+    def __init__(
+        self,
+        engines: List[AsyncEngine],
+        max_lag: float,
+        sticky_seconds: float,
+        check_interval: float,
+        timeout: float,
+        redis_url: Optional[str] = None,
+    ):
+        self.replicas = [Replica(engine) for engine in engines]
+        self.max_lag = max_lag
+        self.sticky_seconds = sticky_seconds
+        self.check_interval = check_interval
+        self.timeout = timeout
+        # Clients that wrote through this worker, checked before asking Redis about the others.
+        self._writers: TTLCache[bool] = TTLCache(MAX_STICKY_CLIENTS, sticky_seconds)
+        self.redis = aioredis.from_url(redis_url) if redis_url and engines else None
+        self.prefix = "advertising-api:sticky"
+        self._turn = itertools.count()
+        # Read sessions by where they went: replica, or primary and why.
+        self.reads: Dict[str, int] = {
+            "replica": 0,
+            "primary_after_write": 0,
+            "primary_unavailable": 0,
+            "primary_connect_failed": 0,
+        }
+
+    async def mark_write(self, client: str) -> None:
+        if not self.replicas:
+            return
+        self._writers.set(client, True)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(
+                f"{self.prefix}:{client}", b"1", px=max(1, int(self.sticky_seconds * 1000))
+            )
+        except Exception as exc:
+            logging.warning(f"Read replica stickiness Redis write failed: {exc}")
+
+    async def wrote_lately(self, client: str) -> bool:
+        if self._writers.get(client):
+            return True
+        if self.redis is None:
+            return False
+        try:
+            return bool(await self.redis.exists(f"{self.prefix}:{client}"))
+        except Exception as exc:
+            # Unknown, so the primary: a read that may miss the client's own write is worse.
+            logging.warning(f"Read replica stickiness Redis read failed: {exc}")
+            return True
+
+    async def read_session(self, client: str, primary: AsyncEngine) -> Optional[AsyncSession]:
+        # A session for this client's reads on a caught-up replica (with the primary to fall back
+        # to if that fails to connect), or None to read from the primary straight away.
+        if not self.replicas:
+            return None
+        if await self.wrote_lately(client):
+            self.reads["primary_after_write"] += 1
+            return None
+        available = [replica for replica in self.replicas if replica.available]
+        if not available:
+            self.reads["primary_unavailable"] += 1
+            return None
+        replica = available[next(self._turn) % len(available)]
+        return AsyncSession(
+            primary,
+            expire_on_commit=False,
+            sync_session_class=ReplicaSession,
+            router=self,
+            replica=replica,
+        )
+
+    async def check(self) -> None:
+        await asyncio.gather(*(self._probe(replica) for replica in self.replicas))
+
+    async def check_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.check()
+
+    async def _probe(self, replica: Replica) -> None:
+        async def measure() -> Optional[float]:
+            async with replica.engine.connect() as connection:
+                return (await connection.execute(LAG_QUERY)).scalar()
+
+        try:
+            lag = await asyncio.wait_for(measure(), self.timeout)
+        except Exception as exc:
+            self._set_unavailable(replica, exc)
+            return
+        replica.lag_seconds = lag
+        replica.checked_at = time.time()
+        if lag is None or lag > self.max_lag:
+            if replica.available:
+                behind = "of unknown lag" if lag is None else f"{lag:.1f}s behind"
+                logging.warning(
+                    f"Read replica {replica.name} is {behind}, reading from the primary"
+                )
+            replica.available = False
+            replica.error = None
+            return
+        if not replica.available:
+            logging.info(f"Read replica {replica.name} is available, {lag:.1f}s behind")
+        replica.available = True
+        replica.error = None
+
+    def _set_unavailable(self, replica: Replica, exc: BaseException) -> None:
+        if replica.available:
+            logging.warning(
+                f"Read replica {replica.name} is down, reading from the primary: {exc!r}"
+            )
+        replica.available = False
+        replica.checked_at = time.time()
+        replica.error = repr(exc)
+
+    def snapshot(self) -> Dict[str, Any]:
+        # sticky_clients counts the clients that wrote through this worker.
+        return {
+            "replicas": [replica.snapshot() for replica in self.replicas],
+            "max_lag_seconds": self.max_lag,
+            "sticky_seconds": self.sticky_seconds,
+            "sticky_clients": len(self._writers),
+            "sticky_redis": self.redis is not None,
+            "reads": dict(self.reads),
+        }
+
+
+def check_replica_setup(router: ReplicaRouter) -> None:
+    # Without Redis, a client whose write went through one worker could read through another
+    # from a replica that has not replayed it yet.
+    if router.replicas and router.redis is None and worker_count() > 1:
+        raise RuntimeError(
+            "Read replicas need Redis with more than one worker: set REDIS_URL or "
+            "READ_REPLICA_STICKY_REDIS_URL, or leave READ_REPLICA_URLS empty"
+        )
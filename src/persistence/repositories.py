@@ -1,142 +1,947 @@
-from datetime import date
-from typing import Generic, List, Optional, Type, TypeVar
+import math
+from datetime import date, datetime
+from typing import Any, Dict, Generic, List, Optional, Set, Tuple, Type, TypeVar
 
+from sqlalchemy import (
+    Row,
+    String,
+    all_,
+    and_,
+    bindparam,
+    cast,
+    column,
+    delete,
+    exists,
+    func,
+    insert,
+    or_,
+    text,
+    true,
+    tuple_,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, Range
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncResult
 from sqlalchemy.orm import selectinload
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from src.persistence.models import Billboard, Campaign, CampaignBillboard, Location
+from src.persistence.availability_index import Booking, availability_index
+from src.persistence.errors import EXCLUSION_VIOLATION, UNIQUE_VIOLATION, BookingConflict, sqlstate
+from src.persistence.models import Billboard, Campaign, CampaignBillboard, Job, Location
+from src.persistence.transactions import commit_unless_in_unit, unit_of_work
+from src.utils.geo import EARTH_RADIUS_KM
 from src.utils.uuid import generate_prefixed_uuid
 
 T = TypeVar("T")
 
+# (created_at, id) of the last row of a page; rows strictly after it form the next page.
+PageKey = Tuple[datetime, str]
+
+# Flat columns for list handlers that serialize rows as they come, without ORM objects or models.
+BILLBOARD_ROW_COLUMNS = (
+    Billboard.id,
+    Billboard.location_id,
+    Billboard.width_mt,
+    Billboard.height_mt,
+    Billboard.dollars_per_day,
+    Billboard.created_at,
+    Location.address,
+    Location.city,
+    Location.state,
+    Location.country_code,
+    Location.lat,
+    Location.lng,
+)
+CAMPAIGN_ROW_COLUMNS = (
+    Campaign.id,
+    Campaign.name,
+    Campaign.start_date,
+    Campaign.end_date,
+    Campaign.created_at,
+)
+LOCATION_ROW_COLUMNS = (
+    Location.id,
+    Location.address,
+    Location.city,
+    Location.state,
+    Location.country_code,
+    Location.lat,
+    Location.lng,
+    Location.created_at,
+)
+
+# First key of the advisory locks that serialize bookings of one billboard (the second is a hash
+# of its id), so they cannot collide with advisory locks taken for anything else.
+BOOKING_LOCK_CLASS = 1
+
+
+def in_box(lat_column, lng_column, min_lat: float, max_lat: float, lng_ranges):
+    return and_(
+        lat_column.between(min_lat, max_lat),
+        or_(*[lng_column.between(min_lng, max_lng) for min_lng, max_lng in lng_ranges]),
+    )
+
+
+def distance_km(lat_column, lng_column, lat: float, lng: float):
+    # src.utils.geo.haversine_km, computed by the database.
+    half_dlat = func.radians(lat_column - lat) / 2
+    half_dlng = func.radians(lng_column - lng) / 2
+    a = func.power(func.sin(half_dlat), 2) + math.cos(math.radians(lat)) * func.cos(
+        func.radians(lat_column)
+    ) * func.power(func.sin(half_dlng), 2)
+    return (2 * EARTH_RADIUS_KM * func.asin(func.sqrt(func.least(a, 1.0)))).label("distance_km")
+
+
+def booking_period(start_date: date, end_date: date) -> Range:
+    # Campaign dates are inclusive at both ends.
+    return Range(start_date, end_date, bounds="[]")
+
+
 class BaseRepository(Generic[T]):
     def __init__(self, model: Type[T], session: AsyncSession):
         self.model = model
         self.session = session
 
+    # Writes commit on their own outside a unit_of_work and are left to it inside one. Sessions
+    # keep objects loaded across commits (expire_on_commit=False) and every column is set before
+    # the INSERT, so nothing is read back after a write.
     async def create(self, obj: T) -> T:
         self.session.add(obj)
-        await self.session.commit()
-        await self.session.refresh(obj)
+        await commit_unless_in_unit(self.session)
         return obj
 
+    async def create_many(self, objs: List[T]) -> List[T]:
+        # Flushed together: the INSERTs go out as one executemany.
+        self.session.add_all(objs)
+        await commit_unless_in_unit(self.session)
+        return objs
+
     async def get(self, id: str) -> Optional[T]:
         statement = select(self.model).where(self.model.id == id, self.model.is_deleted == False)
         result = await self.session.exec(statement)
         return result.first()
 
+    async def get_existing_ids(self, ids: List[str]) -> Set[str]:
+        statement = select(self.model.id).where(
+            self.model.id.in_(ids), self.model.is_deleted == False
+        )
+        result = await self.session.exec(statement)
+        return set(result.all())
+
+    async def insert_many(
+        self, records: List[Dict[str, Any]], ignore_conflicts: bool = False
+    ) -> List[str]:
+        # A single executemany, which SQLAlchemy sends to Postgres as multi-row INSERTs.
+        # Returns the ids actually inserted; committing is left to the caller.
+        if ignore_conflicts:
+            statement = pg_insert(self.model.__table__).on_conflict_do_nothing(
+                index_elements=["id"]
+            )
+        else:
+            statement = insert(self.model.__table__)
+        result = await self.session.exec(
+            statement.returning(self.model.__table__.c.id), params=records
+        )
+        return list(result.scalars().all())
+
+    async def get_by_ids(self, ids: List[str]) -> List[T]:
+        statement = select(self.model).where(self.model.id.in_(ids), self.model.is_deleted == False)
+        result = await self.session.exec(statement)
+        return result.all()
+
     async def get_all(self, offset: int = 0, limit: int = 100) -> List[T]:
-        statement = select(self.model).where(self.model.is_deleted == False).offset(offset).limit(limit)
+        statement = (
+            select(self.model).where(self.model.is_deleted == False).offset(offset).limit(limit)
+        )
         result = await self.session.exec(statement)
         return result.all()
 
+    async def get_page(
+        self, after: Optional[PageKey] = None, limit: int = 100
+    ) -> Tuple[List[T], Optional[PageKey]]:
+        statement = select(self.model).where(self.model.is_deleted == False)
+        return await self._get_keyset_page(statement, after, limit)
+
+    async def estimate_count(self) -> Optional[int]:
+        # Planner statistics instead of a full COUNT(*); refreshed by (auto)vacuum/analyze.
+        statement = text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)")
+        result = await self.session.exec(statement, params={"table": self.model.__tablename__})
+        estimate = result.scalar()
+        return estimate if estimate is not None and estimate >= 0 else None
+
+    async def _stream(self, statement, batch_size: int) -> AsyncResult:
+        # Server-side cursor: rows arrive batch_size at a time instead of all at once.
+        statement = statement.order_by(self.model.created_at, self.model.id).execution_options(
+            yield_per=batch_size
+        )
+        return await self.session.stream(statement)
+
+    async def _get_keyset_page(
+        self, statement, after: Optional[PageKey], limit: int
+    ) -> Tuple[List[T], Optional[PageKey]]:
+        if after:
+            statement = statement.where(
+                tuple_(self.model.created_at, self.model.id) > tuple_(*after)
+            )
+        statement = statement.order_by(self.model.created_at, self.model.id).limit(limit + 1)
+        result = await self.session.exec(statement)
+        rows = result.all()
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, (rows[-1].created_at, rows[-1].id)
+
+    async def _get_nearest(
+        self, statement, radius_km: float, offset: int, limit: int
+    ) -> Tuple[List[Row], int]:
+        # statement selects (id, distance_km) of the points in a bounding box; the page of those
+        # within radius_km, nearest first and equally near ones by id, and how many are in range.
+        points = statement.subquery()
+        in_range = points.c.distance_km <= radius_km
+        result = await self.session.exec(
+            select(points.c.id, points.c.distance_km)
+            .where(in_range)
+            .order_by(points.c.distance_km, points.c.id)
+            .offset(offset)
+            .limit(limit)
+        )
+        rows = result.all()
+        if len(rows) < limit and (rows or offset == 0):
+            # The page ends the results, so it already tells how many there are.
+            return rows, offset + len(rows)
+        result = await self.session.exec(select(func.count()).select_from(points).where(in_range))
+        return rows, result.one()
+
     async def update(self, obj: T) -> T:
         self.session.add(obj)
-        await self.session.commit()
-        await self.session.refresh(obj)
+        await commit_unless_in_unit(self.session)
+        return obj
+
+    async def update_values(self, id: str, values: Dict[str, Any]) -> Optional[T]:
+        # UPDATE ... RETURNING the row, without reading it first; None if there is no live id.
+        statement = (
+            update(self.model)
+            .where(self.model.id == id, self.model.is_deleted == False)
+            .values(**values)
+            .returning(self.model)
+        )
+        result = await self.session.exec(statement)
+        obj = result.scalars().first()
+        await commit_unless_in_unit(self.session)
         return obj
 
-    async def delete(self, id: str) -> None:
-        obj = await self.get(id)
-        if obj:
-            obj.is_deleted = True
-            self.session.add(obj)
-            await self.session.commit()
+    async def update_many(self, values: List[Dict[str, Any]]) -> None:
+        # One executemany UPDATE of live rows by id; every dict holds the id and the same columns.
+        table = self.model.__table__
+        statement = update(table).where(
+            table.c.id == bindparam("row_id"), table.c.is_deleted == False
+        )
+        params = [
+            {"row_id": row["id"], **{key: value for key, value in row.items() if key != "id"}}
+            for row in values
+        ]
+        await self.session.exec(statement, params=params)
+        await commit_unless_in_unit(self.session)
+
+    async def update_from_values(self, rows: List[Dict[str, Any]]) -> Set[str]:
+        # One UPDATE ... FROM (VALUES ...) for rows that each set their own columns, {"id": ...,
+        # column: value}. A column a row leaves out keeps its value: NULL stands for it, as the
+        # columns are NOT NULL. Returns the ids of the live rows updated.
+        table = self.model.__table__
+        names = [
+            name
+            for name in table.columns.keys()
+            if name != "id" and any(name in row for row in rows)
+        ]
+        if not names:
+            return await self.get_existing_ids([row["id"] for row in rows])
+        batch = values(
+            column("id", String),
+            *(column(name, table.c[name].type) for name in names),
+            name="batch",
+        ).data([(row["id"], *(row.get(name) for name in names)) for row in rows])
+        statement = (
+            update(table)
+            .where(table.c.id == batch.c.id, table.c.is_deleted == False)
+            # A column that is NULL in every row comes out of VALUES as text.
+            .values(
+                {
+                    name: func.coalesce(cast(batch.c[name], table.c[name].type), table.c[name])
+                    for name in names
+                }
+            )
+            .returning(table.c.id)
+        )
+        result = await self.session.exec(statement)
+        updated = set(result.scalars().all())
+        await commit_unless_in_unit(self.session)
+        return updated
+
+    async def delete(self, id: str) -> bool:
+        # Soft delete in one statement; False if there is no live id.
+        deleted = await self.delete_many([id])
+        return bool(deleted)
+
+    async def delete_many(self, ids: List[str]) -> Set[str]:
+        # Returns the ids that were live and are deleted now.
+        statement = (
+            update(self.model)
+            .where(self.model.id.in_(ids), self.model.is_deleted == False)
+            .values(is_deleted=True)
+            .returning(self.model.id)
+        )
+        result = await self.session.exec(statement)
+        deleted = set(result.scalars().all())
+        await commit_unless_in_unit(self.session)
+        return deleted
+
 
 class LocationRepository(BaseRepository[Location]):
     async def create(self, obj: Location) -> Location:
         obj.id = generate_prefixed_uuid("loc")
         return await super().create(obj)
 
+    async def get_with_billboard_ids(self, id: str) -> Optional[Tuple[Location, List[str]]]:
+        # The location and the ids of its live billboards in one round trip.
+        billboard_ids = (
+            select(func.array_agg(Billboard.id))
+            .where(Billboard.location_id == self.model.id, Billboard.is_deleted == False)
+            .scalar_subquery()
+        )
+        statement = select(self.model, billboard_ids).where(
+            self.model.id == id, self.model.is_deleted == False
+        )
+        result = await self.session.exec(statement)
+        row = result.first()
+        if row is None:
+            return None
+        location, ids = row
+        return location, ids or []
+
+    async def get_ids_by_address(self, addresses: List[str]) -> List[Tuple[str, str]]:
+        # (address, id) of every live location at one of the addresses, several if it is shared.
+        statement = select(self.model.address, self.model.id).where(
+            self.model.address.in_(addresses), self.model.is_deleted == False
+        )
+        result = await self.session.exec(statement)
+        return result.all()
+
+    async def get_rows(self, offset: int = 0, limit: int = 100) -> List[Row]:
+        statement = (
+            select(*LOCATION_ROW_COLUMNS)
+            .where(self.model.is_deleted == False)
+            .offset(offset)
+            .limit(limit)
+        )
+        result = await self.session.exec(statement)
+        return result.all()
+
+    async def get_row_page(
+        self, after: Optional[PageKey] = None, limit: int = 100
+    ) -> Tuple[List[Row], Optional[PageKey]]:
+        statement = select(*LOCATION_ROW_COLUMNS).where(self.model.is_deleted == False)
+        return await self._get_keyset_page(statement, after, limit)
+
+    async def stream_rows(self, batch_size: int = 1000) -> AsyncResult:
+        return await self._stream(
+            select(*LOCATION_ROW_COLUMNS).where(self.model.is_deleted == False), batch_size
+        )
+
+    async def get_rows_by_ids(self, ids: List[str]) -> List[Row]:
+        statement = select(*LOCATION_ROW_COLUMNS).where(
+            self.model.id.in_(ids), self.model.is_deleted == False
+        )
+        result = await self.session.exec(statement)
+        return result.all()
+
+    async def get_coordinates_in_box(
+        self, min_lat: float, max_lat: float, lng_ranges: List[Tuple[float, float]], limit: int
+    ) -> List[Tuple[str, float, float]]:
+        # At most limit rows, in no particular order: enough to tell the box holds too many.
+        statement = (
+            select(self.model.id, self.model.lat, self.model.lng)
+            .where(
+                self.model.is_deleted == False,
+                in_box(self.model.lat, self.model.lng, min_lat, max_lat, lng_ranges),
+            )
+            .limit(limit)
+        )
+        result = await self.session.exec(statement)
+        return result.all()
+
+    async def get_nearest_in_box(
+        self,
+        lat: float,
+        lng: float,
+        radius_km: float,
+        min_lat: float,
+        max_lat: float,
+        lng_ranges: List[Tuple[float, float]],
+        offset: int,
+        limit: int,
+    ) -> Tuple[List[Row], int]:
+        statement = select(
+            self.model.id, distance_km(self.model.lat, self.model.lng, lat, lng)
+        ).where(
+            self.model.is_deleted == False,
+            in_box(self.model.lat, self.model.lng, min_lat, max_lat, lng_ranges),
+        )
+        return await self._get_nearest(statement, radius_km, offset, limit)
+
+
 class BillboardRepository(BaseRepository[Billboard]):
     async def create(self, obj: Billboard) -> Billboard:
         obj.id = generate_prefixed_uuid("bill")
         return await super().create(obj)
 
+    async def create_row(self, obj: Billboard) -> Row:
+        # INSERT ... RETURNING joined to the location: a BILLBOARD_ROW_COLUMNS row in one
+        # statement, with no refresh or location lookup after the commit.
+        obj.id = generate_prefixed_uuid("bill")
+        values = {column.key: getattr(obj, column.key) for column in self.model.__table__.columns}
+        row = await self._write_returning_row(insert(self.model).values(**values))
+        await commit_unless_in_unit(self.session)
+        return row
 
-    async def get_with_location(self, id: str) -> Billboard:
-        statement = (
-            select(self.model)
-            .options(selectinload(self.model.location))
-            .where(self.model.id == id, self.model.is_deleted == False)
+    async def update_row(self, id: str, values: Dict[str, Any]) -> Optional[Row]:
+        # UPDATE ... RETURNING joined to the location; None if there is no live billboard id.
+        statement = update(self.model).where(self.model.id == id, self.model.is_deleted == False)
+        row = await self._write_returning_row(statement.values(**values))
+        await commit_unless_in_unit(self.session)
+        return row
+
+    async def _write_returning_row(self, statement) -> Optional[Row]:
+        written = statement.returning(*BILLBOARD_ROW_COLUMNS[:6]).cte("written")
+        select_row = select(written, *BILLBOARD_ROW_COLUMNS[6:]).outerjoin(
+            Location, and_(Location.id == written.c.location_id, Location.is_deleted == False)
         )
+        result = await self.session.exec(select_row)
+        return result.first()
+
+    async def get_rows_with_location(self, offset: int = 0, limit: int = 100) -> List[Row]:
+        statement = self._rows_with_location().offset(offset).limit(limit)
         result = await self.session.exec(statement)
+        return result.all()
+
+    async def get_row_with_location(self, id: str) -> Optional[Row]:
+        result = await self.session.exec(self._rows_with_location().where(self.model.id == id))
         return result.first()
 
-    async def get_all_with_location(self, offset: int = 0, limit: int = 100) -> List[Billboard]:
+    async def get_row_page_with_location(
+        self, after: Optional[PageKey] = None, limit: int = 100
+    ) -> Tuple[List[Row], Optional[PageKey]]:
+        return await self._get_keyset_page(self._rows_with_location(), after, limit)
+
+    async def stream_rows(self, batch_size: int = 1000) -> AsyncResult:
+        statement = select(*BILLBOARD_ROW_COLUMNS[:6]).where(self.model.is_deleted == False)
+        return await self._stream(statement, batch_size)
+
+    def _rows_with_location(self):
+        return (
+            select(*BILLBOARD_ROW_COLUMNS)
+            .outerjoin(Location, Location.id == self.model.location_id)
+            .where(self.model.is_deleted == False)
+        )
+
+    async def get_occupancy_rows(self) -> List[Row]:
+        # What the occupancy snapshot groups and prices live billboards by.
+        statement = (
+            select(
+                self.model.id,
+                self.model.location_id,
+                Location.country_code,
+                Location.state,
+                Location.city,
+                self.model.dollars_per_day,
+            )
+            .outerjoin(Location, Location.id == self.model.location_id)
+            .where(self.model.is_deleted == False)
+            .order_by(self.model.id)
+        )
+        result = await self.session.exec(statement)
+        return result.all()
+
+    async def get_by_ids_with_location(self, ids: List[str]) -> List[Billboard]:
         statement = (
             select(self.model)
             .options(selectinload(self.model.location))
-            .where(self.model.is_deleted == False)
-            .offset(offset)
+            .where(self.model.id.in_(ids), self.model.is_deleted == False)
+        )
+        result = await self.session.exec(statement)
+        return result.all()
+
+    async def get_rows_with_location_by_ids(self, ids: List[str]) -> List[Row]:
+        result = await self.session.exec(self._rows_with_location().where(self.model.id.in_(ids)))
+        return result.all()
+
+    async def get_coordinates_in_box(
+        self, min_lat: float, max_lat: float, lng_ranges: List[Tuple[float, float]], limit: int
+    ) -> List[Tuple[str, float, float]]:
+        statement = (
+            select(self.model.id, Location.lat, Location.lng)
+            .join(Location, Location.id == self.model.location_id)
+            .where(
+                self.model.is_deleted == False,
+                Location.is_deleted == False,
+                in_box(Location.lat, Location.lng, min_lat, max_lat, lng_ranges),
+            )
             .limit(limit)
         )
         result = await self.session.exec(statement)
         return result.all()
 
-    async def get_all_by_location(self, id) -> List[Billboard]:
+    async def get_nearest_in_box(
+        self,
+        lat: float,
+        lng: float,
+        radius_km: float,
+        min_lat: float,
+        max_lat: float,
+        lng_ranges: List[Tuple[float, float]],
+        offset: int,
+        limit: int,
+    ) -> Tuple[List[Row], int]:
         statement = (
-            select(self.model)
-            .where(self.model.is_deleted == False, self.model.location_id == id)
+            select(self.model.id, distance_km(Location.lat, Location.lng, lat, lng))
+            .join(Location, Location.id == self.model.location_id)
+            .where(
+                self.model.is_deleted == False,
+                Location.is_deleted == False,
+                in_box(Location.lat, Location.lng, min_lat, max_lat, lng_ranges),
+            )
+        )
+        return await self._get_nearest(statement, radius_km, offset, limit)
+
+    async def get_location_ids_with_billboards(self, location_ids: List[str]) -> Set[str]:
+        statement = (
+            select(self.model.location_id)
+            .where(self.model.location_id.in_(location_ids), self.model.is_deleted == False)
+            .distinct()
+        )
+        result = await self.session.exec(statement)
+        return set(result.all())
+
+    async def get_all_by_location(self, id) -> List[Billboard]:
+        statement = select(self.model).where(
+            self.model.is_deleted == False, self.model.location_id == id
         )
         result = await self.session.exec(statement)
         return result.all()
 
+
 class CampaignRepository(BaseRepository[Campaign]):
     async def create(self, obj: Campaign) -> Campaign:
         obj.id = generate_prefixed_uuid("camp")
         return await super().create(obj)
 
+    async def get_rows(self, offset: int = 0, limit: int = 100) -> List[Row]:
+        statement = (
+            select(*CAMPAIGN_ROW_COLUMNS)
+            .where(self.model.is_deleted == False)
+            .offset(offset)
+            .limit(limit)
+        )
+        result = await self.session.exec(statement)
+        return result.all()
+
+    async def get_row_page(
+        self, after: Optional[PageKey] = None, limit: int = 100
+    ) -> Tuple[List[Row], Optional[PageKey]]:
+        statement = select(*CAMPAIGN_ROW_COLUMNS).where(self.model.is_deleted == False)
+        return await self._get_keyset_page(statement, after, limit)
+
+    async def get_summary_rows(
+        self, offset: int = 0, limit: int = 100, ids: Optional[List[str]] = None
+    ) -> List[Row]:
+        statement = (
+            self._summary_rows(ids)
+            .order_by(self.model.created_at, self.model.id)
+            .offset(offset)
+            .limit(limit)
+        )
+        result = await self.session.exec(statement)
+        return result.all()
+
+    async def get_summary_row_page(
+        self, after: Optional[PageKey] = None, limit: int = 100, ids: Optional[List[str]] = None
+    ) -> Tuple[List[Row], Optional[PageKey]]:
+        return await self._get_keyset_page(self._summary_rows(ids), after, limit)
+
+    def _summary_rows(self, ids: Optional[List[str]]):
+        # id, name, start_date, end_date, created_at, days, billboard_count, total_dollar_amount.
+        # Summed by Postgres, one LATERAL probe of the campaign's links per campaign in the page,
+        # so no billboard row leaves the database and a page costs the same however many
+        # campaigns there are. Dates are inclusive and every linked billboard counts, as in the
+        # campaign detail.
+        days = self.model.end_date - self.model.start_date + 1
+        totals = (
+            select(
+                func.count(Billboard.id).label("billboard_count"),
+                func.sum(Billboard.dollars_per_day * days).label("total_dollar_amount"),
+            )
+            .select_from(CampaignBillboard)
+            .join(Billboard, Billboard.id == CampaignBillboard.billboard_id)
+            .where(CampaignBillboard.campaign_id == self.model.id)
+            .lateral("totals")
+        )
+        statement = (
+            select(
+                *CAMPAIGN_ROW_COLUMNS,
+                days.label("days"),
+                totals.c.billboard_count,
+                func.coalesce(totals.c.total_dollar_amount, 0).label("total_dollar_amount"),
+            )
+            .outerjoin(totals, true())
+            .where(self.model.is_deleted == False)
+        )
+        if ids is not None:
+            statement = statement.where(self.model.id.in_(ids))
+        return statement
+
+    async def get_detail_rows(self, id: str) -> List[Row]:
+        # The campaign's columns followed by one of its billboards' BILLBOARD_ROW_COLUMNS per
+        # row, all None for a campaign without billboards: the detail view in one round trip.
+        statement = (
+            select(*CAMPAIGN_ROW_COLUMNS, *BILLBOARD_ROW_COLUMNS)
+            .outerjoin(CampaignBillboard, CampaignBillboard.campaign_id == self.model.id)
+            .outerjoin(Billboard, Billboard.id == CampaignBillboard.billboard_id)
+            .outerjoin(Location, Location.id == Billboard.location_id)
+            .where(self.model.id == id, self.model.is_deleted == False)
+        )
+        result = await self.session.exec(statement)
+        return result.all()
+
+    async def get_locked(self, id: str, shared: bool = False) -> Optional[Campaign]:
+        # Bookings hold the campaign FOR SHARE until they commit, so its dates cannot change under
+        # them; changing the dates takes it FOR UPDATE.
+        statement = (
+            select(self.model)
+            .where(self.model.id == id, self.model.is_deleted == False)
+            .with_for_update(read=shared)
+            .execution_options(populate_existing=True)
+        )
+        result = await self.session.exec(statement)
+        return result.first()
+
+    async def delete_many(self, ids: List[str]) -> Set[str]:
+        # Their bookings stop holding their billboards in the same commit.
+        async with unit_of_work(self.session):
+            deleted = await super().delete_many(ids)
+            if deleted:
+                await self.session.exec(
+                    update(CampaignBillboard)
+                    .where(CampaignBillboard.campaign_id.in_(deleted))
+                    .values(is_active=False)
+                )
+        return deleted
+
+    async def get_periods(self, ids: List[str], lock: bool = False) -> Dict[str, Tuple[date, date]]:
+        # With lock, the campaigns are held FOR UPDATE, taken in id order, until the commit.
+        statement = select(self.model.id, self.model.start_date, self.model.end_date).where(
+            self.model.id.in_(ids), self.model.is_deleted == False
+        )
+        if lock:
+            statement = statement.order_by(self.model.id).with_for_update()
+        result = await self.session.exec(statement)
+        return {id: (start_date, end_date) for id, start_date, end_date in result.all()}
+
+
 class CampaignBillboardRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def link_billboard_campaign(self, campaign_id: str, billboard_id: str):
-        link = CampaignBillboard(campaign_id=campaign_id, billboard_id=billboard_id)
-        self.session.add(link)
-        await self.session.commit()
-        await self.session.refresh(link)
-        return link
+    async def lock_billboards(
+        self, billboard_ids: List[str], timeout_ms: Optional[int] = None
+    ) -> None:
+        # Transaction-scoped advisory locks, one per billboard, released by the commit or rollback.
+        # Taken in key order, so two bookings sharing billboards queue up instead of deadlocking;
+        # bookings of other billboards never wait. A wait longer than timeout_ms fails with
+        # lock_not_available.
+        if timeout_ms:
+            await self.session.exec(
+                text("SELECT set_config('lock_timeout', :timeout, true)"),
+                params={"timeout": f"{timeout_ms}ms"},
+            )
+        statement = text(
+            "SELECT pg_advisory_xact_lock(:lock_class, key) "
+            "FROM (SELECT DISTINCT hashtext(id) AS key FROM unnest(CAST(:ids AS text[])) AS id "
+            "ORDER BY key) AS keys"
+        )
+        await self.session.exec(
+            statement, params={"lock_class": BOOKING_LOCK_CLASS, "ids": billboard_ids}
+        )
+
+    async def link_billboards_campaign(
+        self,
+        campaign_id: str,
+        billboard_ids: List[str],
+        start_date: date,
+        end_date: date,
+        skip_conflicts: bool = False,
+    ) -> Set[str]:
+        # Returns the billboards booked. With skip_conflicts, a billboard someone else booked
+        # meanwhile is left out (ON CONFLICT DO NOTHING also covers exclusion constraints);
+        # otherwise it raises BookingConflict and nothing is booked.
+        period = booking_period(start_date, end_date)
+        rows = [
+            {"campaign_id": campaign_id, "billboard_id": billboard_id, "booking_period": period}
+            for billboard_id in billboard_ids
+        ]
+        statement = pg_insert(CampaignBillboard).values(rows)
+        if skip_conflicts:
+            statement = statement.on_conflict_do_nothing()
+        try:
+            result = await self.session.exec(statement.returning(CampaignBillboard.billboard_id))
+            booked = set(result.scalars().all())
+            await commit_unless_in_unit(self.session)
+        except IntegrityError as exc:
+            await self._raise_booking_conflict(exc)
+        return booked
+
+    async def insert_many(self, records: List[Dict[str, Any]]) -> None:
+        # campaign_id/billboard_id/booking_period rows of any number of campaigns, as one
+        # executemany.
+        await self.session.exec(insert(CampaignBillboard.__table__), params=records)
+
+    async def _raise_booking_conflict(self, exc: IntegrityError) -> None:
+        await self.session.rollback()
+        if sqlstate(exc) in (EXCLUSION_VIOLATION, UNIQUE_VIOLATION):
+            raise BookingConflict(str(exc.orig)) from exc
+        raise exc
+
+    async def unlink_billboards_campaign(
+        self, campaign_id: str, billboard_ids: List[str]
+    ) -> Set[str]:
+        statement = (
+            delete(CampaignBillboard)
+            .where(
+                CampaignBillboard.campaign_id == campaign_id,
+                CampaignBillboard.billboard_id.in_(billboard_ids),
+            )
+            .returning(CampaignBillboard.billboard_id)
+        )
+        result = await self.session.exec(statement)
+        removed = set(result.scalars().all())
+        await commit_unless_in_unit(self.session)
+        return removed
 
     async def unlink_billboard_campaign(self, campaign_id: str, billboard_id: str):
         statement = select(CampaignBillboard).where(
             CampaignBillboard.campaign_id == campaign_id,
-            CampaignBillboard.billboard_id == billboard_id
+            CampaignBillboard.billboard_id == billboard_id,
         )
         result = await self.session.exec(statement)
         link = result.first()
         if link:
             await self.session.delete(link)
-            await self.session.commit()
+            await commit_unless_in_unit(self.session)
         return link
 
+    async def get_campaign_ids_with_billboards(self, campaign_ids: List[str]) -> Set[str]:
+        statement = (
+            select(CampaignBillboard.campaign_id)
+            .where(CampaignBillboard.campaign_id.in_(campaign_ids))
+            .distinct()
+        )
+        result = await self.session.exec(statement)
+        return set(result.all())
+
     async def get_billboards_for_campaign(self, campaign_id: str) -> List[Billboard]:
-        statement = select(Billboard).options(selectinload(Billboard.location)).join(CampaignBillboard).where(CampaignBillboard.campaign_id == campaign_id)
+        statement = (
+            select(Billboard)
+            .options(selectinload(Billboard.location))
+            .join(CampaignBillboard)
+            .where(CampaignBillboard.campaign_id == campaign_id)
+        )
+        result = await self.session.exec(statement)
+        return result.all()
+
+    async def get_billboard_rows_for_campaigns(self, campaign_ids: List[str]) -> List[Row]:
+        # Every billboard of a page of campaigns in one query, however many campaigns it holds.
+        statement = (
+            select(CampaignBillboard.campaign_id, *BILLBOARD_ROW_COLUMNS)
+            .join(Billboard, Billboard.id == CampaignBillboard.billboard_id)
+            .outerjoin(Location, Location.id == Billboard.location_id)
+            .where(CampaignBillboard.campaign_id.in_(campaign_ids))
+        )
         result = await self.session.exec(statement)
         return result.all()
 
     async def get_campaigns_for_billboard(self, billboard_id: str) -> List[Campaign]:
-        statement = select(Campaign).join(CampaignBillboard).where(CampaignBillboard.billboard_id == billboard_id)
+        statement = (
+            select(Campaign)
+            .join(CampaignBillboard)
+            .where(CampaignBillboard.billboard_id == billboard_id)
+        )
         result = await self.session.exec(statement)
         return result.all()
 
-    async def get_available_billboards(self, start_date: date, end_date: date) -> List[Billboard]:
-        subq = select(CampaignBillboard.billboard_id).join(Campaign).where(
-            (Campaign.start_date <= end_date) &
-            (Campaign.end_date >= start_date) &
-            (Campaign.is_deleted == False)
+    async def get_available_billboard_rows(
+        self, start_date: date, end_date: date, use_index: bool = True
+    ) -> List[Row]:
+        # use_index: the caller knows the in-memory index is current; otherwise NOT EXISTS.
+        statement = (
+            select(*BILLBOARD_ROW_COLUMNS)
+            .outerjoin(Location, Location.id == Billboard.location_id)
+            .where(Billboard.is_deleted == False)
         )
-        statement = select(Billboard).options(selectinload(Billboard.location)).where(~Billboard.id.in_(subq))
+        if use_index and availability_index.loaded:
+            busy = availability_index.busy_billboards(start_date, end_date)
+            if busy:
+                # One array parameter rather than an IN list, which would hit the bind limit.
+                statement = statement.where(
+                    Billboard.id != all_(bindparam("busy_ids", list(busy), type_=ARRAY(String)))
+                )
+        else:
+            statement = statement.where(~self._overlapping_booking(start_date, end_date))
         result = await self.session.exec(statement)
         return result.all()
 
-    async def check_billboard_availability(self, id, start_date: date, end_date: date) -> bool:
-        subq = select(CampaignBillboard.billboard_id).join(Campaign).where(
-            (Campaign.start_date <= end_date) &
-            (Campaign.end_date >= start_date) &
-            (Campaign.is_deleted == False)
+    async def get_conflicting_bookings(
+        self, billboard_ids: List[str], start_date: date, end_date: date
+    ) -> Dict[str, str]:
+        # billboard_id -> one live campaign already holding it between start_date and end_date.
+        statement = select(CampaignBillboard.billboard_id, CampaignBillboard.campaign_id).where(
+            CampaignBillboard.billboard_id.in_(billboard_ids),
+            CampaignBillboard.is_active == True,
+            CampaignBillboard.booking_period.overlaps(booking_period(start_date, end_date)),
+        )
+        result = await self.session.exec(statement)
+        return {billboard_id: campaign_id for billboard_id, campaign_id in result.all()}
+
+    async def get_bookings_for_billboards(self, billboard_ids: List[str]) -> List[Booking]:
+        statement = (
+            select(
+                CampaignBillboard.billboard_id,
+                CampaignBillboard.campaign_id,
+                Campaign.start_date,
+                Campaign.end_date,
+            )
+            .join(Campaign, Campaign.id == CampaignBillboard.campaign_id)
+            .where(CampaignBillboard.billboard_id.in_(billboard_ids), Campaign.is_deleted == False)
+        )
+        result = await self.session.exec(statement)
+        return [tuple(row) for row in result.all()]
+
+    async def get_active_bookings(self) -> List[Booking]:
+        statement = (
+            select(
+                CampaignBillboard.billboard_id,
+                CampaignBillboard.campaign_id,
+                Campaign.start_date,
+                Campaign.end_date,
+            )
+            .join(Campaign, Campaign.id == CampaignBillboard.campaign_id)
+            .where(Campaign.is_deleted == False)
+        )
+        result = await self.session.exec(statement)
+        return [tuple(row) for row in result.all()]
+
+    async def get_active_booking_days(self) -> Tuple[List[str], List[int], List[int]]:
+        # Every active booking of a live billboard as three parallel arrays built by the database,
+        # (billboard_id, first day, day after the last), days counted from 1970-01-01: one row
+        # to decode instead of one per booking.
+        statement = text(
+            "SELECT coalesce(array_agg(cb.billboard_id), '{}'), "
+            "coalesce(array_agg(lower(cb.booking_period) - DATE '1970-01-01'), '{}'), "
+            "coalesce(array_agg(upper(cb.booking_period) - DATE '1970-01-01'), '{}') "
+            "FROM campaign_billboards cb JOIN billboards b ON b.id = cb.billboard_id "
+            "WHERE cb.is_active AND NOT b.is_deleted"
         )
-        statement = select(Billboard).where(Billboard.id == id, ~Billboard.id.in_(subq))
         result = await self.session.exec(statement)
-        return result.first() is not None
+        billboard_ids, starts, ends = result.one()
+        return billboard_ids, starts, ends
+
+    async def stream_bookings(self, batch_size: int = 1000) -> AsyncResult:
+        statement = (
+            select(
+                CampaignBillboard.campaign_id,
+                CampaignBillboard.billboard_id,
+                Campaign.start_date,
+                Campaign.end_date,
+            )
+            .join(Campaign, Campaign.id == CampaignBillboard.campaign_id)
+            .where(Campaign.is_deleted == False)
+            .order_by(CampaignBillboard.campaign_id, CampaignBillboard.billboard_id)
+            .execution_options(yield_per=batch_size)
+        )
+        return await self.session.stream(statement)
+
+    def _overlapping_booking(self, start_date: date, end_date: date):
+        # Correlated on Billboard.id, so each billboard is one probe of the exclusion
+        # constraint's GiST index on (billboard_id, booking_period).
+        return exists().where(
+            CampaignBillboard.billboard_id == Billboard.id,
+            CampaignBillboard.is_active == True,
+            CampaignBillboard.booking_period.overlaps(booking_period(start_date, end_date)),
+        )
+
+
+class JobRepository(BaseRepository[Job]):
+    async def create(self, obj: Job) -> Job:
+        obj.id = generate_prefixed_uuid("job")
+        return await super().create(obj)
+
+    async def get(self, id: str) -> Optional[Job]:
+        result = await self.session.exec(select(self.model).where(self.model.id == id))
+        return result.first()
+
+    async def get_resumable_ids(self, stale_before: datetime) -> List[str]:
+        statement = (
+            select(self.model.id)
+            .where(
+                or_(
+                    self.model.status == "queued",
+                    and_(self.model.status == "running", self._stale(stale_before)),
+                )
+            )
+            .order_by(self.model.created_at)
+        )
+        result = await self.session.exec(statement)
+        return list(result.all())
+
+    async def claim(self, id: str, worker: str, stale_before: datetime) -> Optional[Job]:
+        # Atomic, so when several processes resume the same jobs only one of them runs each.
+        now = datetime.utcnow()
+        statement = (
+            update(self.model)
+            .where(
+                self.model.id == id,
+                or_(
+                    self.model.status == "queued",
+                    and_(self.model.status == "running", self._stale(stale_before)),
+                ),
+            )
+            .values(
+                status="running",
+                claimed_by=worker,
+                heartbeat_at=now,
+                started_at=func.coalesce(self.model.started_at, now),
+                attempts=self.model.attempts + 1,
+            )
+            .returning(self.model.id)
+        )
+        result = await self.session.exec(statement)
+        claimed = result.scalar()
+        await commit_unless_in_unit(self.session)
+        return await self.get(claimed) if claimed else None
+
+    async def update_claimed(self, id: str, worker: str, **values: Any) -> bool:
+        # Only touches the job while this worker still holds it; False means it was taken over.
+        statement = (
+            update(self.model)
+            .where(
+                self.model.id == id, self.model.claimed_by == worker, self.model.status == "running"
+            )
+            .values(heartbeat_at=datetime.utcnow(), **values)
+        )
+        result = await self.session.exec(statement)
+        await commit_unless_in_unit(self.session)
+        return result.rowcount > 0
+
+    def _stale(self, stale_before: datetime):
+        return or_(self.model.heartbeat_at.is_(None), self.model.heartbeat_at < stale_before)
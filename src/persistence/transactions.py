@@ -0,0 +1,70 @@
+import asyncio
+import random
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+from sqlalchemy.exc import DBAPIError
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.persistence.errors import RETRYABLE_SQLSTATES, sqlstate
+
+T = TypeVar("T")
+
+# Key in session.info counting the unit_of_work blocks open on that session.
+UNIT_OF_WORK_DEPTH = "unit_of_work_depth"
+
+
+def is_retryable(exc: BaseException) -> bool:
+    return isinstance(exc, DBAPIError) and sqlstate(exc) in RETRYABLE_SQLSTATES
+
+
+async def retry_transaction(
+    session: AsyncSession,
+    operation: Callable[[], Awaitable[T]],
+    attempts: int,
+    base_delay: float,
+) -> T:
+    # Runs operation, which commits its own work, up to attempts times while it fails with a
+    # serialization failure, deadlock or lock timeout. Every failure is rolled back first, so the
+    # transaction's locks are released before anyone waits on them again.
+    for attempt in range(1, attempts + 1):
+        try:
+            return await operation()
+        except Exception as exc:
+            await session.rollback()
+            if attempt == attempts or not is_retryable(exc):
+                raise
+            # Full jitter: clients that collided once do not retry in lockstep.
+            await asyncio.sleep(random.uniform(0, base_delay * 2 ** (attempt - 1)))
+
+
+@asynccontextmanager
+async def unit_of_work(session: AsyncSession) -> AsyncIterator[AsyncSession]:
+    # The writes of a service call as one transaction. Repository writes inside the block do not
+    # commit: the ORM queues added and changed objects, and the outermost block flushes them
+    # once, INSERTs of one table batched into executemany, and commits (or rolls back on an
+    # exception). Blocks nest, so a service that calls others with the same session makes their
+    # writes part of its own transaction. Cache invalidation belongs after the outermost block,
+    # once the writes are visible.
+    depth = session.info.get(UNIT_OF_WORK_DEPTH, 0)
+    session.info[UNIT_OF_WORK_DEPTH] = depth + 1
+    try:
+        yield session
+        if depth == 0:
+            await session.commit()
+    except BaseException:
+        if depth == 0:
+            await session.rollback()
+        raise
+    finally:
+        session.info[UNIT_OF_WORK_DEPTH] = depth
+
+
+def in_unit_of_work(session: AsyncSession) -> bool:
+    return session.info.get(UNIT_OF_WORK_DEPTH, 0) > 0
+
+
+async def commit_unless_in_unit(session: AsyncSession) -> None:
+    # Repository writes commit on their own, unless a unit_of_work commits them later.
+    if not in_unit_of_work(session):
+        await session.commit()
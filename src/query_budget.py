@@ -0,0 +1,151 @@
+import functools
+import logging
+import os
+import re
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# Fewer statements than this per request are fine whatever the route.
+DEFAULT_QUERY_BUDGET = 20
+# The same statement more often than this in one request is reported as a likely N+1.
+DEFAULT_REPEAT_THRESHOLD = 5
+_PLACEHOLDER = re.compile(r"\$\d+(?:::[\w ]+(?:\[\])?)?")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:, \?)+")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget_mode() -> str:
+    # off, warn (log once per request) or raise (fail the statement over budget; for tests).
+    return os.getenv("QUERY_BUDGET_MODE", "warn").lower()
+
+
+def query_budget_default() -> int:
+    return int(os.getenv("QUERY_BUDGET", str(DEFAULT_QUERY_BUDGET)))
+
+
+def query_repeat_threshold() -> int:
+    return int(os.getenv("QUERY_BUDGET_REPEATS", str(DEFAULT_REPEAT_THRESHOLD)))
+
+
+def statement_shape(statement: str) -> str:
+    # Bound values never appear in the SQL, so statements only differ in the length of IN lists.
+    shape = _PLACEHOLDER_LIST.sub("?...", _PLACEHOLDER.sub("?", statement))
+    return " ".join(shape.split())
+
+
+class RequestQueries:
+    # Statements of one request, shared by the metrics middleware and the engine events.
+    __slots__ = ("scope", "statements", "seconds", "budget", "counts", "mode")
+
+    def __init__(self, scope: Dict[str, Any], mode: str):
+        self.scope = scope
+        self.statements = 0
+        self.seconds = 0.0
+        self.budget: Optional[int] = query_budget_default()
+        # Statement text -> executions; SQLAlchemy reuses the same compiled string.
+        self.counts: Counter = Counter()
+        self.mode = mode
+
+    @property
+    def route(self) -> str:
+        # The path template once the router matched one, so ids do not split the counts.
+        return getattr(self.scope.get("route"), "path", None) or "unmatched"
+
+    def record(self, statement: str) -> None:
+        self.statements += 1
+        if self.mode == "off":
+            return
+        self.counts[statement] += 1
+        if self.mode == "raise" and self.budget is not None:
+            if self.statements > self.budget:
+                raise QueryBudgetExceeded(
+                    f"{self.route}: statement {self.statements} exceeds the budget of {self.budget}"
+                )
+            if self.counts[statement] > query_repeat_threshold():
+                shape = statement_shape(statement)[:300]
+                raise QueryBudgetExceeded(
+                    f"{self.route}: statement repeated {self.counts[statement]} times: {shape}"
+                )
+
+    def report(self) -> Optional[Dict[str, Any]]:
+        # What went over, or None when the request stayed within its budget.
+        if self.mode == "off" or self.budget is None:
+            return None
+        threshold = query_repeat_threshold()
+        repeated: Counter = Counter()
+        for statement, count in self.counts.items():
+            repeated[statement_shape(statement)] += count
+        repeated_shapes = [
+            {"count": count, "statement": shape[:300]}
+            for shape, count in repeated.most_common()
+            if count > threshold
+        ]
+        over_budget = self.statements > self.budget
+        if not over_budget and not repeated_shapes:
+            return None
+        return {
+            "route": self.route,
+            "statements": self.statements,
+            "budget": self.budget,
+            "db_seconds": round(self.seconds, 6),
+            "repeated": repeated_shapes,
+        }
+
+    def warn(self) -> None:
+        report = self.report()
+        if report is not None:
+            logging.warning(
+                f"Query budget exceeded on {report['route']}: {report['statements']} statements "
+                f"(budget {report['budget']}), {len(report['repeated'])} repeated",
+                extra={"query_budget": report},
+            )
+
+
+# The request being handled, None outside one (background jobs, startup).
+current_queries: ContextVar[Optional[RequestQueries]] = ContextVar("current_queries", default=None)
+# Set by override_budget (the max_queries test fixture) for the requests started within it.
+budget_override: ContextVar[Optional[Dict[str, Any]]] = ContextVar("budget_override", default=None)
+
+
+def start_request(scope: Dict[str, Any]) -> RequestQueries:
+    override = budget_override.get()
+    if override is not None:
+        queries = RequestQueries(scope, "raise")
+        queries.budget = override["limit"]
+        override["requests"].append(queries)
+    else:
+        queries = RequestQueries(scope, query_budget_mode())
+    return queries
+
+
+def query_budget(limit: Optional[int]) -> Callable:
+    # Route decorator: a budget of its own for a route, or None to skip the checks where many
+    # statements are the point (bulk loads run the same insert batch after batch).
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            queries = current_queries.get()
+            if queries is not None and budget_override.get() is None:
+                queries.budget = limit
+            return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def override_budget(limit: int) -> Iterator[List[RequestQueries]]:
+    # Every request started in this context (and the tasks it spawns) gets this budget in raise
+    # mode; the yielded list collects them. Other tasks, and concurrent tests, are unaffected.
+    override: Dict[str, Any] = {"limit": limit, "requests": []}
+    token = budget_override.set(override)
+    try:
+        yield override["requests"]
+    finally:
+        budget_override.reset(token)
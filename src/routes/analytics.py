@@ -0,0 +1,36 @@
+from datetime import date
+from typing import Any, Dict, Literal
+
+from fastapi import APIRouter, Depends, Query, Request
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.cache import cached
+from src.dependencies import get_db
+from src.limiter import limiter, rate_limit
+from src.security import get_current_user
+from src.services.analytics import AnalyticsService
+from src.utils.serialization import json_response
+
+router = APIRouter(
+    prefix="/analytics", tags=["analytics"], dependencies=[Depends(get_current_user)]
+)
+
+
+def wrap_data(result: Any, **kwargs) -> Dict[str, Any]:
+    return {"data": result, **kwargs}
+
+
+@router.get("/occupancy", response_model=Dict[str, Any])
+@limiter.limit(rate_limit("analytics", "occupancy"))
+@cached("bookings", "billboards", "locations")
+async def get_occupancy(
+    request: Request,
+    start_date: date = Query(..., alias="from"),
+    end_date: date = Query(..., alias="to"),
+    group_by: Literal["billboard", "location", "city", "state", "country", "all"] = "city",
+    period: Literal["day", "week", "month", "quarter", "year", "total"] = "month",
+    db: AsyncSession = Depends(get_db),
+):
+    # Booked billboard-days, occupancy rate and revenue per group and period, both dates inclusive.
+    result = await AnalyticsService(db).get_occupancy(group_by, period, start_date, end_date)
+    return json_response(wrap_data(result))
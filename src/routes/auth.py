@@ -1,22 +1,30 @@
+from typing import Callable
+
 from fastapi import APIRouter, Depends, HTTPException, Request
 from supabase import Client
 
 from src.dependencies import get_supabase
 from src.domain.models.auth import SupabaseSession, UserLogin
-from src.limiter import limiter
+from src.limiter import limiter, rate_limit
 from src.services.auth import AuthService
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+
 @router.post("/sign-up", status_code=201)
-@limiter.limit("100/minute")
-async def signup_user(request: Request, user: UserLogin, supabase: Client = Depends(get_supabase)):
+@limiter.limit(rate_limit("auth", "sign_up"))
+async def signup_user(
+    request: Request, user: UserLogin, supabase: Callable[[], Client] = Depends(get_supabase)
+):
     result = await AuthService(supabase=supabase).sign_up_user(user)
     return result
 
+
 @router.post("/sign-in", response_model=SupabaseSession)
-@limiter.limit("100/minute")
-async def signin_user(request: Request, user: UserLogin, supabase: Client = Depends(get_supabase)):
+@limiter.limit(rate_limit("auth", "sign_in"))
+async def signin_user(
+    request: Request, user: UserLogin, supabase: Callable[[], Client] = Depends(get_supabase)
+):
     result = await AuthService(supabase=supabase).sign_in_user(user)
     if result.session:
         return SupabaseSession(
@@ -24,12 +32,13 @@ async def signin_user(request: Request, user: UserLogin, supabase: Client = Depe
             refresh_token=getattr(result.session, "refresh_token", None),
             token_type=getattr(result.session, "token_type", None),
             expires_in=getattr(result.session, "expires_in", None),
-            user=result.user
+            user=result.user,
         )
     raise HTTPException(status_code=401, detail="Invalid credentials or email not verified.")
 
+
 @router.post("/sign-out")
-@limiter.limit("100/minute")
-async def signout_user(request: Request, supabase: Client = Depends(get_supabase)):
-    result = await AuthService(supabase=supabase).sign_out_user()
-    return { "message": "User signed out." }
+@limiter.limit(rate_limit("auth", "sign_out"))
+async def signout_user(request: Request, supabase: Callable[[], Client] = Depends(get_supabase)):
+    await AuthService(supabase=supabase).sign_out_user()
+    return {"message": "User signed out."}
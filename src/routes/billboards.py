@@ -1,81 +1,163 @@
 from datetime import date
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
 from sqlmodel.ext.asyncio.session import AsyncSession
-from supabase import Client
 
-from src.dependencies import get_db, get_supabase
-from src.domain.models.billboards import BillboardCreate, BillboardUpdate
-from src.limiter import limiter
+from src.cache import cached
+from src.dependencies import get_db, get_read_db
+from src.domain.models.billboards import (
+    BillboardBatchCreate,
+    BillboardBatchUpdate,
+    BillboardCreate,
+    BillboardUpdate,
+)
+from src.domain.models.common import BatchDelete
+from src.limiter import limiter, rate_limit
+from src.query_budget import query_budget
+from src.security import get_current_user
 from src.services.billboards import BillboardService
 from src.services.campaign_billboards import CampaignBillboardService
+from src.utils.serialization import json_response
 
-router = APIRouter(prefix="/billboards", tags=["billboards"])
+router = APIRouter(
+    prefix="/billboards", tags=["billboards"], dependencies=[Depends(get_current_user)]
+)
+
+
+def wrap_data(result: Any, **kwargs) -> Dict[str, Any]:
+    return {"data": result, **kwargs}
 
-def wrap_data(result: Any) -> Dict[str, Any]:
-    return {"data": result}
 
 @router.get("/available", response_model=Dict[str, Any])
-@limiter.limit("100/minute")
+@limiter.limit(rate_limit("billboards", "available"))
+@cached("billboards", "locations", "campaigns", "bookings")
 async def get_available_billboards(
     request: Request,
     campaign_id: str = "",
     start_date: date = None,
     end_date: date = None,
-    db: AsyncSession = Depends(get_db),
-    supabase: Client = Depends(get_supabase),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    user = supabase.auth.get_user()
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
     if isinstance(start_date, str):
         start_date = date.fromisoformat(start_date)
     if isinstance(end_date, str):
         end_date = date.fromisoformat(end_date)
     result = await CampaignBillboardService(db).get_availability(campaign_id, start_date, end_date)
-    return wrap_data(result)
+    return json_response(wrap_data(result))
+
 
 @router.post("/", response_model=Dict[str, Any], status_code=201)
-@limiter.limit("100/minute")
-async def create_billboard(request: Request, billboard: BillboardCreate, db: AsyncSession = Depends(get_db), supabase: Client = Depends(get_supabase)):
-    user = supabase.auth.get_user()
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
+@limiter.limit(rate_limit("billboards", "create"))
+async def create_billboard(
+    request: Request, billboard: BillboardCreate, db: AsyncSession = Depends(get_db)
+):
     result = await BillboardService(db).create_billboard(billboard)
-    return wrap_data(result)
+    return json_response(wrap_data(result), status_code=201)
+
+
+@router.get("/nearby", response_model=Dict[str, Any])
+@limiter.limit(rate_limit("billboards", "nearby"))
+@cached("billboards", "locations")
+async def get_nearby_billboards(
+    request: Request,
+    lat: float = Query(ge=-90, le=90),
+    lng: float = Query(ge=-180, le=180),
+    radius_km: float = Query(gt=0, le=1000),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+):
+    result, total = await BillboardService(db).get_nearby_billboards(
+        lat, lng, radius_km, offset, limit
+    )
+    return json_response(wrap_data(result, total=total))
+
 
 @router.get("/{id}", response_model=Dict[str, Any])
-@limiter.limit("100/minute")
-async def billboard(request: Request, id: str, db: AsyncSession = Depends(get_db), supabase: Client = Depends(get_supabase)):
-    user = supabase.auth.get_user()
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
+@limiter.limit(rate_limit("billboards", "get"))
+@cached("billboards", "locations")
+async def billboard(request: Request, id: str, db: AsyncSession = Depends(get_read_db)):
     result = await BillboardService(db).get_billboard(id)
-    return wrap_data(result)
+    return json_response(wrap_data(result))
+
 
 @router.get("/", response_model=Dict[str, Any])
-@limiter.limit("100/minute")
-async def get_billboards(request: Request, offset: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db), supabase: Client = Depends(get_supabase)):
-    user = supabase.auth.get_user()
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    result = await BillboardService(db).get_billboards(offset, limit)
-    return wrap_data(result)
+@limiter.limit(rate_limit("billboards", "list"))
+@cached("billboards", "locations")
+async def get_billboards(
+    request: Request,
+    offset: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_read_db),
+):
+    service = BillboardService(db)
+    if cursor is not None:
+        result, next_cursor = await service.get_billboards_page(cursor, limit)
+        extra = {"next_cursor": next_cursor}
+    else:
+        result = await service.get_billboards(offset, limit)
+        extra = {}
+    if include_total:
+        extra["approximate_total"] = await service.estimate_total()
+    return json_response(wrap_data(result, **extra))
+
+
+# Ahead of PATCH and DELETE /{id}, so "batch" is never read as an id.
+@router.post("/batch", response_model=Dict[str, Any], status_code=201)
+@limiter.limit(rate_limit("billboards", "batch_create"))
+async def create_billboards(
+    request: Request, batch: BillboardBatchCreate, db: AsyncSession = Depends(get_db)
+):
+    result = await BillboardService(db).create_billboards(batch.items, batch.mode)
+    return json_response(wrap_data(result), status_code=201)
+
+
+@router.patch("/batch", response_model=Dict[str, Any])
+@limiter.limit(rate_limit("billboards", "batch_update"))
+async def update_billboards(
+    request: Request, batch: BillboardBatchUpdate, db: AsyncSession = Depends(get_db)
+):
+    result = await BillboardService(db).update_billboards(batch.items, batch.mode)
+    return json_response(wrap_data(result))
+
+
+@router.delete("/batch", response_model=Dict[str, Any])
+@limiter.limit(rate_limit("billboards", "batch_delete"))
+async def delete_billboards(
+    request: Request, batch: BatchDelete, db: AsyncSession = Depends(get_db)
+):
+    result = await BillboardService(db).delete_billboards(batch.ids, batch.mode)
+    return json_response(wrap_data(result))
+
 
 @router.delete("/{id}", status_code=204)
-@limiter.limit("100/minute")
-async def delete_billboard(request: Request, id: str, db: AsyncSession = Depends(get_db), supabase: Client = Depends(get_supabase)):
-    user = supabase.auth.get_user()
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
+@limiter.limit(rate_limit("billboards", "delete"))
+async def delete_billboard(request: Request, id: str, db: AsyncSession = Depends(get_db)):
     return await BillboardService(db).delete_billboard(id)
 
+
 @router.patch("/{id}", response_model=Dict[str, Any])
-@limiter.limit("100/minute")
-async def update_billboard(request: Request, id: str, billboard_update: BillboardUpdate, db: AsyncSession = Depends(get_db), supabase: Client = Depends(get_supabase)):
-    user = supabase.auth.get_user()
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
+@limiter.limit(rate_limit("billboards", "update"))
+async def update_billboard(
+    request: Request, id: str, billboard_update: BillboardUpdate, db: AsyncSession = Depends(get_db)
+):
     result = await BillboardService(db).update_billboard(id, billboard_update)
+    return json_response(wrap_data(result))
+
+
+@router.post("/bulk_load", response_model=Dict[str, Any], status_code=201)
+@limiter.limit(rate_limit("billboards", "bulk_load"))
+@query_budget(None)
+async def bulk_load_billboards(
+    request: Request,
+    file: UploadFile = File(...),
+    strict: bool = False,
+    db: AsyncSession = Depends(get_db),
+):
+    if file.content_type != "text/csv":
+        raise HTTPException(status_code=400, detail="File must be a CSV")
+    result = await BillboardService(db).bulk_load_billboards_from_csv(file.file, strict)
     return wrap_data(result)
@@ -1,117 +1,186 @@
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
 from sqlmodel.ext.asyncio.session import AsyncSession
-from supabase import Client
 
-from src.dependencies import get_db, get_supabase
-from src.domain.models.campaigns import CampaignCreate, CampaignUpdate
-from src.limiter import limiter
+from src.cache import cached
+from src.dependencies import get_db, get_read_db
+from src.domain.models.campaigns import (
+    CampaignBatchCreate,
+    CampaignBatchUpdate,
+    CampaignBillboardsBatch,
+    CampaignCreate,
+    CampaignUpdate,
+)
+from src.domain.models.common import BatchDelete
+from src.limiter import limiter, rate_limit
+from src.query_budget import query_budget
+from src.security import get_current_user
 from src.services.campaign_billboards import CampaignBillboardService
 from src.services.campaigns import CampaignService
+from src.utils.serialization import json_response
+
+router = APIRouter(
+    prefix="/campaigns", tags=["campaigns"], dependencies=[Depends(get_current_user)]
+)
 
-router = APIRouter(prefix="/campaigns", tags=["campaigns"])
 
 def wrap_data(result: Any, **kwargs) -> Dict[str, Any]:
     return {"data": result, **kwargs}
 
+
 @router.post("/", response_model=Dict[str, Any], status_code=201)
-@limiter.limit("100/minute")
+@limiter.limit(rate_limit("campaigns", "create"))
 async def create_campaign(
-    request: Request,
-    campaign: CampaignCreate,
-    db: AsyncSession = Depends(get_db),
-    supabase: Client = Depends(get_supabase)
+    request: Request, campaign: CampaignCreate, db: AsyncSession = Depends(get_db)
 ):
-    user = supabase.auth.get_user()
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
     result = await CampaignService(db).create_campaign(campaign)
     return wrap_data(result)
 
-@router.get("/{id}", response_model=Dict[str, Any])
-@limiter.limit("100/minute")
-async def get_campaign(
+
+@router.get("/summary", response_model=Dict[str, Any])
+@limiter.limit(rate_limit("campaigns", "summary"))
+@cached("campaigns", "bookings", "billboards")
+async def get_campaign_summaries(
     request: Request,
-    id: str,
-    db: AsyncSession = Depends(get_db),
-    supabase: Client = Depends(get_supabase)
+    offset: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    ids: Optional[List[str]] = Query(None),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    user = supabase.auth.get_user()
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
+    # Days, billboard count and total cost per campaign, computed by the database.
+    service = CampaignService(db)
+    if cursor is not None:
+        result, next_cursor = await service.get_campaign_summaries_page(cursor, limit, ids)
+        return json_response(wrap_data(result, next_cursor=next_cursor))
+    result = await service.get_campaign_summaries(offset, limit, ids)
+    return json_response(wrap_data(result))
+
+
+@router.get("/{id}", response_model=Dict[str, Any])
+@limiter.limit(rate_limit("campaigns", "get"))
+@cached("campaigns", "bookings", "billboards", "locations")
+async def get_campaign(request: Request, id: str, db: AsyncSession = Depends(get_read_db)):
     result = await CampaignService(db).get_campaign(id)
-    return wrap_data(result)
+    return json_response(wrap_data(result))
+
 
 @router.get("/", response_model=Dict[str, Any])
-@limiter.limit("100/minute")
+@limiter.limit(rate_limit("campaigns", "list"))
+@cached("campaigns", "bookings", "billboards", "locations")
 async def get_campaigns(
     request: Request,
     offset: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db),
-    supabase: Client = Depends(get_supabase)
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_read_db),
 ):
-    user = supabase.auth.get_user()
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    result = await CampaignService(db).get_campaigns(offset, limit)
-    return wrap_data(result)
+    service = CampaignService(db)
+    if cursor is not None:
+        result, next_cursor = await service.get_campaigns_page(cursor, limit)
+        extra = {"next_cursor": next_cursor}
+    else:
+        result = await service.get_campaigns(offset, limit)
+        extra = {}
+    if include_total:
+        extra["approximate_total"] = await service.estimate_total()
+    return json_response(wrap_data(result, **extra))
 
-@router.delete("/{id}", status_code=204)
-@limiter.limit("100/minute")
-async def delete_campaign(
-    request: Request,
-    id: str,
-    db: AsyncSession = Depends(get_db),
-    supabase: Client = Depends(get_supabase)
+
+@router.post("/batch", response_model=Dict[str, Any], status_code=201)
+@limiter.limit(rate_limit("campaigns", "batch_create"))
+async def create_campaigns(
+    request: Request, batch: CampaignBatchCreate, db: AsyncSession = Depends(get_db)
+):
+    result = await CampaignService(db).create_campaigns(batch.items, batch.mode)
+    return json_response(wrap_data(result), status_code=201)
+
+
+@router.patch("/batch", response_model=Dict[str, Any])
+@limiter.limit(rate_limit("campaigns", "batch_update"))
+async def update_campaigns(
+    request: Request, batch: CampaignBatchUpdate, db: AsyncSession = Depends(get_db)
+):
+    result = await CampaignService(db).update_campaigns(batch.items, batch.mode)
+    return json_response(wrap_data(result))
+
+
+@router.delete("/batch", response_model=Dict[str, Any])
+@limiter.limit(rate_limit("campaigns", "batch_delete"))
+async def delete_campaigns(
+    request: Request, batch: BatchDelete, db: AsyncSession = Depends(get_db)
 ):
-    user = supabase.auth.get_user()
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
+    result = await CampaignService(db).delete_campaigns(batch.ids, batch.mode)
+    return json_response(wrap_data(result))
+
+
+@router.delete("/{id}", status_code=204)
+@limiter.limit(rate_limit("campaigns", "delete"))
+async def delete_campaign(request: Request, id: str, db: AsyncSession = Depends(get_db)):
     return await CampaignService(db).delete_campaign(id)
 
+
 @router.patch("/{id}", response_model=Dict[str, Any])
-@limiter.limit("100/minute")
+@limiter.limit(rate_limit("campaigns", "update"))
 async def update_campaign(
-    request: Request,
-    id: str,
-    campaign_update: CampaignUpdate,
-    db: AsyncSession = Depends(get_db),
-    supabase: Client = Depends(get_supabase)
+    request: Request, id: str, campaign_update: CampaignUpdate, db: AsyncSession = Depends(get_db)
 ):
-    user = supabase.auth.get_user()
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
     result = await CampaignService(db).update_campaign(id, campaign_update)
     return wrap_data(result)
 
+
 @router.post("/{id}/add/{billboard_id}", response_model=Dict[str, Any])
-@limiter.limit("100/minute")
+@limiter.limit(rate_limit("campaigns", "add_billboard"))
 async def add_billboard_to_campaign(
-    request: Request,
-    id: str,
-    billboard_id: str,
-    db: AsyncSession = Depends(get_db),
-    supabase: Client = Depends(get_supabase)
+    request: Request, id: str, billboard_id: str, db: AsyncSession = Depends(get_db)
 ):
-    user = supabase.auth.get_user()
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
     result = await CampaignBillboardService(db).add_billboard_to_campaign(id, billboard_id)
-    return { "message": "Billboard added to campaign", **wrap_data(result) }
+    return {"message": "Billboard added to campaign", **wrap_data(result)}
+
 
 @router.post("/{id}/remove/{billboard_id}", response_model=Dict[str, Any])
-@limiter.limit("100/minute")
+@limiter.limit(rate_limit("campaigns", "remove_billboard"))
 async def remove_billboard_from_campaign(
+    request: Request, id: str, billboard_id: str, db: AsyncSession = Depends(get_db)
+):
+    result = await CampaignBillboardService(db).remove_billboard_from_campaign(id, billboard_id)
+    return {"message": "Billboard removed from campaign", **wrap_data(result)}
+
+
+@router.post("/{id}/billboards", response_model=Dict[str, Any])
+@limiter.limit(rate_limit("campaigns", "add_billboards"))
+async def add_billboards_to_campaign(
+    request: Request, id: str, batch: CampaignBillboardsBatch, db: AsyncSession = Depends(get_db)
+):
+    result = await CampaignBillboardService(db).add_billboards_to_campaign(
+        id, batch.billboard_ids, batch.mode
+    )
+    return wrap_data(result)
+
+
+@router.post("/{id}/billboards/remove", response_model=Dict[str, Any])
+@limiter.limit(rate_limit("campaigns", "remove_billboards"))
+async def remove_billboards_from_campaign(
+    request: Request, id: str, batch: CampaignBillboardsBatch, db: AsyncSession = Depends(get_db)
+):
+    result = await CampaignBillboardService(db).remove_billboards_from_campaign(
+        id, batch.billboard_ids
+    )
+    return wrap_data(result)
+
+
+@router.post("/bookings/bulk_load", response_model=Dict[str, Any], status_code=201)
+@limiter.limit(rate_limit("campaigns", "bulk_load_bookings"))
+@query_budget(None)
+async def bulk_load_bookings(
     request: Request,
-    id: str,
-    billboard_id: str,
+    file: UploadFile = File(...),
+    strict: bool = False,
     db: AsyncSession = Depends(get_db),
-    supabase: Client = Depends(get_supabase)
 ):
-    user = supabase.auth.get_user()
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    result = await CampaignBillboardService(db).remove_billboard_from_campaign(id, billboard_id)
-    return { "message": "Billboard removed from campaign", **wrap_data(result) }
+    if file.content_type != "text/csv":
+        raise HTTPException(status_code=400, detail="File must be a CSV")
+    result = await CampaignBillboardService(db).bulk_load_bookings_from_csv(file.file, strict)
+    return wrap_data(result)
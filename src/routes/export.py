@@ -0,0 +1,38 @@
+from typing import Literal
+
+import anyio
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from src.limiter import limiter, rate_limit
+from src.security import get_current_user
+from src.services.export import EXPORT_MEDIA_TYPES, open_export
+
+router = APIRouter(prefix="/export", tags=["export"], dependencies=[Depends(get_current_user)])
+
+
+class ExportResponse(StreamingResponse):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # Starlette leaves the iterator suspended when the client disconnects; close it here so
+        # the database cursor is released right away rather than whenever it is collected.
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            with anyio.CancelScope(shield=True):
+                await self.body_iterator.aclose()
+
+
+@router.get("/{resource}")
+@limiter.limit(rate_limit("export", "get"))
+async def export_resource(
+    request: Request,
+    resource: Literal["locations", "billboards", "bookings"],
+    format: Literal["ndjson", "csv"] = "ndjson",
+):
+    body = await open_export(resource, format)
+    return ExportResponse(
+        body,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{resource}.{format}"'},
+    )
@@ -0,0 +1,67 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter, Depends, Request
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.cache import response_cache
+from src.dependencies import get_auth_executor, get_db, get_replica_router, pool_snapshots
+from src.jobs import job_runner
+from src.limiter import limiter, rate_limit
+from src.persistence.availability_index import availability_index
+from src.security import require_internal_role
+from src.services.availability import AvailabilityService
+
+router = APIRouter(
+    prefix="/internal", tags=["internal"], dependencies=[Depends(require_internal_role)]
+)
+
+
+def wrap_data(result: Any, **kwargs) -> Dict[str, Any]:
+    return {"data": result, **kwargs}
+
+
+@router.get("/availability", response_model=Dict[str, Any])
+@limiter.limit(rate_limit("internal", "availability"))
+async def get_availability_index(
+    request: Request, check: bool = False, db: AsyncSession = Depends(get_db)
+):
+    if check:
+        return wrap_data(await AvailabilityService(db).check_index())
+    return wrap_data(availability_index.stats())
+
+
+@router.post("/availability/rebuild", response_model=Dict[str, Any])
+@limiter.limit(rate_limit("internal", "availability_rebuild"))
+async def rebuild_availability_index(request: Request, db: AsyncSession = Depends(get_db)):
+    result = await AvailabilityService(db).rebuild_index()
+    return wrap_data(result)
+
+
+@router.get("/cache", response_model=Dict[str, Any])
+@limiter.limit(rate_limit("internal", "cache"))
+async def get_cache_stats(request: Request):
+    return wrap_data(response_cache.snapshot())
+
+
+@router.get("/executors", response_model=Dict[str, Any])
+@limiter.limit(rate_limit("internal", "executors"))
+async def get_executor_stats(request: Request):
+    return wrap_data([get_auth_executor().snapshot()])
+
+
+@router.get("/jobs", response_model=Dict[str, Any])
+@limiter.limit(rate_limit("internal", "jobs"))
+async def get_job_runner_stats(request: Request):
+    return wrap_data(job_runner.snapshot())
+
+
+@router.get("/pool", response_model=Dict[str, Any])
+@limiter.limit(rate_limit("internal", "pool"))
+async def get_pool_stats(request: Request):
+    return wrap_data(pool_snapshots())
+
+
+@router.get("/replicas", response_model=Dict[str, Any])
+@limiter.limit(rate_limit("internal", "replicas"))
+async def get_replica_stats(request: Request):
+    return wrap_data(get_replica_router().snapshot())
@@ -0,0 +1,22 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter, Depends, Request
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.dependencies import get_db
+from src.limiter import limiter, rate_limit
+from src.security import get_current_user
+from src.services.jobs import JobService
+
+router = APIRouter(prefix="/jobs", tags=["jobs"], dependencies=[Depends(get_current_user)])
+
+
+def wrap_data(result: Any, **kwargs) -> Dict[str, Any]:
+    return {"data": result, **kwargs}
+
+
+@router.get("/{id}", response_model=Dict[str, Any])
+@limiter.limit(rate_limit("jobs", "get"))
+async def get_job(request: Request, id: str, db: AsyncSession = Depends(get_db)):
+    result = await JobService(db).get_job(id, request.state.user.get("sub"))
+    return wrap_data(result)
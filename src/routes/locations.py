@@ -1,78 +1,152 @@
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Request, File, UploadFile
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile
 from sqlmodel.ext.asyncio.session import AsyncSession
-from supabase import Client
 
-from src.dependencies import get_db, get_supabase
-from src.domain.models.locations import LocationCreate, LocationUpdate
-from src.limiter import limiter
+from src.cache import cached
+from src.dependencies import get_db, get_read_db
+from src.domain.models.common import BatchDelete
+from src.domain.models.locations import (
+    LocationBatchCreate,
+    LocationBatchUpdate,
+    LocationCreate,
+    LocationUpdate,
+)
+from src.limiter import limiter, rate_limit
+from src.query_budget import query_budget
+from src.security import get_current_user
 from src.services.locations import LocationService
+from src.utils.serialization import json_response
+
+router = APIRouter(
+    prefix="/locations", tags=["locations"], dependencies=[Depends(get_current_user)]
+)
 
-router = APIRouter(prefix="/locations", tags=["locations"])
 
 def wrap_data(result: Any, **kwargs) -> Dict[str, Any]:
     return {"data": result, **kwargs}
 
+
 @router.post("/", response_model=Dict[str, Any], status_code=201)
-@limiter.limit("100/minute")
-async def create_location(request: Request, location: LocationCreate, db: AsyncSession = Depends(get_db), supabase: Client = Depends(get_supabase)):
-    user = supabase.auth.get_user()
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
+@limiter.limit(rate_limit("locations", "create"))
+async def create_location(
+    request: Request, location: LocationCreate, db: AsyncSession = Depends(get_db)
+):
     result = await LocationService(db).create_location(location)
     return wrap_data(result)
 
+
+@router.get("/nearby", response_model=Dict[str, Any])
+@limiter.limit(rate_limit("locations", "nearby"))
+@cached("locations")
+async def get_nearby_locations(
+    request: Request,
+    lat: float = Query(ge=-90, le=90),
+    lng: float = Query(ge=-180, le=180),
+    radius_km: float = Query(gt=0, le=1000),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+):
+    result, total = await LocationService(db).get_nearby_locations(
+        lat, lng, radius_km, offset, limit
+    )
+    return json_response(wrap_data(result, total=total))
+
+
 @router.get("/{id}", response_model=Dict[str, Any])
-@limiter.limit("100/minute")
-async def get_location(request: Request, id: str, db: AsyncSession = Depends(get_db), supabase: Client = Depends(get_supabase)):
-    user = supabase.auth.get_user()
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
+@limiter.limit(rate_limit("locations", "get"))
+@cached("locations", "billboards")
+async def get_location(request: Request, id: str, db: AsyncSession = Depends(get_read_db)):
     result = await LocationService(db).get_location(id)
     return wrap_data(result)
 
+
 @router.get("/", response_model=Dict[str, Any])
-@limiter.limit("100/minute")
-async def get_locations(request: Request, offset: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db), supabase: Client = Depends(get_supabase)):
-    user = supabase.auth.get_user()
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    result = await LocationService(db).get_locations(offset, limit)
-    return wrap_data(result)
+@limiter.limit(rate_limit("locations", "list"))
+@cached("locations")
+async def get_locations(
+    request: Request,
+    offset: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_read_db),
+):
+    service = LocationService(db)
+    if cursor is not None:
+        result, next_cursor = await service.get_locations_page(cursor, limit)
+        extra = {"next_cursor": next_cursor}
+    else:
+        result = await service.get_locations(offset, limit)
+        extra = {}
+    if include_total:
+        extra["approximate_total"] = await service.estimate_total()
+    return json_response(wrap_data(result, **extra))
+
+
+# Declared before the /{id} routes, which would otherwise take "batch" for an id.
+@router.post("/batch", response_model=Dict[str, Any], status_code=201)
+@limiter.limit(rate_limit("locations", "batch_create"))
+async def create_locations(
+    request: Request, batch: LocationBatchCreate, db: AsyncSession = Depends(get_db)
+):
+    result = await LocationService(db).create_locations(batch.items, batch.mode)
+    return json_response(wrap_data(result), status_code=201)
+
+
+@router.patch("/batch", response_model=Dict[str, Any])
+@limiter.limit(rate_limit("locations", "batch_update"))
+async def update_locations(
+    request: Request, batch: LocationBatchUpdate, db: AsyncSession = Depends(get_db)
+):
+    result = await LocationService(db).update_locations(batch.items, batch.mode)
+    return json_response(wrap_data(result))
+
+
+@router.delete("/batch", response_model=Dict[str, Any])
+@limiter.limit(rate_limit("locations", "batch_delete"))
+async def delete_locations(
+    request: Request, batch: BatchDelete, db: AsyncSession = Depends(get_db)
+):
+    result = await LocationService(db).delete_locations(batch.ids, batch.mode)
+    return json_response(wrap_data(result))
+
 
 @router.delete("/{id}", status_code=204)
-@limiter.limit("100/minute")
-async def delete_location(request: Request, id: str, db: AsyncSession = Depends(get_db), supabase: Client = Depends(get_supabase)):
-    user = supabase.auth.get_user()
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
+@limiter.limit(rate_limit("locations", "delete"))
+async def delete_location(request: Request, id: str, db: AsyncSession = Depends(get_db)):
     return await LocationService(db).delete_location(id)
 
+
 @router.patch("/{id}", response_model=Dict[str, Any])
-@limiter.limit("100/minute")
-async def update_location(request: Request, id: str, location_update: LocationUpdate, db: AsyncSession = Depends(get_db), supabase: Client = Depends(get_supabase)):
-    user = supabase.auth.get_user()
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
+@limiter.limit(rate_limit("locations", "update"))
+async def update_location(
+    request: Request, id: str, location_update: LocationUpdate, db: AsyncSession = Depends(get_db)
+):
     result = await LocationService(db).update_location(id, location_update)
     return wrap_data(result)
 
+
 @router.post("/bulk_load", response_model=Dict[str, Any], status_code=201)
-@limiter.limit("100/minute")
+@limiter.limit(rate_limit("locations", "bulk_load"))
+@query_budget(None)
 async def bulk_load_locations(
     request: Request,
+    response: Response,
     file: UploadFile = File(...),
+    strict: bool = False,
+    run_async: bool = Query(False, alias="async"),
     db: AsyncSession = Depends(get_db),
-    supabase: Client = Depends(get_supabase)
 ):
-    user = supabase.auth.get_user()
-    if not user:
-        raise HTTPException(status_code=401, detail="Unauthorized")
     if file.content_type != "text/csv":
         raise HTTPException(status_code=400, detail="File must be a CSV")
-    contents = await file.read()
-    import io
-    csv_file = io.StringIO(contents.decode("utf-8"))
-    result = await LocationService(db).bulk_load_locations_from_csv(csv_file)
+    if run_async:
+        result = await LocationService(db).submit_bulk_load(
+            file.file, strict, request.state.user.get("sub")
+        )
+        response.status_code = 202
+        return wrap_data(result)
+    # The upload is already spooled to disk; the service reads it from there in batches.
+    result = await LocationService(db).bulk_load_locations_from_csv(file.file, strict)
     return wrap_data(result)
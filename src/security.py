@@ -0,0 +1,222 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import jwt
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from gotrue.errors import AuthApiError
+
+from src.dependencies import get_auth_executor, thread_supabase
+from src.metrics import auth_duration
+from src.utils.executor import ExecutorSaturated
+from src.utils.ttl_cache import TTLCache
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+ASYMMETRIC_ALGORITHMS = ("RS256", "ES256")
+
+
+class TokenVerificationUnavailable(Exception):
+    """Raised when no local key is able to check a token's signature."""
+
+
+class JWTVerifier:
+    def __init__(
+        self,
+        secret: Optional[str] = None,
+        jwks_url: Optional[str] = None,
+        jwks: Optional[Dict[str, Any]] = None,
+        audience: Optional[str] = "authenticated",
+        leeway: float = 5,
+        cache_size: int = 10_000,
+        cache_ttl: float = 300,
+        jwks_ttl: float = 600,
+        jwks_min_refresh_interval: float = 30,
+    ):
+        self.secret = secret
+        self.jwks_url = jwks_url
+        self.audience = audience
+        self.leeway = leeway
+        self.claims_cache: TTLCache[Dict[str, Any]] = TTLCache(cache_size, cache_ttl)
+        self.jwks_ttl = jwks_ttl
+        self.jwks_min_refresh_interval = jwks_min_refresh_interval
+        self._keys: Dict[str, jwt.PyJWK] = {}
+        self._keys_fetched_at: Optional[float] = None
+        self._refresh_lock = asyncio.Lock()
+        if jwks:
+            self._load_jwks(jwks)
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        cache_key = self._cache_key(token)
+        claims = self.claims_cache.get(cache_key)
+        if claims is not None:
+            return claims
+        header = jwt.get_unverified_header(token)
+        key, algorithms = await self._resolve_key(header)
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=algorithms,
+            audience=self.audience,
+            leeway=self.leeway,
+            options={"require": ["exp", "sub"], "verify_aud": self.audience is not None},
+        )
+        self.claims_cache.set(cache_key, claims, ttl=claims["exp"] - time.time())
+        return claims
+
+    def remember(self, token: str, claims: Dict[str, Any]) -> None:
+        # Claims Supabase vouched for, kept no longer than the token is valid. Its signature was
+        # checked remotely, so the expiry is read without checking it again.
+        try:
+            expires_at = jwt.decode(token, options={"verify_signature": False})["exp"]
+        except (jwt.InvalidTokenError, KeyError):
+            return
+        self.claims_cache.set(self._cache_key(token), claims, ttl=expires_at - time.time())
+
+    async def _resolve_key(self, header: Dict[str, Any]) -> Tuple[Any, List[str]]:
+        alg = header.get("alg")
+        if alg == "HS256":
+            if not self.secret:
+                raise TokenVerificationUnavailable("HS256 token but no JWT secret is configured")
+            return self.secret, ["HS256"]
+        if alg not in ASYMMETRIC_ALGORITHMS:
+            raise jwt.InvalidAlgorithmError(f"Unsupported token algorithm {alg!r}")
+        kid = header.get("kid")
+        key = self._keys.get(kid)
+        if key is None or self._jwks_expired():
+            # An unknown kid usually means the signing keys were rotated.
+            await self._refresh_jwks(force=key is None)
+            key = self._keys.get(kid)
+        if key is None:
+            raise TokenVerificationUnavailable(f"No signing key with kid {kid!r}")
+        return key.key, [key.algorithm_name]
+
+    def _jwks_expired(self) -> bool:
+        return (
+            self._keys_fetched_at is None
+            or time.monotonic() - self._keys_fetched_at > self.jwks_ttl
+        )
+
+    async def _refresh_jwks(self, force: bool = False) -> None:
+        if not self.jwks_url:
+            return
+        async with self._refresh_lock:
+            fetched_at = self._keys_fetched_at
+            if fetched_at is not None:
+                age = time.monotonic() - fetched_at
+                # Throttle refreshes so tokens with made-up kids can't hammer the JWKS endpoint.
+                if age < self.jwks_min_refresh_interval or (not force and age <= self.jwks_ttl):
+                    return
+            try:
+                async with httpx.AsyncClient(timeout=5) as client:
+                    response = await client.get(self.jwks_url)
+                    response.raise_for_status()
+                    self._load_jwks(response.json())
+            except Exception as exc:
+                logging.warning(f"Could not refresh JWKS from {self.jwks_url}: {exc}")
+                self._keys_fetched_at = time.monotonic()
+
+    def _load_jwks(self, jwks: Dict[str, Any]) -> None:
+        keys = {}
+        for jwk in jwks.get("keys", []):
+            try:
+                keys[jwk.get("kid")] = jwt.PyJWK(jwk)
+            except jwt.PyJWKError as exc:
+                logging.warning(f"Skipping unusable JWK {jwk.get('kid')!r}: {exc}")
+        self._keys = keys
+        self._keys_fetched_at = time.monotonic()
+
+    @staticmethod
+    def _cache_key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+@lru_cache
+def get_jwt_verifier() -> JWTVerifier:
+    supabase_url = os.getenv("SUPABASE_URL")
+    default_jwks_url = (
+        f"{supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json" if supabase_url else None
+    )
+    return JWTVerifier(
+        secret=os.getenv("SUPABASE_JWT_SECRET"),
+        jwks_url=os.getenv("SUPABASE_JWKS_URL", default_jwks_url),
+        audience=os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated"),
+        cache_size=int(os.getenv("AUTH_CACHE_SIZE", "10000")),
+        cache_ttl=float(os.getenv("AUTH_CACHE_TTL_SECONDS", "300")),
+        jwks_ttl=float(os.getenv("AUTH_JWKS_TTL_SECONDS", "600")),
+    )
+
+
+def remote_fallback_enabled() -> bool:
+    return os.getenv("AUTH_REMOTE_FALLBACK", "false").lower() in ("1", "true", "yes")
+
+
+async def verify_remotely(token: str, verifier: JWTVerifier) -> Dict[str, Any]:
+    try:
+        response = await get_auth_executor().run(lambda: thread_supabase().auth.get_user(token))
+    except AuthApiError:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    except (ExecutorSaturated, asyncio.TimeoutError):
+        raise HTTPException(status_code=503, detail="Authentication service unavailable")
+    if not response or not response.user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    claims = {
+        "sub": response.user.id,
+        "email": response.user.email,
+        "role": response.user.role,
+        "aud": response.user.aud,
+        "app_metadata": response.user.app_metadata,
+    }
+    verifier.remember(token, claims)
+    return claims
+
+
+async def get_current_user(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+    verifier: JWTVerifier = Depends(get_jwt_verifier),
+) -> Dict[str, Any]:
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    token = credentials.credentials
+    started = time.perf_counter()
+    source = "local"
+    try:
+        claims = await verifier.verify(token)
+    except TokenVerificationUnavailable as exc:
+        if not remote_fallback_enabled():
+            logging.warning(f"Local JWT verification unavailable: {exc}")
+            raise HTTPException(status_code=401, detail="Unauthorized")
+        source = "remote"
+        claims = await verify_remotely(token, verifier)
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    finally:
+        auth_duration.observe(time.perf_counter() - started, source)
+    request.state.user = claims
+    return claims
+
+
+def internal_roles() -> List[str]:
+    return [
+        role.strip()
+        for role in os.getenv("INTERNAL_ROLES", "service_role,admin").split(",")
+        if role.strip()
+    ]
+
+
+async def require_internal_role(
+    user: Dict[str, Any] = Depends(get_current_user),
+) -> Dict[str, Any]:
+    # Supabase puts the Postgres role in "role" (service_role for the service key); admins are
+    # marked in app_metadata, which only the service key can write, never in user_metadata.
+    roles = {user.get("role"), (user.get("app_metadata") or {}).get("role")}
+    if not roles.intersection(internal_roles()):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return user
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.cache import cache_generations
+from src.persistence.models import Billboard as BillboardDB
+from src.persistence.occupancy import OccupancySnapshot, period_starts
+from src.persistence.repositories import BillboardRepository, CampaignBillboardRepository
+
+# Writes to any of these change what the snapshot holds.
+SNAPSHOT_RESOURCES = ("bookings", "billboards", "locations")
+
+_snapshot: Optional[OccupancySnapshot] = None
+_snapshot_lock = asyncio.Lock()
+
+
+def analytics_max_days() -> int:
+    return int(os.getenv("ANALYTICS_MAX_DAYS", "3660"))
+
+
+def analytics_max_rows() -> int:
+    return int(os.getenv("ANALYTICS_MAX_ROWS", "100000"))
+
+
+def analytics_snapshot_max_age() -> float:
+    # Also reloads after writes that bypass the API (and so never bump a cache generation).
+    return float(os.getenv("ANALYTICS_SNAPSHOT_MAX_AGE_SECONDS", "300"))
+
+
+class AnalyticsService:
+    def __init__(self, session: AsyncSession):
+        self.billboard_repository = BillboardRepository(BillboardDB, session)
+        self.campaign_billboard_repository = CampaignBillboardRepository(session)
+
+    async def get_occupancy(
+        self, group_by: str, period: str, start_date: date, end_date: date
+    ) -> List[Dict[str, Any]]:
+        if start_date > end_date:
+            raise HTTPException(status_code=400, detail="from must not be after to")
+        if (end_date - start_date).days + 1 > analytics_max_days():
+            raise HTTPException(
+                status_code=400, detail=f"Date range cannot exceed {analytics_max_days()} days"
+            )
+        try:
+            snapshot = await self.get_snapshot()
+            rows = snapshot.group_count(group_by) * len(period_starts(start_date, end_date, period))
+            if rows > analytics_max_rows():
+                raise HTTPException(
+                    status_code=400,
+                    detail=(
+                        f"Query would return {rows} rows (limit {analytics_max_rows()}); use a "
+                        "coarser group_by or period, or a shorter range"
+                    ),
+                )
+            return await asyncio.to_thread(
+                snapshot.occupancy, group_by, period, start_date, end_date
+            )
+        except HTTPException:
+            raise
+        except Exception as exc:
+            logging.exception(f"Error computing occupancy: {exc}")
+            raise HTTPException(status_code=500, detail="Failed to compute occupancy")
+
+    async def get_snapshot(self) -> OccupancySnapshot:
+        # Loaded once and shared by every request until a booking, billboard or location write
+        # bumps a generation or the snapshot ages out; concurrent requests wait for one load.
+        global _snapshot
+        async with _snapshot_lock:
+            generations = await cache_generations(*SNAPSHOT_RESOURCES)
+            if (
+                _snapshot is not None
+                and _snapshot.key == generations
+                and time.time() - _snapshot.loaded_at < analytics_snapshot_max_age()
+            ):
+                return _snapshot
+            started = time.perf_counter()
+            # Generations are read first, so a write racing the load makes the next request reload.
+            billboard_rows = await self.billboard_repository.get_occupancy_rows()
+            (
+                billboard_ids,
+                starts,
+                ends,
+            ) = await self.campaign_billboard_repository.get_active_booking_days()
+            _snapshot = await asyncio.to_thread(
+                OccupancySnapshot.build, generations, billboard_rows, billboard_ids, starts, ends
+            )
+            elapsed = time.perf_counter() - started
+            logging.info(f"Occupancy snapshot loaded with {len(starts)} bookings in {elapsed:.3f}s")
+            return _snapshot
@@ -1,18 +1,34 @@
+import asyncio
+from typing import Callable
+
 from fastapi import HTTPException
 from gotrue.errors import AuthApiError
 from supabase import Client
 
-from src.dependencies import get_supabase
+from src.dependencies import get_auth_executor, thread_supabase
 from src.domain.models.auth import SupabaseSession, UserLogin
+from src.utils.executor import BoundedExecutor, ExecutorSaturated
 
 
 class AuthService:
-    def __init__(self, supabase: Client = None):
-        self.supabase = supabase or get_supabase()
+    def __init__(self, supabase: Callable[[], Client] = None, executor: BoundedExecutor = None):
+        self.supabase = supabase or thread_supabase
+        self.executor = executor or get_auth_executor()
+
+    async def _call(self, method: str, *args):
+        # Runs supabase.auth.<method> on an executor thread, with that thread's client.
+        try:
+            return await self.executor.run(lambda: getattr(self.supabase().auth, method)(*args))
+        except ExecutorSaturated:
+            raise HTTPException(
+                status_code=503, detail="Authentication service is busy, please retry."
+            )
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Authentication provider timed out.")
 
     async def sign_up_user(self, user: UserLogin):
         try:
-            response = self.supabase.auth.sign_up({"email": user.email, "password": user.password})
+            response = await self._call("sign_up", {"email": user.email, "password": user.password})
             if getattr(response, "error", None):
                 raise HTTPException(status_code=400, detail=response.error.message)
             return {"message": "User created. Please verify your email to complete registration."}
@@ -21,7 +37,10 @@ class AuthService:
 
     async def sign_in_user(self, user: UserLogin) -> SupabaseSession:
         try:
-            response = self.supabase.auth.sign_in_with_password({"email": user.email, "password": user.password})
+            response = await self._call(
+                "sign_in_with_password",
+                {"email": user.email, "password": user.password},
+            )
             if getattr(response, "error", None):
                 raise HTTPException(status_code=400, detail=response.error.message)
             return response
@@ -30,7 +49,7 @@ class AuthService:
 
     async def sign_out_user(self):
         try:
-            response = self.supabase.auth.sign_out()
+            response = await self._call("sign_out")
             if getattr(response, "error", None):
                 raise HTTPException(status_code=400, detail=response.error.message)
             return response
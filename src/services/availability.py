@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.cache import cache_generations, invalidate_cache, response_cache, worker_count
+from src.dependencies import new_session
+from src.persistence.availability_index import availability_index
+from src.persistence.repositories import CampaignBillboardRepository
+
+# The "bookings" cache generation the index is known to reflect. A reload reads it before the
+# bookings; this worker's own writes, applied to the index before they bump the generation,
+# move it on (invalidate_bookings). Any other bump, from another worker, leaves the index behind.
+_index_generation: Optional[int] = None
+
+
+class AvailabilityService:
+    def __init__(self, session: AsyncSession):
+        self.repository = CampaignBillboardRepository(session)
+
+    async def rebuild_index(self) -> Dict[str, Any]:
+        global _index_generation
+        try:
+            started = time.perf_counter()
+            generation = await bookings_generation()
+            since = availability_index.begin_replace()
+            try:
+                bookings = await self.repository.get_active_bookings()
+                count = availability_index.replace(bookings, since)
+            finally:
+                availability_index.end_replace()
+            # Writes replayed from the journal may already have moved it past what was read.
+            if generation is None or _index_generation is None:
+                _index_generation = generation
+            else:
+                _index_generation = max(generation, _index_generation)
+            elapsed = time.perf_counter() - started
+            logging.info(f"Availability index rebuilt with {count} bookings in {elapsed:.3f}s")
+            return {**availability_index.stats(), "rebuild_seconds": round(elapsed, 3)}
+        except Exception as exc:
+            logging.exception(f"Error rebuilding availability index: {exc}")
+            raise HTTPException(status_code=500, detail="Failed to rebuild availability index")
+
+    async def check_index(self, sample_size: int = 20) -> Dict[str, Any]:
+        try:
+            expected = set(await self.repository.get_active_bookings())
+            indexed = availability_index.bookings()
+            missing = sorted(expected - indexed)
+            unexpected = sorted(indexed - expected)
+            return {
+                "loaded": availability_index.loaded,
+                "consistent": availability_index.loaded and not missing and not unexpected,
+                "database_bookings": len(expected),
+                "indexed_bookings": len(indexed),
+                "missing": [[str(value) for value in booking] for booking in missing[:sample_size]],
+                "unexpected": [
+                    [str(value) for value in booking] for booking in unexpected[:sample_size]
+                ],
+            }
+        except Exception as exc:
+            logging.exception(f"Error checking availability index: {exc}")
+            raise HTTPException(status_code=500, detail="Failed to check availability index")
+
+
+def availability_index_enabled() -> bool:
+    return os.getenv("AVAILABILITY_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+def check_availability_setup() -> None:
+    # Without a shared generation, another worker's booking would reach this worker's index only
+    # at its next reload, and until then it would answer that the billboard is free.
+    if availability_index_enabled() and response_cache.redis is None and worker_count() > 1:
+        raise RuntimeError(
+            "The availability index needs Redis with more than one worker: set REDIS_URL, or "
+            "AVAILABILITY_INDEX_ENABLED=false"
+        )
+
+
+async def bookings_generation() -> Optional[int]:
+    # As every worker sees it; None when Redis cannot be read.
+    try:
+        return (await cache_generations("bookings", exact=True))[0]
+    except Exception as exc:
+        logging.warning(f"Bookings generation not read: {exc}")
+        return None
+
+
+async def availability_index_current() -> bool:
+    # Whether the index holds every booking written up to the current generation, so what it
+    # answers may be cached under that generation. When not, availability is answered in SQL
+    # until the next reload.
+    if not availability_index.loaded or _index_generation is None:
+        return False
+    return await bookings_generation() == _index_generation
+
+
+async def invalidate_bookings(*resources: str) -> None:
+    # For booking writes already applied to the index. If the bump was the only one since the
+    # generation the index reflects, the index reflects the new generation too.
+    global _index_generation
+    generations = await invalidate_cache(*resources, "bookings")
+    if generations is not None and _index_generation is not None:
+        if generations[-1] == _index_generation + 1:
+            _index_generation = generations[-1]
+
+
+async def load_availability_index() -> None:
+    try:
+        async with new_session() as session:
+            await AvailabilityService(session).rebuild_index()
+    except Exception as exc:
+        # Availability queries keep using SQL until a later refresh succeeds.
+        logging.warning(f"Availability index not loaded: {exc}")
+
+
+async def refresh_availability_index_periodically() -> None:
+    # Each worker holds its own index and only applies its own writes to it, so it reloads as
+    # soon as the shared generation shows another worker booked, and also on a fixed interval
+    # for writes that bypass the API.
+    interval = float(os.getenv("AVAILABILITY_INDEX_REFRESH_SECONDS", "300"))
+    poll = float(os.getenv("AVAILABILITY_INDEX_POLL_SECONDS", "1"))
+    loaded_at = time.monotonic()
+    while True:
+        await asyncio.sleep(poll)
+        generation = await bookings_generation() if availability_index.loaded else None
+        behind = generation is not None and generation != _index_generation
+        if behind or time.monotonic() - loaded_at >= interval:
+            loaded_at = time.monotonic()
+            await load_availability_index()
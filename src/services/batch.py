@@ -0,0 +1,80 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from src.utils.uuid import generate_prefixed_uuid
+
+# Per-item results of the /batch endpoints, one {"index", "id", "status"} per item in request
+# order; status None marks an item still to be applied. all_or_nothing applies every item or
+# none and answers 409 with the results; best_effort applies the valid items and reports why the
+# others were left out.
+
+
+def batch_results(ids: List[Optional[str]]) -> List[Dict[str, Any]]:
+    # An id repeated in the batch is applied once, for its first item.
+    results, seen = [], set()
+    for index, id in enumerate(ids):
+        results.append(
+            {
+                "index": index,
+                "id": id,
+                "status": "duplicate" if id is not None and id in seen else None,
+            }
+        )
+        if id is not None:
+            seen.add(id)
+    return results
+
+
+def pending(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [result for result in results if result["status"] is None]
+
+
+def reject(result: Dict[str, Any], status: str, error: Optional[str] = None) -> None:
+    result["status"] = status
+    if error:
+        result["error"] = error
+
+
+def new_records(
+    results: List[Dict[str, Any]], items: List[BaseModel], id_prefix: str
+) -> List[Dict[str, Any]]:
+    # Rows to insert for the pending items of a create batch, with the ids they get.
+    created_at = datetime.utcnow()
+    records = []
+    for result, item in zip(results, items):
+        if result["status"] is None:
+            result["id"] = generate_prefixed_uuid(id_prefix)
+            records.append(
+                {"id": result["id"], **item.dict(), "created_at": created_at, "is_deleted": False}
+            )
+    return records
+
+
+def mark_applied(results: List[Dict[str, Any]], applied: Set[str], done: str) -> None:
+    # Pending items the write did not return were deleted meanwhile, or never existed.
+    for result in pending(results):
+        result["status"] = done if result["id"] in applied else "not_found"
+
+
+def check_batch(mode: str, results: List[Dict[str, Any]], done: str, message: str) -> None:
+    # Raised inside the batch's unit_of_work, the 409 also rolls back whatever it wrote. A
+    # duplicate is no failure: its id is applied, for the first item.
+    if mode != "all_or_nothing" or all(
+        result["status"] in (None, done, "duplicate") for result in results
+    ):
+        return
+    for result in results:
+        if result["status"] in (None, done):
+            result["status"] = "skipped"
+    raise HTTPException(status_code=409, detail={"message": message, "results": results})
+
+
+def batch_report(mode: str, results: List[Dict[str, Any]], done: str) -> Dict[str, Any]:
+    return {
+        "mode": mode,
+        done: sum(1 for result in results if result["status"] == done),
+        "results": results,
+    }
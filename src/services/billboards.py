@@ -1,19 +1,118 @@
 import logging
-from typing import List
+from datetime import datetime
+from typing import IO, Any, Dict, List, Optional, Tuple
 
+import numpy as np
 from fastapi import HTTPException
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from src.cache import invalidate_cache
 from src.domain.models.billboards import (
-    Billboard,
+    BillboardBatchUpdateItem,
     BillboardCreate,
-    BillboardLocationInfo,
     BillboardUpdate,
 )
-from src.domain.models.common import HATEOASLinkObject, HATEOASLinks
 from src.persistence.models import Billboard as BillboardDB
 from src.persistence.models import Location as LocationDB
 from src.persistence.repositories import BillboardRepository, LocationRepository
+from src.persistence.transactions import unit_of_work
+from src.services.batch import (
+    batch_report,
+    batch_results,
+    check_batch,
+    mark_applied,
+    new_records,
+    pending,
+    reject,
+)
+from src.services.bulk_import import import_csv, parse_floats, row_values
+from src.services.nearby import find_nearest
+from src.utils.cursor import decode_cursor, encode_cursor
+from src.utils.serialization import format_datetime, json_float, link, links
+from src.utils.uuid import generate_prefixed_uuid
+
+BILLBOARDS_HREF = "/api/v1/billboards/"
+LOCATIONS_HREF = "/api/v1/locations/"
+BILLBOARD_CSV_FIELDS = ("width_mt", "height_mt", "dollars_per_day")
+# A row names its location by id or, when that column is empty or missing, by exact address.
+BILLBOARD_CSV_LOCATION_FIELDS = ("location_id", "address")
+
+
+def billboard_row(row: Tuple, row_links: Dict[str, Any]) -> Dict[str, Any]:
+    # A BILLBOARD_ROW_COLUMNS row as the dict a Billboard model would serialize to, keys in
+    # field order.
+    (
+        id,
+        location_id,
+        width_mt,
+        height_mt,
+        dollars_per_day,
+        created_at,
+        address,
+        city,
+        state,
+        country_code,
+        lat,
+        lng,
+    ) = row
+    return {
+        "location_id": location_id,
+        "width_mt": json_float(width_mt),
+        "height_mt": json_float(height_mt),
+        "dollars_per_day": json_float(dollars_per_day),
+        "id": id,
+        "created_at": format_datetime(created_at),
+        "location": {
+            "address": address,
+            "city": city,
+            "state": state,
+            "country_code": country_code,
+            "lat": json_float(lat),
+            "lng": json_float(lng),
+        }
+        if address is not None
+        else None,
+        "links": row_links,
+    }
+
+
+class _LocationLookup:
+    # location_id / address -> live location ids, filled with one query per batch for the
+    # references it has not seen yet and kept for the rest of the file.
+    def __init__(self, repository: LocationRepository):
+        self.repository = repository
+        self.by_id: Dict[str, bool] = {}
+        self.by_address: Dict[str, List[str]] = {}
+
+    async def resolve(self, location_ids: List[str], addresses: List[str]) -> None:
+        new_ids = {id for id in location_ids if id and id not in self.by_id}
+        if new_ids:
+            existing = await self.repository.get_existing_ids(list(new_ids))
+            self.by_id.update((id, id in existing) for id in new_ids)
+        new_addresses = {
+            address for address in addresses if address and address not in self.by_address
+        }
+        if new_addresses:
+            self.by_address.update((address, []) for address in new_addresses)
+            for address, id in await self.repository.get_ids_by_address(list(new_addresses)):
+                self.by_address[address].append(id)
+
+    def location_for(self, location_id: str, address: str) -> Tuple[Optional[str], Optional[str]]:
+        # (location id, None) or (None, why the row has none).
+        if location_id:
+            return (
+                (location_id, None)
+                if self.by_id[location_id]
+                else (None, f"location {location_id!r} not found")
+            )
+        if not address:
+            return None, "location_id or address is required"
+        matches = self.by_address[address]
+        if len(matches) == 1:
+            return matches[0], None
+        if not matches:
+            return None, f"no location at address {address!r}"
+        return None, f"address {address!r} matches {len(matches)} locations, use location_id"
 
 
 class BillboardService:
@@ -21,128 +120,261 @@ class BillboardService:
         self.repository = BillboardRepository(BillboardDB, session)
         self.location_repository = LocationRepository(LocationDB, session)
 
-    async def create_billboard(self, billboard: BillboardCreate) -> Billboard:
+    async def create_billboard(self, billboard: BillboardCreate) -> Dict[str, Any]:
         try:
-            db_billboard = BillboardDB(**billboard.dict())
-            created = await self.repository.create(db_billboard)
-            location = await self.location_repository.get(created.location_id)
-            location_info = BillboardLocationInfo(
-                address=location.address,
-                city=location.city,
-                state=location.state,
-                country_code=location.country_code,
-                lat=location.lat,
-                lng=location.lng
-            ) if location else None
-            links = HATEOASLinks(
-                self=HATEOASLinkObject(name="self", method="GET", href=f"/api/v1/billboards/{created.id}"),
-                actions=[
-                    HATEOASLinkObject(name="update", method="PATCH", href=f"/api/v1/billboards/{created.id}"),
-                    HATEOASLinkObject(name="delete", method="DELETE", href=f"/api/v1/billboards/{created.id}")
-                ],
-                related=[
-                    HATEOASLinkObject(name="location", method="GET", href=f"/api/v1/locations/{created.location_id}")
-                ]
-            )
-            return Billboard(**created.dict(), links=links, location=location_info)
+            row = await self.repository.create_row(BillboardDB(**billboard.dict()))
+            await invalidate_cache("billboards")
+            return self._to_row(row)
         except HTTPException:
             raise
         except Exception as exc:
             logging.exception(f"Error creating billboard: {exc}")
             raise HTTPException(status_code=500, detail="Failed to create billboard")
 
-    async def get_billboard(self, id: str) -> Billboard:
+    async def get_billboard(self, id: str) -> Dict[str, Any]:
         try:
-            bill = await self.repository.get_with_location(id)
-            if not bill:
+            row = await self.repository.get_row_with_location(id)
+            if not row:
                 raise HTTPException(status_code=404, detail="Billboard not found")
-            return Billboard(
-                **bill.dict(),
-                location=BillboardLocationInfo(
-                    address=bill.location.address,
-                    city=bill.location.city,
-                    state=bill.location.state,
-                    country_code=bill.location.country_code,
-                    lat=bill.location.lat,
-                    lng=bill.location.lng
-                ) if bill.location else None,
-                links = HATEOASLinks(
-                    self=HATEOASLinkObject(name="self", method="GET", href=f"/api/v1/billboards/{bill.id}"),
-                    actions=[
-                        HATEOASLinkObject(name="update", method="PATCH", href=f"/api/v1/billboards/{bill.id}"),
-                        HATEOASLinkObject(name="delete", method="DELETE", href=f"/api/v1/billboards/{bill.id}")
-                    ],
-                    related=[
-                        HATEOASLinkObject(name="location", method="GET", href=f"/api/v1/locations/{bill.location_id}")
-                    ]
-                )
-            )
+            return self._to_row(row)
         except HTTPException:
             raise
         except Exception as exc:
             logging.exception(f"Error getting billboard: {exc}")
             raise HTTPException(status_code=500, detail="Failed to get billboard")
 
-    async def get_billboards(self, offset: int = 0, limit: int = 100) -> List[Billboard]:
+    async def get_billboards(self, offset: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
         try:
-            billboards = await self.repository.get_all_with_location(offset, limit)
-            return [Billboard(
-                **bill.dict(),
-                location=BillboardLocationInfo(
-                    address=bill.location.address,
-                    city=bill.location.city,
-                    state=bill.location.state,
-                    country_code=bill.location.country_code,
-                    lat=bill.location.lat,
-                    lng=bill.location.lng
-                ) if bill.location else None,
-                links = HATEOASLinks(
-                    self=HATEOASLinkObject(name="self", method="GET", href=f"/api/v1/billboards/{bill.id}"),
-                    actions=[
-                        HATEOASLinkObject(name="update", method="PATCH", href=f"/api/v1/billboards/{bill.id}"),
-                        HATEOASLinkObject(name="delete", method="DELETE", href=f"/api/v1/billboards/{bill.id}")
-                    ],
-                    related=[
-                        HATEOASLinkObject(name="location", method="GET", href=f"/api/v1/locations/{bill.location_id}")
-                    ]
-                )
-            ) for bill in billboards]
+            rows = await self.repository.get_rows_with_location(offset, limit)
+            return [self._to_row(row) for row in rows]
         except Exception as exc:
             logging.exception(f"Error getting billboards: {exc}")
             raise HTTPException(status_code=500, detail="Failed to get billboards")
 
-    async def update_billboard(self, id: str, billboard_update: BillboardUpdate) -> Billboard:
+    async def get_billboards_page(
+        self, cursor: str, limit: int = 100
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        try:
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        try:
+            rows, last_key = await self.repository.get_row_page_with_location(after, limit)
+            next_cursor = encode_cursor(*last_key) if last_key else None
+            return [self._to_row(row) for row in rows], next_cursor
+        except Exception as exc:
+            logging.exception(f"Error getting billboards page: {exc}")
+            raise HTTPException(status_code=500, detail="Failed to get billboards")
+
+    async def estimate_total(self) -> Optional[int]:
+        try:
+            return await self.repository.estimate_count()
+        except Exception as exc:
+            logging.exception(f"Error estimating billboards count: {exc}")
+            return None
+
+    async def get_nearby_billboards(
+        self, lat: float, lng: float, radius_km: float, offset: int = 0, limit: int = 100
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        try:
+            page_ids, distances, total = await find_nearest(
+                self.repository, lat, lng, radius_km, offset, limit
+            )
+            rows = {
+                row[0]: row for row in await self.repository.get_rows_with_location_by_ids(page_ids)
+            }
+            # Same shape and key order as the NearbyBillboard model.
+            return [
+                {**self._to_row(rows[id]), "distance_km": round(distance, 3)}
+                for id, distance in zip(page_ids, distances)
+                if id in rows
+            ], total
+        except Exception as exc:
+            logging.exception(f"Error getting nearby billboards: {exc}")
+            raise HTTPException(status_code=500, detail="Failed to get nearby billboards")
+
+    def _to_row(self, row: Tuple) -> Dict[str, Any]:
+        href = BILLBOARDS_HREF + row[0]
+        return billboard_row(
+            row,
+            links(
+                link("self", "GET", href),
+                actions=[link("update", "PATCH", href), link("delete", "DELETE", href)],
+                related=[link("location", "GET", LOCATIONS_HREF + row[1])],
+            ),
+        )
+
+    async def update_billboard(self, id: str, billboard_update: BillboardUpdate) -> Dict[str, Any]:
         try:
-            billboard = await self.repository.get(id)
-            if not billboard:
-                raise HTTPException(status_code=404, detail="Billboard not found")
             update_data = billboard_update.dict(exclude_unset=True)
-            for key, value in update_data.items():
-                setattr(billboard, key, value)
-            await self.repository.update(billboard)
-            location = await self.location_repository.get(billboard.location_id)
-            location_info = BillboardLocationInfo(
-                address=location.address,
-                city=location.city,
-                state=location.state,
-                country_code=location.country_code,
-                lat=location.lat,
-                lng=location.lng
-            ) if location else None
-            links = HATEOASLinks(self=HATEOASLinkObject(name="self", method="GET", href=f"/api/v1/billboards/{id}"))
-            return Billboard(**billboard.dict(), links=links, location=location_info)
+            if update_data:
+                row = await self.repository.update_row(id, update_data)
+            else:
+                row = await self.repository.get_row_with_location(id)
+            if row is None:
+                raise HTTPException(status_code=404, detail="Billboard not found")
+            await invalidate_cache("billboards")
+            return billboard_row(row, links(link("self", "GET", BILLBOARDS_HREF + id)))
         except HTTPException:
             raise
         except Exception as exc:
             logging.exception(f"Error updating billboard: {exc}")
             raise HTTPException(status_code=500, detail="Failed to update billboard")
 
+    async def create_billboards(self, items: List[BillboardCreate], mode: str) -> Dict[str, Any]:
+        try:
+            results = batch_results([None] * len(items))
+            existing = await self.location_repository.get_existing_ids(
+                list({item.location_id for item in items})
+            )
+            for result, item in zip(results, items):
+                if item.location_id not in existing:
+                    reject(result, "location_not_found")
+            check_batch(
+                mode, results, "created", "Some billboards cannot be created, nothing was created"
+            )
+            records = new_records(results, items, "bill")
+            async with unit_of_work(self.repository.session):
+                created = await self.repository.insert_many(records) if records else []
+                mark_applied(results, set(created), "created")
+            if created:
+                await invalidate_cache("billboards")
+            return batch_report(mode, results, "created")
+        except HTTPException:
+            raise
+        except Exception as exc:
+            logging.exception(f"Error creating billboards: {exc}")
+            raise HTTPException(status_code=500, detail="Failed to create billboards")
+
+    async def update_billboards(
+        self, items: List[BillboardBatchUpdateItem], mode: str
+    ) -> Dict[str, Any]:
+        try:
+            results = batch_results([item.id for item in items])
+            location_ids = {item.location_id for item in items if item.location_id is not None}
+            existing = (
+                await self.location_repository.get_existing_ids(list(location_ids))
+                if location_ids
+                else set()
+            )
+            rows = []
+            for result, item in zip(results, items):
+                if result["status"] is not None:
+                    continue
+                if item.location_id is not None and item.location_id not in existing:
+                    reject(result, "location_not_found")
+                    continue
+                rows.append(item.dict(exclude_unset=True, exclude_none=True))
+            check_batch(
+                mode, results, "updated", "Some billboards cannot be updated, nothing was changed"
+            )
+            async with unit_of_work(self.repository.session):
+                updated = await self.repository.update_from_values(rows) if rows else set()
+                mark_applied(results, updated, "updated")
+                check_batch(
+                    mode,
+                    results,
+                    "updated",
+                    "Some billboards cannot be updated, nothing was changed",
+                )
+            if updated:
+                await invalidate_cache("billboards")
+            return batch_report(mode, results, "updated")
+        except HTTPException:
+            raise
+        except Exception as exc:
+            logging.exception(f"Error updating billboards: {exc}")
+            raise HTTPException(status_code=500, detail="Failed to update billboards")
+
+    async def delete_billboards(self, ids: List[str], mode: str) -> Dict[str, Any]:
+        try:
+            results = batch_results(ids)
+            async with unit_of_work(self.repository.session):
+                deleted = await self.repository.delete_many(
+                    [result["id"] for result in pending(results)]
+                )
+                mark_applied(results, deleted, "deleted")
+                check_batch(
+                    mode,
+                    results,
+                    "deleted",
+                    "Some billboards cannot be deleted, nothing was deleted",
+                )
+            if deleted:
+                await invalidate_cache("billboards")
+            return batch_report(mode, results, "deleted")
+        except HTTPException:
+            raise
+        except Exception as exc:
+            logging.exception(f"Error deleting billboards: {exc}")
+            raise HTTPException(status_code=500, detail="Failed to delete billboards")
+
+    async def bulk_load_billboards_from_csv(
+        self, csv_file: IO[bytes], strict: bool = False
+    ) -> Dict[str, Any]:
+        locations = _LocationLookup(self.location_repository)
+
+        async def validate(
+            rows: List[List[str]], columns: Dict[str, int], first_row: int
+        ) -> Tuple[List[Dict[str, Any]], List[str]]:
+            location_ids = row_values(rows, columns.get("location_id"))
+            addresses = row_values(rows, columns.get("address"))
+            await locations.resolve(location_ids, addresses)
+            sizes = [row_values(rows, columns[field]) for field in BILLBOARD_CSV_FIELDS]
+            widths, heights, prices = (parse_floats(values) for values in sizes)
+            valid = (
+                np.isfinite(widths)
+                & (widths > 0)
+                & np.isfinite(heights)
+                & (heights > 0)
+                & np.isfinite(prices)
+                & (prices >= 0)
+            )
+            records, errors = [], []
+            created_at = datetime.utcnow()
+            for i in range(len(rows)):
+                location_id, error = locations.location_for(location_ids[i], addresses[i])
+                if error:
+                    errors.append(f"Row {first_row + i}: {error}")
+                elif not valid[i]:
+                    errors.append(
+                        f"Row {first_row + i}: invalid size or price width_mt={sizes[0][i]!r} "
+                        f"height_mt={sizes[1][i]!r} dollars_per_day={sizes[2][i]!r}"
+                    )
+                else:
+                    records.append(
+                        {
+                            "id": generate_prefixed_uuid("bill"),
+                            "location_id": location_id,
+                            "width_mt": float(widths[i]),
+                            "height_mt": float(heights[i]),
+                            "dollars_per_day": float(prices[i]),
+                            "created_at": created_at,
+                            "is_deleted": False,
+                        }
+                    )
+            return records, errors
+
+        async def on_committed(records: List[Dict[str, Any]]) -> None:
+            await invalidate_cache("billboards")
+
+        return await import_csv(
+            self.repository.session,
+            csv_file,
+            "billboards",
+            BILLBOARD_CSV_FIELDS,
+            validate,
+            self.repository.insert_many,
+            strict,
+            any_of=BILLBOARD_CSV_LOCATION_FIELDS,
+            on_committed=on_committed,
+        )
+
     async def delete_billboard(self, id: str) -> None:
         try:
-            billboard = await self.repository.get(id)
-            if not billboard:
+            if not await self.repository.delete(id):
                 raise HTTPException(status_code=404, detail="Billboard not found")
-            await self.repository.delete(id)
+            await invalidate_cache("billboards")
         except HTTPException:
             raise
         except Exception as exc:
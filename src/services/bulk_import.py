@@ -0,0 +1,159 @@
+import asyncio
+import csv
+import io
+import logging
+import os
+from itertools import islice
+from typing import IO, Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+# Validates one batch of CSV rows: (records to insert, error messages).
+ValidateBatch = Callable[
+    [List[List[str]], Dict[str, int], int], Awaitable[Tuple[List[Dict[str, Any]], List[str]]]
+]
+# Inserts validated records without committing and returns what the report lists for them.
+InsertBatch = Callable[[List[Dict[str, Any]]], Awaitable[List[Any]]]
+
+
+def bulk_batch_size(resource: str) -> int:
+    return int(
+        os.getenv(f"{resource.upper()}_BULK_BATCH_SIZE") or os.getenv("BULK_BATCH_SIZE", "5000")
+    )
+
+
+def bulk_max_reported(resource: str) -> int:
+    # Caps the items and errors echoed back; counts always cover the whole file.
+    return int(
+        os.getenv(f"{resource.upper()}_BULK_MAX_REPORTED") or os.getenv("BULK_MAX_REPORTED", "1000")
+    )
+
+
+def read_csv_batch(reader, batch_size: int) -> List[List[str]]:
+    return list(islice(reader, batch_size))
+
+
+def skip_csv_rows(reader, count: int) -> None:
+    for _ in islice(reader, count):
+        pass
+
+
+def parse_floats(values: List[str]) -> np.ndarray:
+    try:
+        return np.array(values, dtype=float)
+    except (TypeError, ValueError):
+        parsed = np.empty(len(values))
+        for i, value in enumerate(values):
+            try:
+                parsed[i] = float(value)
+            except (TypeError, ValueError):
+                parsed[i] = np.nan
+        return parsed
+
+
+def row_values(rows: List[List[str]], position: Optional[int]) -> List[str]:
+    # One column of a batch, stripped; "" for rows too short to hold it or a column the file lacks.
+    if position is None:
+        return [""] * len(rows)
+    return [row[position].strip() if len(row) > position else "" for row in rows]
+
+
+async def import_csv(
+    session: AsyncSession,
+    csv_file: IO[bytes],
+    resource: str,
+    required: Sequence[str],
+    validate: ValidateBatch,
+    insert: InsertBatch,
+    strict: bool = False,
+    any_of: Sequence[str] = (),
+    on_committed: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None,
+    on_failed: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    checkpoint: Optional[Dict[str, Any]] = None,
+    on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+) -> Dict[str, Any]:
+    # The batch loop of the bulk loads: batch_size rows at a time are read, validated (references
+    # resolved with one query per batch) and inserted as one executemany, so memory does not grow
+    # with the file. Invalid rows are reported and skipped; in strict mode any failure rolls back
+    # the whole file, as a single transaction.
+    # on_committed gets the records of every committed batch (of the whole file in strict mode),
+    # so caches can follow the load as it goes.
+    # on_progress gets the report after every batch; passed back as checkpoint, a report of a
+    # non-strict load resumes it after the rows it covers.
+    batch_size = bulk_batch_size(resource)
+    max_reported = bulk_max_reported(resource)
+    reader = csv.reader(io.TextIOWrapper(csv_file, encoding="utf-8-sig", newline=""))
+    report = {"rows": 0, "created": 0, resource: [], "error_count": 0, "errors": []}
+    if checkpoint and not strict:
+        report = {**report, **checkpoint}
+    committed: List[Dict[str, Any]] = []
+
+    def add_errors(errors: List[str]) -> None:
+        report["error_count"] += len(errors)
+        report["errors"].extend(errors[: max_reported - len(report["errors"])])
+
+    def add_created(created: List[Any]) -> None:
+        report["created"] += len(created)
+        report[resource].extend(created[: max_reported - len(report[resource])])
+
+    try:
+        header = await asyncio.to_thread(next, reader, [])
+        columns = {name.strip(): index for index, name in enumerate(header)}
+        if not set(required).issubset(columns) or (any_of and not set(any_of) & set(columns)):
+            return {
+                **report,
+                "error_count": 1,
+                "errors": ["Missing required fields in CSV header."],
+            }
+        transaction = await session.begin() if strict else None
+        first_row = 2  # the header is row 1
+        if report["rows"]:
+            await asyncio.to_thread(skip_csv_rows, reader, report["rows"])
+            first_row += report["rows"]
+        while True:
+            rows = await asyncio.to_thread(read_csv_batch, reader, batch_size)
+            if not rows:
+                break
+            start, end = first_row, first_row + len(rows) - 1
+            first_row += len(rows)
+            report["rows"] += len(rows)
+            if strict:
+                records, errors = await validate(rows, columns, start)
+                add_errors(errors)
+                if records and not report["error_count"]:
+                    add_created(await insert(records))
+                    committed.extend(records)
+            else:
+                records, errors = [], []
+                try:
+                    async with session.begin():
+                        records, errors = await validate(rows, columns, start)
+                        created = await insert(records) if records else []
+                except Exception as exc:
+                    logging.exception(f"Error importing {resource} batch: {exc}")
+                    add_errors(errors + [f"Rows {start}-{end}: insert failed: {exc}"])
+                    if on_failed is not None and records:
+                        on_failed(records)
+                else:
+                    add_errors(errors)
+                    add_created(created)
+                    if on_committed is not None and records:
+                        await on_committed(records)
+            if on_progress is not None:
+                await on_progress(report)
+        if transaction is not None:
+            if report["error_count"]:
+                await transaction.rollback()
+                report["created"], report[resource] = 0, []
+            else:
+                await transaction.commit()
+                if on_committed is not None and committed:
+                    await on_committed(committed)
+    except Exception as exc:
+        logging.exception(f"Error bulk loading {resource}: {exc}")
+        if strict:
+            await session.rollback()
+            report["created"], report[resource] = 0, []
+        add_errors([f"Bulk insert failed: {exc}"])
+    return report
@@ -1,59 +1,84 @@
 import logging
+import os
 from datetime import date
-from typing import List
+from typing import IO, Any, Dict, List, Optional, Tuple
 
 from fastapi import HTTPException
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from src.domain.models.billboards import Billboard, BillboardLocationInfo, HATEOASLinks
-from src.domain.models.common import HATEOASLinkObject
+from src.domain.models.common import HATEOASLinkObject, HATEOASLinks
+from src.persistence.availability_index import AvailabilityIndex, availability_index
+from src.persistence.errors import BookingConflict
 from src.persistence.models import Billboard as BillboardDB
 from src.persistence.models import Campaign as CampaignDB
 from src.persistence.repositories import (
     BillboardRepository,
     CampaignBillboardRepository,
     CampaignRepository,
+    booking_period,
 )
+from src.persistence.transactions import is_retryable, retry_transaction
+from src.services.availability import availability_index_current, invalidate_bookings
+from src.services.billboards import BILLBOARDS_HREF, billboard_row
+from src.services.bulk_import import import_csv, row_values
+from src.services.campaigns import CAMPAIGNS_HREF
+from src.utils.serialization import link, links
+
+BOOKING_CSV_FIELDS = ("campaign_id", "billboard_id")
+
+
+def booking_retry_attempts() -> int:
+    return int(os.getenv("BOOKING_RETRY_ATTEMPTS", "3"))
+
+
+def booking_retry_base_delay() -> float:
+    return float(os.getenv("BOOKING_RETRY_BASE_DELAY_SECONDS", "0.05"))
+
+
+def booking_lock_timeout_ms() -> int:
+    # How long a booking waits for another one holding the same billboards; 0 waits indefinitely.
+    return int(float(os.getenv("BOOKING_LOCK_TIMEOUT_SECONDS", "5")) * 1000)
 
 
 class CampaignBillboardService:
     def __init__(self, session: AsyncSession):
+        self.session = session
         self.repository = CampaignBillboardRepository(session)
         self.campaign_repository = CampaignRepository(CampaignDB, session)
         self.billboard_repository = BillboardRepository(BillboardDB, session)
 
-    async def get_availability(self, campaign_id: str, start_date: date, end_date: date) -> List[Billboard]:
+    async def get_availability(
+        self, campaign_id: str, start_date: date, end_date: date
+    ) -> List[Dict[str, Any]]:
         try:
             if campaign_id and (start_date or end_date):
-                raise HTTPException(status_code=400, detail="Either provide a campaign_id or a start_date and end_date, but not both.")
+                raise HTTPException(
+                    status_code=400,
+                    detail=(
+                        "Either provide a campaign_id or a start_date and end_date, but not both."
+                    ),
+                )
             if campaign_id:
                 campaign = await self.campaign_repository.get(campaign_id)
                 if not campaign:
                     raise HTTPException(status_code=404, detail="Campaign not found")
                 start_date = campaign.start_date
                 end_date = campaign.end_date
-            available_billboards = await self.repository.get_available_billboards(start_date, end_date)
-            if not available_billboards:
-                return []
+            rows = await self.repository.get_available_billboard_rows(
+                start_date, end_date, await availability_index_current()
+            )
+            add_href = f"{CAMPAIGNS_HREF}{campaign_id}/add/"
             return [
-                Billboard(
-                    **b.dict(),
-                    location=BillboardLocationInfo(
-                        address=b.location.address,
-                        city=b.location.city,
-                        state=b.location.state,
-                        country_code=b.location.country_code,
-                        lat=b.location.lat,
-                        lng=b.location.lng
-                    ) if b.location else None,
-                    links=HATEOASLinks(
-                        self=HATEOASLinkObject(name="self", method="GET", href=f"/api/v1/billboards/{b.id}"),
-                        actions=([
-                            HATEOASLinkObject(name="add_to_campaign", method="POST", href=f"/api/v1/campaigns/{campaign_id}/add/{b.id}")
-                        ] if campaign_id else None)
-                    )
+                billboard_row(
+                    row,
+                    links(
+                        link("self", "GET", BILLBOARDS_HREF + row[0]),
+                        actions=[link("add_to_campaign", "POST", add_href + row[0])]
+                        if campaign_id
+                        else None,
+                    ),
                 )
-                for b in available_billboards
+                for row in rows
             ]
         except HTTPException:
             raise
@@ -63,32 +88,193 @@ class CampaignBillboardService:
 
     async def add_billboard_to_campaign(self, campaign_id: str, billboard_id: str) -> dict:
         try:
-            campaign = await self.campaign_repository.get(campaign_id)
-            if not campaign:
-                raise HTTPException(status_code=404, detail="Campaign not found")
-            billboard = await self.billboard_repository.get(billboard_id)
-            if not billboard:
+            start_date, end_date, statuses = await self._book_with_retries(
+                campaign_id, [billboard_id], "all_or_nothing"
+            )
+            if statuses[billboard_id] == "not_found":
                 raise HTTPException(status_code=404, detail="Billboard not found")
-            available = await self.repository.check_billboard_availability(billboard_id, campaign.start_date, campaign.end_date)
-            if not available:
-                raise HTTPException(status_code=400, detail="Billboard is not available for this campaign")
-            await self.repository.link_billboard_campaign(campaign_id, billboard_id)
+            if statuses[billboard_id] != "booked":
+                raise HTTPException(
+                    status_code=400, detail="Billboard is not available for this campaign"
+                )
+            availability_index.add(billboard_id, campaign_id, start_date, end_date)
+            await invalidate_bookings()
             links = HATEOASLinks(
                 actions=[
-                    HATEOASLinkObject(name="undo", method="POST", href=f"/api/v1/campaigns/{campaign_id}/remove/{billboard_id}")
+                    HATEOASLinkObject(
+                        name="undo",
+                        method="POST",
+                        href=f"/api/v1/campaigns/{campaign_id}/remove/{billboard_id}",
+                    )
                 ],
                 related=[
-                    HATEOASLinkObject(name="billboard", method="GET", href=f"/api/v1/billboards/{billboard_id}"),
-                    HATEOASLinkObject(name="campaign", method="GET", href=f"/api/v1/campaigns/{campaign_id}")
-                ]
+                    HATEOASLinkObject(
+                        name="billboard", method="GET", href=f"/api/v1/billboards/{billboard_id}"
+                    ),
+                    HATEOASLinkObject(
+                        name="campaign", method="GET", href=f"/api/v1/campaigns/{campaign_id}"
+                    ),
+                ],
             )
             return {"message": "Billboard added to campaign", "links": links}
         except HTTPException:
             raise
+        except BookingConflict:
+            raise HTTPException(
+                status_code=400, detail="Billboard is not available for this campaign"
+            )
         except Exception as exc:
+            if is_retryable(exc):
+                raise HTTPException(status_code=503, detail="Billboard is busy, try again")
             logging.exception(f"Error adding billboard to campaign: {exc}")
             raise HTTPException(status_code=500, detail="Failed to add billboard to campaign")
 
+    async def add_billboards_to_campaign(
+        self, campaign_id: str, billboard_ids: List[str], mode: str = "all_or_nothing"
+    ) -> Dict[str, Any]:
+        try:
+            billboard_ids = list(dict.fromkeys(billboard_ids))
+            start_date, end_date, statuses = await self._book_with_retries(
+                campaign_id, billboard_ids, mode
+            )
+            to_book = [
+                billboard_id for billboard_id, status in statuses.items() if status == "booked"
+            ]
+            if mode == "all_or_nothing" and len(to_book) < len(billboard_ids):
+                results = [
+                    {
+                        "billboard_id": billboard_id,
+                        "status": "skipped" if status == "booked" else status,
+                    }
+                    for billboard_id, status in statuses.items()
+                ]
+                raise HTTPException(
+                    status_code=409,
+                    detail={
+                        "message": "Some billboards cannot be booked, nothing was added",
+                        "results": results,
+                    },
+                )
+            if to_book:
+                for billboard_id in to_book:
+                    availability_index.add(billboard_id, campaign_id, start_date, end_date)
+                await invalidate_bookings()
+            links = HATEOASLinks(
+                related=[
+                    HATEOASLinkObject(
+                        name="campaign", method="GET", href=f"/api/v1/campaigns/{campaign_id}"
+                    )
+                ]
+            )
+            return {
+                "mode": mode,
+                "booked": to_book,
+                "results": [
+                    {"billboard_id": billboard_id, "status": status}
+                    for billboard_id, status in statuses.items()
+                ],
+                "links": links,
+            }
+        except HTTPException:
+            raise
+        except BookingConflict:
+            raise HTTPException(
+                status_code=409,
+                detail={"message": "Some billboards were booked meanwhile, nothing was added"},
+            )
+        except Exception as exc:
+            if is_retryable(exc):
+                raise HTTPException(status_code=503, detail="Billboards are busy, try again")
+            logging.exception(f"Error adding billboards to campaign: {exc}")
+            raise HTTPException(status_code=500, detail="Failed to add billboards to campaign")
+
+    async def _book_with_retries(
+        self, campaign_id: str, billboard_ids: List[str], mode: str
+    ) -> Tuple[date, date, Dict[str, str]]:
+        return await retry_transaction(
+            self.session,
+            lambda: self._book(campaign_id, billboard_ids, mode),
+            attempts=booking_retry_attempts(),
+            base_delay=booking_retry_base_delay(),
+        )
+
+    async def _book(
+        self, campaign_id: str, billboard_ids: List[str], mode: str
+    ) -> Tuple[date, date, Dict[str, str]]:
+        # One attempt, as one transaction. The billboards' locks are taken before they are checked,
+        # so the check and the insert see the same bookings: concurrent bookings serialize only on
+        # the billboards they share. Returns the campaign's dates and a status per billboard.
+        campaign = await self.campaign_repository.get_locked(campaign_id, shared=True)
+        if not campaign:
+            raise HTTPException(status_code=404, detail="Campaign not found")
+        start_date, end_date = campaign.start_date, campaign.end_date
+        await self.repository.lock_billboards(billboard_ids, booking_lock_timeout_ms())
+        existing = await self.billboard_repository.get_existing_ids(billboard_ids)
+        conflicts = await self.repository.get_conflicting_bookings(
+            billboard_ids, start_date, end_date
+        )
+        statuses = {}
+        for billboard_id in billboard_ids:
+            if billboard_id not in existing:
+                statuses[billboard_id] = "not_found"
+            elif conflicts.get(billboard_id) == campaign_id:
+                statuses[billboard_id] = "already_in_campaign"
+            elif billboard_id in conflicts:
+                statuses[billboard_id] = "conflict"
+            else:
+                statuses[billboard_id] = "booked"
+        to_book = [billboard_id for billboard_id, status in statuses.items() if status == "booked"]
+        if not to_book or (mode == "all_or_nothing" and len(to_book) < len(billboard_ids)):
+            await self.session.rollback()
+            return start_date, end_date, statuses
+        # Writers that take no locks (bulk loads) can still get in first: the exclusion constraint
+        # then fails all_or_nothing as a whole and leaves best_effort's billboard out.
+        booked = await self.repository.link_billboards_campaign(
+            campaign_id, to_book, start_date, end_date, skip_conflicts=mode != "all_or_nothing"
+        )
+        for billboard_id in to_book:
+            if billboard_id not in booked:
+                statuses[billboard_id] = "conflict"
+        return start_date, end_date, statuses
+
+    async def remove_billboards_from_campaign(
+        self, campaign_id: str, billboard_ids: List[str]
+    ) -> Dict[str, Any]:
+        try:
+            billboard_ids = list(dict.fromkeys(billboard_ids))
+            campaign = await self.campaign_repository.get(campaign_id)
+            if not campaign:
+                raise HTTPException(status_code=404, detail="Campaign not found")
+            removed = await self.repository.unlink_billboards_campaign(campaign_id, billboard_ids)
+            for billboard_id in removed:
+                availability_index.remove(billboard_id, campaign_id)
+            await invalidate_bookings()
+            links = HATEOASLinks(
+                related=[
+                    HATEOASLinkObject(
+                        name="campaign", method="GET", href=f"/api/v1/campaigns/{campaign_id}"
+                    )
+                ]
+            )
+            return {
+                "removed": [
+                    billboard_id for billboard_id in billboard_ids if billboard_id in removed
+                ],
+                "results": [
+                    {
+                        "billboard_id": billboard_id,
+                        "status": "removed" if billboard_id in removed else "not_in_campaign",
+                    }
+                    for billboard_id in billboard_ids
+                ],
+                "links": links,
+            }
+        except HTTPException:
+            raise
+        except Exception as exc:
+            logging.exception(f"Error removing billboards from campaign: {exc}")
+            raise HTTPException(status_code=500, detail="Failed to remove billboards from campaign")
+
     async def remove_billboard_from_campaign(self, campaign_id: str, billboard_id: str) -> dict:
         try:
             campaign = await self.campaign_repository.get(campaign_id)
@@ -98,14 +284,24 @@ class CampaignBillboardService:
             if not billboard:
                 raise HTTPException(status_code=404, detail="Billboard not found")
             await self.repository.unlink_billboard_campaign(campaign_id, billboard_id)
+            availability_index.remove(billboard_id, campaign_id)
+            await invalidate_bookings()
             links = HATEOASLinks(
                 actions=[
-                    HATEOASLinkObject(name="undo", method="POST", href=f"/api/v1/campaigns/{campaign_id}/add/{billboard_id}")
+                    HATEOASLinkObject(
+                        name="undo",
+                        method="POST",
+                        href=f"/api/v1/campaigns/{campaign_id}/add/{billboard_id}",
+                    )
                 ],
                 related=[
-                    HATEOASLinkObject(name="billboard", method="GET", href=f"/api/v1/billboards/{billboard_id}"),
-                    HATEOASLinkObject(name="campaign", method="GET", href=f"/api/v1/campaigns/{campaign_id}")
-                ]
+                    HATEOASLinkObject(
+                        name="billboard", method="GET", href=f"/api/v1/billboards/{billboard_id}"
+                    ),
+                    HATEOASLinkObject(
+                        name="campaign", method="GET", href=f"/api/v1/campaigns/{campaign_id}"
+                    ),
+                ],
             )
             return {"message": "Billboard removed from campaign", "links": links}
         except HTTPException:
@@ -113,3 +309,86 @@ class CampaignBillboardService:
         except Exception as exc:
             logging.exception(f"Error removing billboard from campaign: {exc}")
             raise HTTPException(status_code=500, detail="Failed to remove billboard from campaign")
+
+    async def bulk_load_bookings_from_csv(
+        self, csv_file: IO[bytes], strict: bool = False
+    ) -> Dict[str, Any]:
+        # Campaign periods and billboard ids are looked up once per batch for the ids not seen
+        # yet. booked holds the live bookings of every billboard the file has named, plus the
+        # file's own accepted rows, so overlaps are checked in memory against both at once.
+        periods: Dict[str, Optional[Tuple[date, date]]] = {}
+        billboards: Dict[str, bool] = {}
+        booked = AvailabilityIndex()
+
+        async def validate(
+            rows: List[List[str]], columns: Dict[str, int], first_row: int
+        ) -> Tuple[List[Dict[str, Any]], List[str]]:
+            campaign_ids = row_values(rows, columns["campaign_id"])
+            billboard_ids = row_values(rows, columns["billboard_id"])
+            new_campaigns = {id for id in campaign_ids if id and id not in periods}
+            if new_campaigns:
+                found = await self.campaign_repository.get_periods(list(new_campaigns))
+                periods.update((id, found.get(id)) for id in new_campaigns)
+            new_billboards = {id for id in billboard_ids if id and id not in billboards}
+            if new_billboards:
+                existing = await self.billboard_repository.get_existing_ids(list(new_billboards))
+                billboards.update((id, id in existing) for id in new_billboards)
+                for booking in (
+                    await self.repository.get_bookings_for_billboards(list(existing))
+                    if existing
+                    else []
+                ):
+                    booked.add(*booking)
+            records, errors = [], []
+            for i, (campaign_id, billboard_id) in enumerate(zip(campaign_ids, billboard_ids)):
+                period = periods.get(campaign_id)
+                if period is None:
+                    errors.append(f"Row {first_row + i}: campaign {campaign_id!r} not found")
+                elif not billboards.get(billboard_id):
+                    errors.append(f"Row {first_row + i}: billboard {billboard_id!r} not found")
+                elif booked.holds(billboard_id, campaign_id):
+                    errors.append(
+                        f"Row {first_row + i}: billboard {billboard_id!r} is already in campaign "
+                        f"{campaign_id!r}"
+                    )
+                elif not booked.is_free(billboard_id, *period):
+                    errors.append(
+                        f"Row {first_row + i}: billboard {billboard_id!r} is already booked "
+                        f"between {period[0]} and {period[1]}"
+                    )
+                else:
+                    booked.add(billboard_id, campaign_id, *period)
+                    records.append({"campaign_id": campaign_id, "billboard_id": billboard_id})
+            return records, errors
+
+        async def insert(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            await self.repository.insert_many(
+                [
+                    {**record, "booking_period": booking_period(*periods[record["campaign_id"]])}
+                    for record in records
+                ]
+            )
+            return records
+
+        async def on_committed(records: List[Dict[str, Any]]) -> None:
+            for record in records:
+                availability_index.add(
+                    record["billboard_id"], record["campaign_id"], *periods[record["campaign_id"]]
+                )
+            await invalidate_bookings()
+
+        def on_failed(records: List[Dict[str, Any]]) -> None:
+            for record in records:
+                booked.remove(record["billboard_id"], record["campaign_id"])
+
+        return await import_csv(
+            self.repository.session,
+            csv_file,
+            "bookings",
+            BOOKING_CSV_FIELDS,
+            validate,
+            insert,
+            strict,
+            on_committed=on_committed,
+            on_failed=on_failed,
+        )
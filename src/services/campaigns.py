@@ -1,15 +1,39 @@
-from datetime import datetime
 import logging
-from typing import List
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
 from fastapi import HTTPException
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from src.domain.models.billboards import Billboard, BillboardLocationInfo
-from src.domain.models.campaigns import Campaign, CampaignCreate, CampaignUpdate
+from src.cache import invalidate_cache
+from src.domain.models.campaigns import (
+    Campaign,
+    CampaignBatchUpdateItem,
+    CampaignCreate,
+    CampaignUpdate,
+)
 from src.domain.models.common import HATEOASLinkObject, HATEOASLinks
+from src.persistence.availability_index import availability_index
 from src.persistence.models import Campaign as CampaignDB
 from src.persistence.repositories import CampaignBillboardRepository, CampaignRepository
+from src.persistence.transactions import unit_of_work
+from src.services.availability import invalidate_bookings
+from src.services.batch import (
+    batch_report,
+    batch_results,
+    check_batch,
+    mark_applied,
+    new_records,
+    pending,
+    reject,
+)
+from src.services.billboards import BILLBOARDS_HREF, LOCATIONS_HREF, billboard_row
+from src.utils.cursor import decode_cursor, encode_cursor
+from src.utils.serialization import format_datetime, json_float, link, links
+
+CAMPAIGNS_HREF = "/api/v1/campaigns/"
+AVAILABILITY_HREF = "/api/v1/availability/"
 
 
 class CampaignService:
@@ -19,7 +43,6 @@ class CampaignService:
 
     async def create_campaign(self, campaign: CampaignCreate) -> Campaign:
         try:
-            from datetime import datetime
             start_date = campaign.start_date
             end_date = campaign.end_date
             if isinstance(start_date, str):
@@ -30,13 +53,24 @@ class CampaignService:
                 raise HTTPException(status_code=400, detail="start_date must be before end_date")
             db_campaign = CampaignDB(**campaign.dict())
             created = await self.repository.create(db_campaign)
+            await invalidate_cache("campaigns")
             links = HATEOASLinks(
-                self=HATEOASLinkObject(name="self", method="GET", href=f"/api/v1/campaigns/{created.id}"),
+                self=HATEOASLinkObject(
+                    name="self", method="GET", href=f"/api/v1/campaigns/{created.id}"
+                ),
                 actions=[
-                    HATEOASLinkObject(name="search_billboards", method="GET", href=f"/api/v1/availability/{created.id}"),
-                    HATEOASLinkObject(name="update", method="PATCH", href=f"/api/v1/campaigns/{created.id}"),
-                    HATEOASLinkObject(name="delete", method="DELETE", href=f"/api/v1/campaigns/{created.id}")
-                ]
+                    HATEOASLinkObject(
+                        name="search_billboards",
+                        method="GET",
+                        href=f"/api/v1/availability/{created.id}",
+                    ),
+                    HATEOASLinkObject(
+                        name="update", method="PATCH", href=f"/api/v1/campaigns/{created.id}"
+                    ),
+                    HATEOASLinkObject(
+                        name="delete", method="DELETE", href=f"/api/v1/campaigns/{created.id}"
+                    ),
+                ],
             )
             return Campaign(**created.dict(), links=links)
         except HTTPException:
@@ -45,131 +79,185 @@ class CampaignService:
             logging.exception(f"Error creating campaign: {exc}")
             raise HTTPException(status_code=500, detail="Failed to create campaign")
 
-    async def get_campaign(self, id: str) -> Campaign:
+    async def get_campaign(self, id: str) -> Dict[str, Any]:
         try:
-            campaign = await self.repository.get(id)
-            if not campaign:
+            rows = await self.repository.get_detail_rows(id)
+            if not rows:
                 raise HTTPException(status_code=404, detail="Campaign not found")
-            billboards = await self.campaign_billboard_repository.get_billboards_for_campaign(id)
-            billboard_objs = [
-                Billboard(
-                    **b.dict(),
-                    location=BillboardLocationInfo(
-                        address=b.location.address,
-                        city=b.location.city,
-                        state=b.location.state,
-                        country_code=b.location.country_code,
-                        lat=b.location.lat,
-                        lng=b.location.lng
-                    ) if b.location else None,
-                    links = HATEOASLinks(
-                        self=HATEOASLinkObject(name="self", method="GET", href=f"/api/v1/billboards/{b.id}"),
-                        actions=[
-                            HATEOASLinkObject(name="search_billboards", method="GET", href=f"/api/v1/availability/{b.id}"),
-                            HATEOASLinkObject(name="remove_from_campaign", method="POST", href=f"/api/v1/campaigns/{id}/remove/{b.id}"),
-                        ],
-                        related=[
-                            HATEOASLinkObject(name="location", method="GET", href=f"/api/v1/locations/{b.location.id}")
-                        ]
-                    )
-                ) for b in billboards
-            ]
-            days = (campaign.end_date - campaign.start_date).days + 1
-            total_dollar_amount = sum(b.dollars_per_day * days for b in billboards)
-            links = HATEOASLinks(
-                self=HATEOASLinkObject(name="self", method="GET", href=f"/api/v1/campaigns/{id}"),
-                actions=[
-                    HATEOASLinkObject(name="search_billboards", method="GET", href=f"/api/v1/availability/{id}"),
-                    HATEOASLinkObject(name="update", method="PATCH", href=f"/api/v1/campaigns/{id}"),
-                    HATEOASLinkObject(name="delete", method="DELETE", href=f"/api/v1/campaigns/{id}")
-                ]
-            )
-            return Campaign(
-                **campaign.dict(),
-                total_dollar_amount=total_dollar_amount,
-                links=links,
-                billboards=billboard_objs
-            )
+            billboard_rows = [row[5:] for row in rows if row[5] is not None]
+            return self._to_row(rows[0][:5], billboard_rows, search_links=True)
         except HTTPException:
             raise
         except Exception as exc:
             logging.exception(f"Error getting campaign: {exc}")
             raise HTTPException(status_code=500, detail="Failed to get campaign")
 
-    async def get_campaigns(self, offset: int = 0, limit: int = 100) -> List[Campaign]:
+    async def get_campaigns(self, offset: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
         try:
-            campaigns = await self.repository.get_all(offset, limit)
-            result = []
-            for camp in campaigns:
-                billboards = await self.campaign_billboard_repository.get_billboards_for_campaign(camp.id)
-                billboard_objs = [
-                    Billboard(
-                        **b.dict(),
-                        location=BillboardLocationInfo(
-                            address=b.location.address,
-                            city=b.location.city,
-                            state=b.location.state,
-                            country_code=b.location.country_code,
-                            lat=b.location.lat,
-                            lng=b.location.lng
-                        ) if b.location else None,
-                        links = HATEOASLinks(
-                            self=HATEOASLinkObject(name="self", method="GET", href=f"/api/v1/billboards/{b.id}"),
-                            actions=[
-                                HATEOASLinkObject(name="remove_from_campaign", method="POST", href=f"/api/v1/campaigns/{camp.id}/remove/{b.id}"),
-                            ],
-                            related=[
-                                HATEOASLinkObject(name="location", method="GET", href=f"/api/v1/locations/{b.location.id}")
-                            ]
-                        )
-                    ) for b in billboards
-                ]
-                days = (camp.end_date - camp.start_date).days + 1
-                total_dollar_amount = sum(b.dollars_per_day * days for b in billboards)
-                links = HATEOASLinks(
-                    self=HATEOASLinkObject(name="self", method="GET", href=f"/api/v1/campaigns/{camp.id}"),
-                    actions=[
-                        HATEOASLinkObject(name="search_billboards", method="GET", href=f"/api/v1/availability/{camp.id}"),
-                        HATEOASLinkObject(name="update", method="PATCH", href=f"/api/v1/campaigns/{camp.id}"),
-                        HATEOASLinkObject(name="delete", method="DELETE", href=f"/api/v1/campaigns/{camp.id}")
-                    ]
-                )
-                result.append(Campaign(
-                    **camp.dict(),
-                    total_dollar_amount=total_dollar_amount,
-                    links=links,
-                    billboards=billboard_objs
-                ))
-            return result
+            rows = await self.repository.get_rows(offset, limit)
+            return await self._to_rows(rows)
         except Exception as exc:
             logging.exception(f"Error getting campaigns: {exc}")
             raise HTTPException(status_code=500, detail="Failed to get campaigns")
 
+    async def get_campaigns_page(
+        self, cursor: str, limit: int = 100
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        try:
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        try:
+            rows, last_key = await self.repository.get_row_page(after, limit)
+            next_cursor = encode_cursor(*last_key) if last_key else None
+            return await self._to_rows(rows), next_cursor
+        except Exception as exc:
+            logging.exception(f"Error getting campaigns page: {exc}")
+            raise HTTPException(status_code=500, detail="Failed to get campaigns")
+
+    async def get_campaign_summaries(
+        self, offset: int = 0, limit: int = 100, ids: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        try:
+            rows = await self.repository.get_summary_rows(offset, limit, ids)
+            return [self._to_summary_row(row) for row in rows]
+        except Exception as exc:
+            logging.exception(f"Error getting campaign summaries: {exc}")
+            raise HTTPException(status_code=500, detail="Failed to get campaign summaries")
+
+    async def get_campaign_summaries_page(
+        self, cursor: str, limit: int = 100, ids: Optional[List[str]] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        try:
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        try:
+            rows, last_key = await self.repository.get_summary_row_page(after, limit, ids)
+            next_cursor = encode_cursor(*last_key) if last_key else None
+            return [self._to_summary_row(row) for row in rows], next_cursor
+        except Exception as exc:
+            logging.exception(f"Error getting campaign summaries page: {exc}")
+            raise HTTPException(status_code=500, detail="Failed to get campaign summaries")
+
+    async def estimate_total(self) -> Optional[int]:
+        try:
+            return await self.repository.estimate_count()
+        except Exception as exc:
+            logging.exception(f"Error estimating campaigns count: {exc}")
+            return None
+
+    async def _to_rows(self, rows: List[Tuple]) -> List[Dict[str, Any]]:
+        if not rows:
+            return []
+        billboards_by_campaign = defaultdict(list)
+        for billboard in await self.campaign_billboard_repository.get_billboard_rows_for_campaigns(
+            [row[0] for row in rows]
+        ):
+            billboards_by_campaign[billboard[0]].append(billboard[1:])
+        return [self._to_row(row, billboards_by_campaign[row[0]]) for row in rows]
+
+    def _to_summary_row(self, row: Tuple) -> Dict[str, Any]:
+        id, name, start_date, end_date, created_at, days, billboard_count, total_dollar_amount = row
+        return {
+            "id": id,
+            "name": name,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "created_at": format_datetime(created_at),
+            "days": days,
+            "billboard_count": billboard_count,
+            "total_dollar_amount": json_float(float(total_dollar_amount)),
+            "links": links(link("self", "GET", CAMPAIGNS_HREF + id)),
+        }
+
+    def _to_row(
+        self, row: Tuple, billboard_rows: List[Tuple], search_links: bool = False
+    ) -> Dict[str, Any]:
+        # Same shape and key order as the Campaign model. The detail view also offers a
+        # search_billboards action on each billboard.
+        id, name, start_date, end_date, created_at = row
+        href = CAMPAIGNS_HREF + id
+        billboards = []
+        for billboard in billboard_rows:
+            billboard_id = billboard[0]
+            actions = [link("remove_from_campaign", "POST", href + "/remove/" + billboard_id)]
+            if search_links:
+                actions.insert(
+                    0, link("search_billboards", "GET", AVAILABILITY_HREF + billboard_id)
+                )
+            billboards.append(
+                billboard_row(
+                    billboard,
+                    links(
+                        link("self", "GET", BILLBOARDS_HREF + billboard_id),
+                        actions=actions,
+                        related=[link("location", "GET", LOCATIONS_HREF + billboard[1])],
+                    ),
+                )
+            )
+        days = (end_date - start_date).days + 1
+        total_dollar_amount = sum(billboard[4] * days for billboard in billboard_rows)
+        return {
+            "name": name,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "id": id,
+            "created_at": format_datetime(created_at),
+            "billboards": billboards,
+            "total_dollar_amount": json_float(float(total_dollar_amount)),
+            "links": links(
+                link("self", "GET", href),
+                actions=[
+                    link("search_billboards", "GET", AVAILABILITY_HREF + id),
+                    link("update", "PATCH", href),
+                    link("delete", "DELETE", href),
+                ],
+            ),
+        }
+
     async def update_campaign(self, id: str, campaign_update: CampaignUpdate) -> Campaign:
         try:
-            campaign = await self.repository.get(id)
-            if not campaign:
-                raise HTTPException(status_code=404, detail="Campaign not found")
-            update_data = campaign_update.dict(exclude_unset=True)
-
-            if "start_date" in update_data or "end_date" in update_data:
-                start_date = update_data.get("start_date", campaign.start_date)
-                end_date = update_data.get("end_date", campaign.end_date)
-                if isinstance(start_date, str):
-                    start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
-                if isinstance(end_date, str):
-                    end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
-                if start_date >= end_date:
-                    raise HTTPException(status_code=400, detail="start_date must be before end_date")
-                
-                billboards = await self.campaign_billboard_repository.get_billboards_for_campaign(id)
-                if billboards & (start_date != campaign.start_date or end_date != campaign.end_date): 
-                    raise HTTPException(status_code=409, detail="Cannot change campaign dates when billboards are already assigned")
-            
-            for key, value in update_data.items():
-                setattr(campaign, key, value)
-            await self.repository.update(campaign)
-            links = HATEOASLinks(self=HATEOASLinkObject(name="self", method="GET", href=f"/api/v1/campaigns/{id}"))
+            async with unit_of_work(self.repository.session):
+                # Locked until the update commits, so no booking can slip in between the check for
+                # booked billboards and the new dates.
+                campaign = await self.repository.get_locked(id)
+                if not campaign:
+                    raise HTTPException(status_code=404, detail="Campaign not found")
+                update_data = campaign_update.dict(exclude_unset=True)
+
+                if "start_date" in update_data or "end_date" in update_data:
+                    start_date = update_data.get("start_date", campaign.start_date)
+                    end_date = update_data.get("end_date", campaign.end_date)
+                    if isinstance(start_date, str):
+                        start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+                    if isinstance(end_date, str):
+                        end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
+                    if start_date >= end_date:
+                        raise HTTPException(
+                            status_code=400, detail="start_date must be before end_date"
+                        )
+
+                    billboards = (
+                        await self.campaign_billboard_repository.get_billboards_for_campaign(id)
+                    )
+                    if billboards and (
+                        start_date != campaign.start_date or end_date != campaign.end_date
+                    ):
+                        raise HTTPException(
+                            status_code=409,
+                            detail=(
+                                "Cannot change campaign dates when billboards are already assigned"
+                            ),
+                        )
+
+                for key, value in update_data.items():
+                    setattr(campaign, key, value)
+                await self.repository.update(campaign)
+            await invalidate_cache("campaigns")
+            links = HATEOASLinks(
+                self=HATEOASLinkObject(name="self", method="GET", href=f"/api/v1/campaigns/{id}")
+            )
             return Campaign(**campaign.dict(), links=links)
         except HTTPException:
             raise
@@ -179,12 +267,123 @@ class CampaignService:
 
     async def delete_campaign(self, id: str) -> None:
         try:
-            campaign = await self.repository.get(id)
-            if not campaign:
+            if not await self.repository.delete(id):
                 raise HTTPException(status_code=404, detail="Campaign not found")
-            await self.repository.delete(id)
+            availability_index.remove_campaign(id)
+            await invalidate_bookings("campaigns")
         except HTTPException:
             raise
         except Exception as exc:
             logging.exception(f"Error deleting campaign: {exc}")
             raise HTTPException(status_code=500, detail="Failed to delete campaign")
+
+    async def create_campaigns(self, items: List[CampaignCreate], mode: str) -> Dict[str, Any]:
+        try:
+            results = batch_results([None] * len(items))
+            for result, item in zip(results, items):
+                if item.start_date >= item.end_date:
+                    reject(result, "invalid", "start_date must be before end_date")
+            check_batch(
+                mode, results, "created", "Some campaigns cannot be created, nothing was created"
+            )
+            records = new_records(results, items, "camp")
+            async with unit_of_work(self.repository.session):
+                created = await self.repository.insert_many(records) if records else []
+                mark_applied(results, set(created), "created")
+            if created:
+                await invalidate_cache("campaigns")
+            return batch_report(mode, results, "created")
+        except HTTPException:
+            raise
+        except Exception as exc:
+            logging.exception(f"Error creating campaigns: {exc}")
+            raise HTTPException(status_code=500, detail="Failed to create campaigns")
+
+    async def update_campaigns(
+        self, items: List[CampaignBatchUpdateItem], mode: str
+    ) -> Dict[str, Any]:
+        # Same rules as update_campaign: the campaigns are locked while their bookings are
+        # checked, and the dates of a campaign with billboards stay.
+        try:
+            results = batch_results([item.id for item in items])
+            check_batch(
+                mode, results, "updated", "Some campaigns cannot be updated, nothing was changed"
+            )
+            async with unit_of_work(self.repository.session):
+                todo = [
+                    (result, item)
+                    for result, item in zip(results, items)
+                    if result["status"] is None
+                ]
+                periods = await self.repository.get_periods(
+                    [item.id for _, item in todo], lock=True
+                )
+                moved = []
+                for result, item in todo:
+                    period = periods.get(item.id)
+                    if period is None:
+                        reject(result, "not_found")
+                        continue
+                    start_date, end_date = item.start_date or period[0], item.end_date or period[1]
+                    if start_date >= end_date:
+                        reject(result, "invalid", "start_date must be before end_date")
+                    elif (start_date, end_date) != period:
+                        moved.append(item.id)
+                booked = (
+                    await self.campaign_billboard_repository.get_campaign_ids_with_billboards(moved)
+                    if moved
+                    else set()
+                )
+                rows = []
+                for result, item in todo:
+                    if result["status"] is not None:
+                        continue
+                    if item.id in booked:
+                        reject(
+                            result,
+                            "has_billboards",
+                            "Cannot change campaign dates when billboards are already assigned",
+                        )
+                    else:
+                        rows.append(item.dict(exclude_unset=True, exclude_none=True))
+                check_batch(
+                    mode,
+                    results,
+                    "updated",
+                    "Some campaigns cannot be updated, nothing was changed",
+                )
+                updated = await self.repository.update_from_values(rows) if rows else set()
+                mark_applied(results, updated, "updated")
+            if updated:
+                await invalidate_cache("campaigns")
+            return batch_report(mode, results, "updated")
+        except HTTPException:
+            raise
+        except Exception as exc:
+            logging.exception(f"Error updating campaigns: {exc}")
+            raise HTTPException(status_code=500, detail="Failed to update campaigns")
+
+    async def delete_campaigns(self, ids: List[str], mode: str) -> Dict[str, Any]:
+        try:
+            results = batch_results(ids)
+            async with unit_of_work(self.repository.session):
+                deleted = await self.repository.delete_many(
+                    [result["id"] for result in pending(results)]
+                )
+                mark_applied(results, deleted, "deleted")
+                check_batch(
+                    mode,
+                    results,
+                    "deleted",
+                    "Some campaigns cannot be deleted, nothing was deleted",
+                )
+            if deleted:
+                for id in deleted:
+                    availability_index.remove_campaign(id)
+                await invalidate_bookings("campaigns")
+            return batch_report(mode, results, "deleted")
+        except HTTPException:
+            raise
+        except Exception as exc:
+            logging.exception(f"Error deleting campaigns: {exc}")
+            raise HTTPException(status_code=500, detail="Failed to delete campaigns")
@@ -0,0 +1,121 @@
+import asyncio
+import csv
+import io
+import logging
+import os
+from datetime import datetime
+from typing import AsyncIterator, Sequence
+
+import anyio
+import anyio.lowlevel
+import orjson
+from fastapi import HTTPException
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncResult
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.dependencies import new_session
+from src.persistence.models import Billboard as BillboardDB
+from src.persistence.models import Location as LocationDB
+from src.persistence.repositories import (
+    BillboardRepository,
+    CampaignBillboardRepository,
+    LocationRepository,
+)
+from src.utils.serialization import format_datetime
+
+EXPORT_RESOURCES = ("locations", "billboards", "bookings")
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+class ExportService:
+    def __init__(self, session: AsyncSession):
+        self.location_repository = LocationRepository(LocationDB, session)
+        self.billboard_repository = BillboardRepository(BillboardDB, session)
+        self.campaign_billboard_repository = CampaignBillboardRepository(session)
+
+    async def stream(self, resource: str, batch_size: int) -> AsyncResult:
+        if resource == "locations":
+            return await self.location_repository.stream_rows(batch_size)
+        if resource == "billboards":
+            return await self.billboard_repository.stream_rows(batch_size)
+        return await self.campaign_billboard_repository.stream_bookings(batch_size)
+
+
+def export_fetch_size() -> int:
+    return int(os.getenv("EXPORT_FETCH_SIZE", "1000"))
+
+
+def _encode_ndjson(columns: Sequence[str], rows: Sequence[Row]) -> bytes:
+    return b"".join(
+        orjson.dumps(dict(zip(columns, row)), option=orjson.OPT_UTC_Z) + b"\n" for row in rows
+    )
+
+
+def _encode_csv(columns: Sequence[str], rows: Sequence[Row]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerows(
+        [format_datetime(value) if isinstance(value, datetime) else value for value in row]
+        for row in rows
+    )
+    return buffer.getvalue().encode("utf-8")
+
+
+async def _export_chunks(resource: str, fmt: str, batch_size: int) -> AsyncIterator[bytes]:
+    # Opens its own session: the request's get_db session is closed before a streamed body
+    # is sent. Memory stays at one batch however many rows the table holds.
+    encode = _encode_csv if fmt == "csv" else _encode_ndjson
+    exported = 0
+    session = new_session()
+    try:
+        result = await ExportService(session).stream(resource, batch_size)
+        columns = list(result.keys())
+        yield encode(columns, [columns]) if fmt == "csv" else b""
+        partitions = result.partitions()
+        while True:
+            # Fetches are shielded so a disconnect lands between batches, never halfway through
+            # a round trip, which would leave the connection unusable. Every other await of the
+            # loop may complete without suspending, so this is where a disconnect gets in.
+            await anyio.lowlevel.checkpoint_if_cancelled()
+            with anyio.CancelScope(shield=True):
+                rows = await anext(partitions, None)
+            if rows is None:
+                break
+            exported += len(rows)
+            yield encode(columns, rows)
+    except (asyncio.CancelledError, GeneratorExit):
+        logging.info(f"Export of {resource} stopped by client after {exported} rows")
+        raise
+    except Exception as exc:
+        if exported:
+            logging.exception(f"Export of {resource} failed after {exported} rows: {exc}")
+        raise
+    finally:
+        # Shielded so a cancelled request still rolls back the cursor's transaction and hands the
+        # connection back to the pool.
+        with anyio.CancelScope(shield=True):
+            await session.close()
+    logging.info(f"Exported {exported} {resource} as {fmt}")
+
+
+async def open_export(resource: str, fmt: str) -> AsyncIterator[bytes]:
+    # Runs the query before the response starts, so a failure still becomes a 500 rather
+    # than a truncated 200.
+    chunks = _export_chunks(resource, fmt, export_fetch_size())
+    try:
+        first = await chunks.__anext__()
+    except Exception as exc:
+        await chunks.aclose()
+        logging.exception(f"Error exporting {resource}: {exc}")
+        raise HTTPException(status_code=500, detail=f"Failed to export {resource}")
+
+    async def body() -> AsyncIterator[bytes]:
+        try:
+            yield first
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await chunks.aclose()
+
+    return body()
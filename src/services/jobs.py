@@ -0,0 +1,56 @@
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.domain.models.common import HATEOASLinkObject, HATEOASLinks
+from src.domain.models.jobs import Job
+from src.persistence.models import Job as JobDB
+from src.persistence.repositories import JobRepository
+
+
+class JobService:
+    def __init__(self, session: AsyncSession):
+        self.repository = JobRepository(JobDB, session)
+
+    async def get_job(self, id: str, owner: Optional[str]) -> Job:
+        try:
+            job = await self.repository.get(id)
+            # Someone else's job is reported as missing rather than forbidden.
+            if not job or job.owner != owner:
+                raise HTTPException(status_code=404, detail="Job not found")
+            progress = {
+                key: value for key, value in (job.progress or {}).items() if key != "checkpoint"
+            }
+            if progress.get("bytes_total"):
+                progress["percent"] = round(
+                    100 * progress.get("bytes_processed", 0) / progress["bytes_total"], 1
+                )
+            links = HATEOASLinks(
+                self=HATEOASLinkObject(name="self", method="GET", href=f"/api/v1/jobs/{job.id}"),
+            )
+            return Job(
+                **job.dict(exclude={"progress"}),
+                progress=progress,
+                duration_seconds=_duration(job),
+                links=links,
+            )
+        except HTTPException:
+            raise
+        except Exception as exc:
+            logging.exception(f"Error getting job: {exc}")
+            raise HTTPException(status_code=500, detail="Failed to get job")
+
+
+def _duration(job: JobDB) -> Optional[float]:
+    if job.started_at is None:
+        return None
+    started = _as_utc(job.started_at)
+    finished = _as_utc(job.finished_at) if job.finished_at else datetime.now(timezone.utc)
+    return round((finished - started).total_seconds(), 3)
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
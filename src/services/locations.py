@@ -1,17 +1,47 @@
-import csv
+import asyncio
 import logging
-from typing import List, IO, Dict, Any
+import os
+from datetime import datetime
+from typing import IO, Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from uuid import NAMESPACE_URL, UUID, uuid5
 
+import numpy as np
 from fastapi import HTTPException
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from src.cache import invalidate_cache
+from src.dependencies import new_session
 from src.domain.models.common import HATEOASLinkObject, HATEOASLinks
-from src.domain.models.locations import Location, LocationCreate, LocationUpdate
+from src.domain.models.locations import (
+    Location,
+    LocationBatchUpdateItem,
+    LocationCreate,
+    LocationUpdate,
+)
+from src.jobs import JobContext, JobFailed, JobQueueFull, job_runner, spool_upload
 from src.persistence.models import Billboard as BillboardDB
+from src.persistence.models import Job as JobDB
 from src.persistence.models import Location as LocationDB
 from src.persistence.repositories import BillboardRepository, LocationRepository
+from src.persistence.transactions import unit_of_work
+from src.services.batch import (
+    batch_report,
+    batch_results,
+    check_batch,
+    mark_applied,
+    new_records,
+    pending,
+    reject,
+)
+from src.services.bulk_import import import_csv, parse_floats
+from src.services.nearby import find_nearest
+from src.utils.cursor import decode_cursor, encode_cursor
+from src.utils.serialization import format_datetime, json_float, link, links
 from src.utils.uuid import generate_prefixed_uuid
 
+LOCATION_CSV_FIELDS = ("address", "city", "state", "country_code", "lat", "lng")
+BULK_LOAD_JOB = "locations.bulk_load"
+
 
 class LocationService:
     def __init__(self, session: AsyncSession):
@@ -22,12 +52,19 @@ class LocationService:
         try:
             db_location = LocationDB(**location.dict())
             created = await self.repository.create(db_location)
+            await invalidate_cache("locations")
             links = HATEOASLinks(
-                self=HATEOASLinkObject(name="self", method="GET", href=f"/api/v1/locations/{created.id}"),
+                self=HATEOASLinkObject(
+                    name="self", method="GET", href=f"/api/v1/locations/{created.id}"
+                ),
                 actions=[
-                    HATEOASLinkObject(name="update", method="PATCH", href=f"/api/v1/locations/{created.id}"),
-                    HATEOASLinkObject(name="delete", method="DELETE", href=f"/api/v1/locations/{created.id}")
-                ]
+                    HATEOASLinkObject(
+                        name="update", method="PATCH", href=f"/api/v1/locations/{created.id}"
+                    ),
+                    HATEOASLinkObject(
+                        name="delete", method="DELETE", href=f"/api/v1/locations/{created.id}"
+                    ),
+                ],
             )
             return Location(**created.dict(), links=links)
         except HTTPException:
@@ -38,18 +75,34 @@ class LocationService:
 
     async def get_location(self, id: str) -> Location:
         try:
-            location = await self.repository.get(id)
-            billboards_at_location = await self.billboards_repository.get_all_by_location(id)
-            if not location:
+            found = await self.repository.get_with_billboard_ids(id)
+            if not found:
                 raise HTTPException(status_code=404, detail="Location not found")
+            location, billboard_ids = found
             links = HATEOASLinks(
-                self=HATEOASLinkObject(name="self", method="GET", href=f"/api/v1/locations/{location.id}"),
+                self=HATEOASLinkObject(
+                    name="self", method="GET", href=f"/api/v1/locations/{location.id}"
+                ),
                 actions=[
-                    HATEOASLinkObject(name="update", method="PATCH", href=f"/api/v1/locations/{location.id}"),
-                ] + ([HATEOASLinkObject(name="delete", method="DELETE", href=f"/api/v1/locations/{location.id}")] if len(billboards_at_location) == 0 else []),
-                related=[
-                    HATEOASLinkObject(name="billboard", method="GET", href=f"/api/v1/billboards/{bill.id}") for bill in billboards_at_location
+                    HATEOASLinkObject(
+                        name="update", method="PATCH", href=f"/api/v1/locations/{location.id}"
+                    ),
                 ]
+                + (
+                    [
+                        HATEOASLinkObject(
+                            name="delete", method="DELETE", href=f"/api/v1/locations/{location.id}"
+                        )
+                    ]
+                    if len(billboard_ids) == 0
+                    else []
+                ),
+                related=[
+                    HATEOASLinkObject(
+                        name="billboard", method="GET", href=f"/api/v1/billboards/{billboard_id}"
+                    )
+                    for billboard_id in billboard_ids
+                ],
             )
             return Location(**location.dict(), links=links)
         except HTTPException:
@@ -58,27 +111,82 @@ class LocationService:
             logging.exception(f"Error getting location: {exc}")
             raise HTTPException(status_code=500, detail="Failed to get location")
 
-    async def get_locations(self, offset: int = 0, limit: int = 100) -> List[Location]:
+    async def get_locations(self, offset: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
         try:
-            locations = await self.repository.get_all(offset, limit)
-            return [Location(
-                **loc.dict(),
-                links = HATEOASLinks(self=HATEOASLinkObject(name="self", method="GET", href=f"/api/v1/locations/{loc.id}"))
-            ) for loc in locations]
+            rows = await self.repository.get_rows(offset, limit)
+            return [self._to_row(row) for row in rows]
         except Exception as exc:
             logging.exception(f"Error getting locations: {exc}")
             raise HTTPException(status_code=500, detail="Failed to get locations")
 
+    async def get_locations_page(
+        self, cursor: str, limit: int = 100
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        try:
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        try:
+            rows, last_key = await self.repository.get_row_page(after, limit)
+            next_cursor = encode_cursor(*last_key) if last_key else None
+            return [self._to_row(row) for row in rows], next_cursor
+        except Exception as exc:
+            logging.exception(f"Error getting locations page: {exc}")
+            raise HTTPException(status_code=500, detail="Failed to get locations")
+
+    async def estimate_total(self) -> Optional[int]:
+        try:
+            return await self.repository.estimate_count()
+        except Exception as exc:
+            logging.exception(f"Error estimating locations count: {exc}")
+            return None
+
+    async def get_nearby_locations(
+        self, lat: float, lng: float, radius_km: float, offset: int = 0, limit: int = 100
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        try:
+            page_ids, distances, total = await find_nearest(
+                self.repository, lat, lng, radius_km, offset, limit
+            )
+            rows = {row[0]: row for row in await self.repository.get_rows_by_ids(page_ids)}
+            # Same shape and key order as the NearbyLocation model.
+            return [
+                {**self._to_row(rows[id]), "distance_km": round(distance, 3)}
+                for id, distance in zip(page_ids, distances)
+                if id in rows
+            ], total
+        except Exception as exc:
+            logging.exception(f"Error getting nearby locations: {exc}")
+            raise HTTPException(status_code=500, detail="Failed to get nearby locations")
+
+    def _to_row(self, row: Tuple) -> Dict[str, Any]:
+        # Same shape and key order as the Location model.
+        id, address, city, state, country_code, lat, lng, created_at = row
+        return {
+            "address": address,
+            "city": city,
+            "state": state,
+            "country_code": country_code,
+            "lat": json_float(lat),
+            "lng": json_float(lng),
+            "id": id,
+            "created_at": format_datetime(created_at),
+            "links": links(link("self", "GET", "/api/v1/locations/" + id)),
+        }
+
     async def update_location(self, id: str, location_update: LocationUpdate) -> Location:
         try:
-            location = await self.repository.get(id)
+            update_data = location_update.dict(exclude_unset=True)
+            if update_data:
+                location = await self.repository.update_values(id, update_data)
+            else:
+                location = await self.repository.get(id)
             if not location:
                 raise HTTPException(status_code=404, detail="Location not found")
-            update_data = location_update.dict(exclude_unset=True)
-            for key, value in update_data.items():
-                setattr(location, key, value)
-            await self.repository.update(location)
-            links = HATEOASLinks(self=HATEOASLinkObject(name="self", method="GET", href=f"/api/v1/locations/{id}"))
+            await invalidate_cache("locations")
+            links = HATEOASLinks(
+                self=HATEOASLinkObject(name="self", method="GET", href=f"/api/v1/locations/{id}")
+            )
             return Location(**location.dict(), links=links)
         except HTTPException:
             raise
@@ -88,53 +196,259 @@ class LocationService:
 
     async def delete_location(self, id: str) -> None:
         try:
-            location = await self.repository.get(id)
-            if not location:
-                raise HTTPException(status_code=404, detail="Location not found")
-            billboards = await self.billboards_repository.get_all_by_location(id)
-            if len(billboards) > 0:
-                raise HTTPException(status_code=409, detail="Location has billboards, update billboards first")
-            await self.repository.delete(id)
+            async with unit_of_work(self.repository.session):
+                billboards = await self.billboards_repository.get_all_by_location(id)
+                if len(billboards) > 0:
+                    raise HTTPException(
+                        status_code=409, detail="Location has billboards, update billboards first"
+                    )
+                if not await self.repository.delete(id):
+                    raise HTTPException(status_code=404, detail="Location not found")
+            await invalidate_cache("locations")
         except HTTPException:
             raise
         except Exception as exc:
             logging.exception(f"Error deleting location: {exc}")
             raise HTTPException(status_code=500, detail="Failed to delete location")
 
-    async def bulk_load_locations_from_csv(self, csv_file: IO) -> Dict[str, Any]:
-        reader = csv.DictReader(csv_file)
-        required_fields = {"address", "city", "state", "country_code", "lat", "lng"}
-        locations_to_create = []
-        errors = []
-        ids = []
-        for idx, row in enumerate(reader, start=2):  # start=2 to account for header row
-            if not required_fields.issubset(row.keys()):
-                errors.append(f"Missing required fields in CSV header.")
-                break
-            try:
-                location_data = {
-                    "address": row["address"].strip(),
-                    "city": row["city"].strip(),
-                    "state": row["state"].strip(),
-                    "country_code": row["country_code"].strip(),
-                    "lat": float(row["lat"]),
-                    "lng": float(row["lng"]),
-                }
-                location_create = LocationCreate(**location_data)
-                db_location = LocationDB(**location_create.dict())
-                id = generate_prefixed_uuid("loc")
-                db_location.id = id
-                ids.append(id)
-                locations_to_create.append(db_location)
-            except Exception as exc:
-                errors.append(f"Row {idx}: {exc}")
-        if errors:
-            return {"created": 0, "errors": errors}
+    async def create_locations(self, items: List[LocationCreate], mode: str) -> Dict[str, Any]:
         try:
-            async with self.repository.session.begin():
-                for db_location in locations_to_create:
-                    # id will be generated by the repository/database
-                    self.repository.session.add(db_location)
-            return {"created": len(locations_to_create), "locations": ids, "errors": []}
+            results = batch_results([None] * len(items))
+            records = new_records(results, items, "loc")
+            async with unit_of_work(self.repository.session):
+                created = await self.repository.insert_many(records)
+                mark_applied(results, set(created), "created")
+            await invalidate_cache("locations")
+            return batch_report(mode, results, "created")
+        except HTTPException:
+            raise
         except Exception as exc:
-            return {"created": 0, "errors": [f"Bulk insert failed: {exc}"]}
+            logging.exception(f"Error creating locations: {exc}")
+            raise HTTPException(status_code=500, detail="Failed to create locations")
+
+    async def update_locations(
+        self, items: List[LocationBatchUpdateItem], mode: str
+    ) -> Dict[str, Any]:
+        try:
+            results = batch_results([item.id for item in items])
+            check_batch(
+                mode, results, "updated", "Some locations cannot be updated, nothing was changed"
+            )
+            async with unit_of_work(self.repository.session):
+                rows = [
+                    item.dict(exclude_unset=True, exclude_none=True)
+                    for item, result in zip(items, results)
+                    if result["status"] is None
+                ]
+                updated = await self.repository.update_from_values(rows) if rows else set()
+                mark_applied(results, updated, "updated")
+                check_batch(
+                    mode,
+                    results,
+                    "updated",
+                    "Some locations cannot be updated, nothing was changed",
+                )
+            if updated:
+                await invalidate_cache("locations")
+            return batch_report(mode, results, "updated")
+        except HTTPException:
+            raise
+        except Exception as exc:
+            logging.exception(f"Error updating locations: {exc}")
+            raise HTTPException(status_code=500, detail="Failed to update locations")
+
+    async def delete_locations(self, ids: List[str], mode: str) -> Dict[str, Any]:
+        # Same rule as delete_location: a location with live billboards stays.
+        try:
+            results = batch_results(ids)
+            async with unit_of_work(self.repository.session):
+                ids = [result["id"] for result in pending(results)]
+                existing = await self.repository.get_existing_ids(ids)
+                with_billboards = await self.billboards_repository.get_location_ids_with_billboards(
+                    ids
+                )
+                for result in pending(results):
+                    if result["id"] not in existing:
+                        reject(result, "not_found")
+                    elif result["id"] in with_billboards:
+                        reject(result, "has_billboards")
+                check_batch(
+                    mode,
+                    results,
+                    "deleted",
+                    "Some locations cannot be deleted, nothing was deleted",
+                )
+                deleted = await self.repository.delete_many(
+                    [result["id"] for result in pending(results)]
+                )
+                mark_applied(results, deleted, "deleted")
+                check_batch(
+                    mode,
+                    results,
+                    "deleted",
+                    "Some locations cannot be deleted, nothing was deleted",
+                )
+            if deleted:
+                await invalidate_cache("locations")
+            return batch_report(mode, results, "deleted")
+        except HTTPException:
+            raise
+        except Exception as exc:
+            logging.exception(f"Error deleting locations: {exc}")
+            raise HTTPException(status_code=500, detail="Failed to delete locations")
+
+    async def bulk_load_locations_from_csv(
+        self,
+        csv_file: IO[bytes],
+        strict: bool = False,
+        checkpoint: Optional[Dict[str, Any]] = None,
+        id_namespace: Optional[UUID] = None,
+        on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+    ) -> Dict[str, Any]:
+        # Background jobs resume from the report passed to on_progress after a committed batch
+        # (checkpoint), and pass id_namespace so ids derive from row numbers: a batch that was
+        # committed but not yet checkpointed is skipped by ON CONFLICT instead of loaded twice.
+        resumable = id_namespace is not None
+
+        async def validate(
+            rows: List[List[str]], columns: Dict[str, int], first_row: int
+        ) -> Tuple[List[Dict[str, Any]], List[str]]:
+            return _validate_location_batch(
+                rows, [columns[field] for field in LOCATION_CSV_FIELDS], first_row, id_namespace
+            )
+
+        async def insert(records: List[Dict[str, Any]]) -> List[str]:
+            # A resumable load's ids are its own, so rows an interrupted attempt already inserted
+            # still count as created.
+            created = await self.repository.insert_many(records, resumable)
+            return [record["id"] for record in records] if resumable else created
+
+        async def on_committed(records: List[Dict[str, Any]]) -> None:
+            await invalidate_cache("locations")
+
+        return await import_csv(
+            self.repository.session,
+            csv_file,
+            "locations",
+            LOCATION_CSV_FIELDS,
+            validate,
+            insert,
+            strict,
+            on_committed=on_committed,
+            checkpoint=checkpoint,
+            on_progress=on_progress,
+        )
+
+    async def submit_bulk_load(
+        self, csv_file: IO[bytes], strict: bool, owner: Optional[str]
+    ) -> Dict[str, Any]:
+        # Copies the upload somewhere that outlives the request, and the process, then queues it.
+        try:
+            job_runner.ensure_capacity()
+            path = await asyncio.to_thread(spool_upload, csv_file, ".csv")
+            params = {"path": path, "strict": strict, "bytes": os.path.getsize(path)}
+            job = await job_runner.submit(BULK_LOAD_JOB, params, owner)
+            return {
+                "job_id": job.id,
+                "status": job.status,
+                "links": links(link("self", "GET", f"/api/v1/jobs/{job.id}")),
+            }
+        except JobQueueFull as exc:
+            raise HTTPException(status_code=503, detail=str(exc))
+        except Exception as exc:
+            logging.exception(f"Error submitting locations bulk load: {exc}")
+            raise HTTPException(status_code=500, detail="Failed to submit bulk load")
+
+
+async def run_bulk_load_job(job: JobDB, context: JobContext) -> Dict[str, Any]:
+    path, strict, total = (
+        job.params["path"],
+        job.params.get("strict", False),
+        job.params.get("bytes"),
+    )
+    checkpoint = (job.progress or {}).get("checkpoint")
+    try:
+        with open(path, "rb") as csv_file:
+
+            async def on_progress(report: Dict[str, Any]) -> None:
+                await context.report(
+                    {
+                        "rows": report["rows"],
+                        "created": report["created"],
+                        "error_count": report["error_count"],
+                        "bytes_processed": csv_file.tell(),
+                        "bytes_total": total,
+                        # Strict loads commit only at the end, so they restart from the top.
+                        "checkpoint": None if strict else report,
+                    }
+                )
+
+            async with new_session() as session:
+                report = await LocationService(session).bulk_load_locations_from_csv(
+                    csv_file, strict, checkpoint, uuid5(NAMESPACE_URL, job.id), on_progress
+                )
+    except asyncio.CancelledError:
+        raise  # shutting down: the spooled file stays for the resumed job
+    except Exception:
+        await asyncio.to_thread(_discard, path)
+        raise
+    await asyncio.to_thread(_discard, path)
+    if strict and report["error_count"]:
+        raise JobFailed(f"{report['error_count']} rows failed, nothing was loaded", result=report)
+    return report
+
+
+def _discard(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _validate_location_batch(
+    rows: List[List[str]], positions: List[int], first_row: int, id_namespace: Optional[UUID] = None
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    # Strings are checked per row, coordinates for the whole batch at once.
+    width = max(positions) + 1
+    complete = np.fromiter((len(row) >= width for row in rows), dtype=bool, count=len(rows))
+    padded = [row if ok else [""] * width for row, ok in zip(rows, complete)]
+    address, city, state, country_code, lat, lng = (
+        [row[position] for row in padded] for position in positions
+    )
+    lats, lngs = parse_floats(lat), parse_floats(lng)
+    valid = (
+        complete
+        & np.isfinite(lats)
+        & (np.abs(lats) <= 90)
+        & np.isfinite(lngs)
+        & (np.abs(lngs) <= 180)
+    )
+    records, errors = [], []
+    created_at = datetime.utcnow()
+    for i in range(len(rows)):
+        if not valid[i]:
+            if not complete[i]:
+                errors.append(
+                    f"Row {first_row + i}: expected at least {width} fields, got {len(rows[i])}"
+                )
+            else:
+                errors.append(
+                    f"Row {first_row + i}: invalid coordinates lat={lat[i]!r} lng={lng[i]!r}"
+                )
+            continue
+        records.append(
+            {
+                "id": generate_prefixed_uuid("loc")
+                if id_namespace is None
+                else f"loc_{uuid5(id_namespace, str(first_row + i))}",
+                "address": address[i].strip(),
+                "city": city[i].strip(),
+                "state": state[i].strip(),
+                "country_code": country_code[i].strip(),
+                "lat": float(lats[i]),
+                "lng": float(lngs[i]),
+                "created_at": created_at,
+                "is_deleted": False,
+            }
+        )
+    return records, errors
@@ -0,0 +1,38 @@
+from typing import List, Tuple, Union
+
+import numpy as np
+
+from src.persistence.repositories import BillboardRepository, LocationRepository
+from src.utils.geo import bounding_box, nearby_max_candidates, nearest_within
+
+# Nearby search: the bounding box of the circle is served by the (lat, lng) index. Up to
+# NEARBY_MAX_CANDIDATES points in it are ranked here by exact distance; a box holding more is
+# ranked by the database, which returns only the page, so a wide search in a dense area costs a
+# scan of the box but is answered all the same.
+
+
+async def find_nearest(
+    repository: Union[LocationRepository, BillboardRepository],
+    lat: float,
+    lng: float,
+    radius_km: float,
+    offset: int,
+    limit: int,
+) -> Tuple[List[str], List[float], int]:
+    # Ids of the page of points within radius_km, nearest first and equally near ones by id,
+    # their distances in km and the total number of points in range.
+    box = bounding_box(lat, lng, radius_km)
+    max_candidates = nearby_max_candidates()
+    candidates = await repository.get_coordinates_in_box(*box, max_candidates + 1)
+    if len(candidates) > max_candidates:
+        rows, total = await repository.get_nearest_in_box(lat, lng, radius_km, *box, offset, limit)
+        return [row[0] for row in rows], [row[1] for row in rows], total
+    if not candidates:
+        return [], [], 0
+    lats = np.fromiter((row[1] for row in candidates), dtype=float, count=len(candidates))
+    lngs = np.fromiter((row[2] for row in candidates), dtype=float, count=len(candidates))
+    ids = [row[0] for row in candidates]
+    positions, distances, total = nearest_within(
+        lat, lng, radius_km, lats, lngs, ids, offset, limit
+    )
+    return [ids[position] for position in positions], distances.tolist(), total
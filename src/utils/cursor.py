@@ -0,0 +1,22 @@
+import base64
+import json
+from datetime import datetime, timezone
+from typing import Tuple
+
+
+def encode_cursor(created_at: datetime, id: str) -> str:
+    payload = json.dumps([created_at.isoformat(), id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        created_at = datetime.fromisoformat(created_at)
+        # Only what encode_cursor writes: anything else would fail in the query instead.
+        if created_at.tzinfo is None or not isinstance(id, str) or "\x00" in id:
+            raise ValueError("Not a page key")
+        return created_at.astimezone(timezone.utc), id
+    except Exception as exc:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from exc
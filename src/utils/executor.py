@@ -0,0 +1,74 @@
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, TypeVar
+
+R = TypeVar("R")
+
+
+class ExecutorSaturated(Exception):
+    pass
+
+
+class BoundedExecutor:
+    def __init__(self, name: str, max_workers: int, max_pending: int, timeout: float):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._counters = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "timed_out": 0,
+            "rejected": 0,
+        }
+        self._busy_seconds = 0.0
+
+    async def run(self, fn: Callable[..., R], *args: Any, **kwargs: Any) -> R:
+        with self._lock:
+            # Calls that timed out keep their thread until the backend answers, so they still
+            # count here; otherwise a hung backend would let the queue grow without bound.
+            if self._in_flight >= self.max_pending:
+                self._counters["rejected"] += 1
+                raise ExecutorSaturated(
+                    f"{self.name} executor has {self._in_flight} calls in flight"
+                )
+            self._in_flight += 1
+            self._counters["submitted"] += 1
+        started = time.perf_counter()
+        future = self._executor.submit(functools.partial(fn, *args, **kwargs))
+        future.add_done_callback(lambda f: self._on_done(f, started))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._counters["timed_out"] += 1
+            raise
+
+    def _on_done(self, future, started: float) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._busy_seconds += time.perf_counter() - started
+            failed = future.cancelled() or future.exception() is not None
+            self._counters["failed" if failed else "completed"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "timeout_seconds": self.timeout,
+                "in_flight": self._in_flight,
+                "busy_seconds": round(self._busy_seconds, 6),
+                **self._counters,
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
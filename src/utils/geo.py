@@ -0,0 +1,73 @@
+import math
+import os
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def bounding_box(
+    lat: float, lng: float, radius_km: float
+) -> Tuple[float, float, List[Tuple[float, float]]]:
+    # Returns (min_lat, max_lat, lng_ranges); the longitude span is split in two when it
+    # crosses the antimeridian and widened to the whole circle near the poles.
+    angular = radius_km / EARTH_RADIUS_KM
+    min_lat = lat - math.degrees(angular)
+    max_lat = lat + math.degrees(angular)
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90.0), min(max_lat, 90.0), [(-180.0, 180.0)]
+    delta_lng = math.degrees(math.asin(min(1.0, math.sin(angular) / math.cos(math.radians(lat)))))
+    min_lng, max_lng = lng - delta_lng, lng + delta_lng
+    if min_lng < -180:
+        return min_lat, max_lat, [(min_lng + 360, 180.0), (-180.0, max_lng)]
+    if max_lng > 180:
+        return min_lat, max_lat, [(min_lng, 180.0), (-180.0, max_lng - 360)]
+    return min_lat, max_lat, [(min_lng, max_lng)]
+
+
+def haversine_km(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    lat1, lng1 = math.radians(lat), math.radians(lng)
+    lat2, lng2 = np.radians(lats), np.radians(lngs)
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def nearby_max_candidates() -> int:
+    # Points the bounding box of a nearby search may hold to be ranked in memory; beyond that
+    # the database ranks them.
+    return int(os.getenv("NEARBY_MAX_CANDIDATES", "10000"))
+
+
+def nearest_within(
+    lat: float,
+    lng: float,
+    radius_km: float,
+    lats: np.ndarray,
+    lngs: np.ndarray,
+    ids: Sequence[str],
+    offset: int,
+    limit: int,
+) -> Tuple[np.ndarray, np.ndarray, int]:
+    # Positions (into lats/lngs/ids) of the page of points within radius_km, nearest first and
+    # equally near ones by id, with their distances and the total number of points in range.
+    distances = haversine_km(lat, lng, lats, lngs)
+    in_range = np.flatnonzero(distances <= radius_km)
+    total = int(in_range.size)
+    wanted = min(offset + limit, total)
+    if wanted == 0 or offset >= total:
+        return np.empty(0, dtype=np.intp), np.empty(0), total
+    candidate_distances = distances[in_range]
+    if wanted < total:
+        # Only the first offset + limit need ordering; partition instead of a full sort. Every
+        # point as near as the last of them is kept, so ties at a page boundary are cut by id.
+        cutoff = np.partition(candidate_distances, wanted - 1)[wanted - 1]
+        head = np.flatnonzero(candidate_distances <= cutoff)
+    else:
+        head = np.arange(total)
+    head_ids = np.array([ids[position] for position in in_range[head].tolist()])
+    head = head[np.lexsort((head_ids, candidate_distances[head]))][offset:wanted]
+    return in_range[head], candidate_distances[head], total
@@ -0,0 +1,56 @@
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import orjson
+from fastapi import Response
+
+
+class _ReprFloat(float):
+    # A float orjson would spell differently from the stdlib (1e-05, 1e+16, NaN); orjson refuses
+    # float subclasses, so a body holding one falls back to the encoder FastAPI itself uses.
+    pass
+
+
+def format_datetime(value: Optional[datetime]) -> Optional[str]:
+    # Same text pydantic emits for a datetime field.
+    if value is None:
+        return None
+    text = value.isoformat()
+    return text[:-6] + "Z" if text.endswith("+00:00") else text
+
+
+def json_float(value: Optional[float]) -> Optional[float]:
+    if value is None or value == 0 or 1e-4 <= abs(value) < 1e16:
+        return value
+    return _ReprFloat(value)
+
+
+def link(name: str, method: str, href: str) -> Dict[str, str]:
+    return {"name": name, "method": method, "href": href}
+
+
+def links(
+    self_link: Optional[Dict[str, str]] = None,
+    actions: Optional[List[Dict[str, str]]] = None,
+    related: Optional[List[Dict[str, str]]] = None,
+) -> Dict[str, Any]:
+    # Mirrors HATEOASLinks, which always serializes all three keys.
+    return {"self": self_link, "actions": actions, "related": related}
+
+
+def render_json(content: Any) -> bytes:
+    try:
+        return orjson.dumps(content)
+    except orjson.JSONEncodeError:
+        return json.dumps(
+            content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+        ).encode("utf-8")
+
+
+def json_response(content: Any, status_code: int = 200) -> Response:
+    # For content already made of plain dicts, lists, str and json_float() values built from
+    # trusted rows: skips response_model validation and jsonable_encoder, same bytes as FastAPI's.
+    return Response(
+        content=render_json(content), status_code=status_code, media_type="application/json"
+    )
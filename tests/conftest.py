@@ -0,0 +1,140 @@
+import asyncio
+import os
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Callable, ContextManager, Dict, Iterator, List
+
+import pytest
+
+# Endpoint tests run against a real Postgres: TEST_DATABASE_URL (postgresql+asyncpg://...), whose
+# tables are dropped and recreated. Without it they are skipped (engines connect lazily, so the
+# placeholder is never used). Read replica tests also need TEST_REPLICA_DATABASE_URL, another
+# database that stands in for a replica, and TEST_REDIS_URL for shared stickiness. Background
+# work and shared storage are off unless a test turns them on.
+os.environ["SUPABASE_DB_URL"] = (
+    os.getenv("TEST_DATABASE_URL") or "postgresql+asyncpg://localhost/unused"
+)
+os.environ.setdefault("SUPABASE_URL", "http://supabase.test")
+os.environ.setdefault("SUPABASE_KEY", "test")
+os.environ["AVAILABILITY_INDEX_ENABLED"] = "false"
+os.environ["JOBS_ENABLED"] = "false"
+os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+os.environ["RATE_LIMIT_STORAGE_URI"] = "memory://"
+os.environ["RATE_LIMIT_DEFAULT"] = "1000000/minute"
+os.environ["DB_POOL_PROFILE"] = "direct"
+os.environ.pop("READ_REPLICA_URLS", None)
+os.environ.pop("RESPONSE_CACHE_REDIS_URL", None)
+os.environ.pop("READ_REPLICA_STICKY_REDIS_URL", None)
+os.environ.pop("REDIS_URL", None)
+
+import httpx  # noqa: E402
+from fastapi import Request  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+
+from src.dependencies import get_db_engine, get_replica_router  # noqa: E402
+from src.main import app  # noqa: E402
+from src.persistence import models  # noqa: E402, F401
+from src.query_budget import RequestQueries, override_budget  # noqa: E402
+from src.security import get_current_user  # noqa: E402
+
+TEST_USER = {"sub": "user-test", "email": "test@example.com", "role": "authenticated"}
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+def create_schema(url: str) -> None:
+    async def create() -> None:
+        engine = create_async_engine(url)
+        async with engine.begin() as connection:
+            await connection.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+            await connection.run_sync(SQLModel.metadata.drop_all)
+            await connection.run_sync(SQLModel.metadata.create_all)
+        await engine.dispose()
+
+    asyncio.run(create())
+
+
+@pytest.fixture(scope="session")
+def database_url() -> str:
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    create_schema(url)
+    return url
+
+
+@pytest.fixture(scope="session")
+def replica_database_url(database_url: str) -> str:
+    url = os.getenv("TEST_REPLICA_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_REPLICA_DATABASE_URL is not set")
+    create_schema(url)
+    return url
+
+
+@pytest.fixture
+async def client(database_url: str) -> AsyncIterator[httpx.AsyncClient]:
+    def current_user(request: Request) -> Dict[str, Any]:
+        request.state.user = TEST_USER
+        return TEST_USER
+
+    app.dependency_overrides[get_current_user] = current_user
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            yield http
+    finally:
+        app.dependency_overrides.clear()
+        async with get_db_engine().begin() as connection:
+            tables = ", ".join(table.name for table in SQLModel.metadata.sorted_tables)
+            await connection.execute(text(f"TRUNCATE {tables} CASCADE"))
+        # Pooled connections belong to this test's event loop.
+        await get_db_engine().dispose()
+        for replica in get_replica_router().replicas:
+            await replica.engine.dispose()
+
+
+@pytest.fixture
+def create(client: httpx.AsyncClient) -> Callable[..., Any]:
+    # await create("locations", address=...) posts a resource, filling in the fields not given,
+    # and returns what the API answered.
+    defaults = {
+        "locations": {
+            "address": "1 Main St",
+            "city": "Springfield",
+            "state": "IL",
+            "country_code": "US",
+            "lat": 39.78,
+            "lng": -89.65,
+        },
+        "billboards": {"width_mt": 10, "height_mt": 5, "dollars_per_day": 100},
+        "campaigns": {"name": "Campaign", "start_date": "2030-01-01", "end_date": "2030-01-31"},
+    }
+
+    async def post(resource: str, **fields: Any) -> Dict[str, Any]:
+        response = await client.post(f"/api/v1/{resource}/", json={**defaults[resource], **fields})
+        assert response.status_code == 201, response.text
+        return response.json()["data"]
+
+    return post
+
+
+@pytest.fixture
+def max_queries() -> Callable[[int], ContextManager[List[RequestQueries]]]:
+    # with max_queries(3): await client.get(...) fails the test if any request inside the block
+    # runs more than 3 statements or repeats one (N+1). The statement over the limit also raises
+    # QueryBudgetExceeded inside the app, so the response is a 500.
+    @contextmanager
+    def limit(count: int) -> Iterator[List[RequestQueries]]:
+        with override_budget(count) as requests:
+            yield requests
+        reports = [
+            report for report in (queries.report() for queries in requests) if report is not None
+        ]
+        assert not reports, f"Query budget of {count} exceeded: {reports}"
+
+    return limit
@@ -0,0 +1,105 @@
+import pytest
+
+from src.persistence import occupancy
+from src.services import analytics
+
+pytestmark = pytest.mark.anyio
+
+
+# Every query runs once on the per-day running totals and once expanding bookings into periods.
+@pytest.fixture(params=["running_totals", "expanded"])
+def occupancy_path(request, monkeypatch):
+    if request.param == "expanded":
+        monkeypatch.setattr(occupancy, "DENSE_CELLS", 0)
+    monkeypatch.setattr(analytics, "_snapshot", None)
+    return request.param
+
+
+async def get_occupancy(client, start, end, group_by="city", period="month"):
+    response = await client.get(
+        "/api/v1/analytics/occupancy",
+        params={"from": start, "to": end, "group_by": group_by, "period": period},
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
+
+
+async def book(client, create, billboard_ids, start, end):
+    campaign = await create("campaigns", start_date=start, end_date=end)
+    response = await client.post(
+        f"/api/v1/campaigns/{campaign['id']}/billboards", json={"billboard_ids": billboard_ids}
+    )
+    assert response.status_code == 200, response.text
+    return campaign["id"]
+
+
+def cells(rows):
+    return {
+        (row.get("city"), row["period"]): (
+            row["billboards"],
+            row["billboard_days"],
+            row["booked_days"],
+            row["occupancy_rate"],
+            row["booked_revenue"],
+        )
+        for row in rows
+    }
+
+
+async def test_occupancy_counts_bookings_clipped_to_the_range(client, create, occupancy_path):
+    springfield = await create("locations")
+    shelbyville = await create("locations", city="Shelbyville")
+    big, small = [
+        (await create("billboards", location_id=springfield["id"], dollars_per_day=price))["id"]
+        for price in (100, 50)
+    ]
+    other = (await create("billboards", location_id=shelbyville["id"], dollars_per_day=20))["id"]
+    # Overlapping in time on different billboards of one city, starting before the range.
+    await book(client, create, [big, small], "2030-01-10", "2030-02-05")
+    # Ending after the range.
+    await book(client, create, [big], "2030-02-10", "2030-02-20")
+    # A deleted campaign's booking stays stored but inactive, and frees the billboard.
+    deleted = await book(client, create, [other], "2030-01-01", "2030-01-31")
+    response = await client.delete(f"/api/v1/campaigns/{deleted}")
+    assert response.status_code == 204, response.text
+    await book(client, create, [other], "2030-01-20", "2030-01-31")
+
+    rows = await get_occupancy(client, "2030-01-15", "2030-02-14")
+
+    assert cells(rows) == {
+        # Jan 15-31: both billboards all 17 days. Feb 1-14: both 5 days, then the big one 5 more.
+        ("Shelbyville", "2030-01"): (1, 17, 12, round(12 / 17, 6), 240.0),
+        ("Shelbyville", "2030-02"): (1, 14, 0, 0.0, 0.0),
+        ("Springfield", "2030-01"): (2, 34, 34, 1.0, 2550.0),
+        ("Springfield", "2030-02"): (2, 28, 15, round(15 / 28, 6), 1250.0),
+    }
+    assert [(row["start_date"], row["end_date"]) for row in rows[:2]] == [
+        ("2030-01-15", "2030-01-31"),
+        ("2030-02-01", "2030-02-14"),
+    ]
+    [total] = await get_occupancy(client, "2030-01-15", "2030-02-14", "all", "total")
+    assert (total["billboards"], total["billboard_days"], total["booked_days"]) == (3, 93, 61)
+    assert total["booked_revenue"] == 240.0 + 2550.0 + 1250.0
+
+
+async def test_occupancy_of_a_range_without_bookings_is_zero(client, create, occupancy_path):
+    location = await create("locations")
+    billboard = await create("billboards", location_id=location["id"])
+    await book(client, create, [billboard["id"]], "2030-01-01", "2030-01-31")
+
+    rows = await get_occupancy(client, "2031-03-01", "2031-04-30", "billboard")
+
+    assert [(row["billboard_id"], row["period"]) for row in rows] == [
+        (billboard["id"], "2031-03"),
+        (billboard["id"], "2031-04"),
+    ]
+    assert [(row["billboard_days"], row["booked_days"]) for row in rows] == [(31, 0), (30, 0)]
+    assert {(row["occupancy_rate"], row["booked_revenue"]) for row in rows} == {(0.0, 0.0)}
+
+
+async def test_occupancy_rejects_a_range_ending_before_it_starts(client, create):
+    await create("locations")
+    response = await client.get(
+        "/api/v1/analytics/occupancy", params={"from": "2030-02-01", "to": "2030-01-31"}
+    )
+    assert response.status_code == 400, response.text
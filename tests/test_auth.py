@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from src import dependencies
+from src.dependencies import get_auth_executor, get_supabase
+from src.domain.models.auth import UserLogin
+from src.main import app
+from src.services.auth import AuthService
+from src.utils.executor import BoundedExecutor
+
+pytestmark = pytest.mark.anyio
+
+
+class SlowSupabase:
+    # Stands in for the synchronous supabase client: every auth call blocks its thread.
+    def __init__(self, delay: float):
+        self.auth = SimpleNamespace(sign_up=self.sign_up)
+        self.delay = delay
+        self.threads = set()
+
+    def sign_up(self, credentials):
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        return SimpleNamespace(error=None)
+
+
+@pytest.fixture
+async def http():
+    get_auth_executor.cache_clear()
+    supabase = SlowSupabase(delay=0.5)
+    app.dependency_overrides[get_supabase] = lambda: lambda: supabase
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            yield client
+    finally:
+        app.dependency_overrides.clear()
+        get_auth_executor().shutdown()
+        get_auth_executor.cache_clear()
+
+
+async def test_slow_auth_backend_does_not_block_the_event_loop(http):
+    sign_ups = [
+        asyncio.create_task(
+            http.post(
+                "/api/v1/auth/sign-up",
+                json={"email": f"user{n}@example.com", "password": "secret123"},
+            )
+        )
+        for n in range(4)
+    ]
+    await asyncio.sleep(0.05)
+
+    started = time.perf_counter()
+    health = await http.get("/health")
+    metrics = await http.get("/metrics")
+    elapsed = time.perf_counter() - started
+
+    assert health.status_code == 200
+    assert elapsed < 0.2, f"event loop blocked for {elapsed:.3f}s"
+    assert 'executor_in_flight{executor="supabase-auth"} 4' in metrics.text
+    assert all(response.status_code == 201 for response in await asyncio.gather(*sign_ups))
+
+    snapshot = get_auth_executor().snapshot()
+    assert (snapshot["in_flight"], snapshot["completed"]) == (0, 4)
+    metrics = await http.get("/metrics")
+    assert 'executor_calls_total{executor="supabase-auth",result="completed"} 4' in metrics.text
+
+
+async def test_each_auth_thread_has_a_client_of_its_own(monkeypatch):
+    created = {}
+
+    def create_client(url, key):
+        client = SlowSupabase(delay=0.1)
+        created[threading.get_ident()] = client
+        return client
+
+    monkeypatch.setattr(dependencies, "create_client", create_client)
+    executor = BoundedExecutor(name="test-auth", max_workers=3, max_pending=10, timeout=5)
+    service = AuthService(executor=executor)
+    try:
+        await asyncio.gather(
+            *(
+                service.sign_up_user(UserLogin(email=f"user{n}@example.com", password="secret123"))
+                for n in range(9)
+            )
+        )
+    finally:
+        executor.shutdown()
+
+    # One client per worker thread, created on it and only ever called from it.
+    assert len(created) == 3
+    assert all(client.threads == {thread} for thread, client in created.items())
@@ -0,0 +1,105 @@
+from datetime import date
+
+import pytest
+
+from src.cache import invalidate_cache
+from src.dependencies import new_session
+from src.persistence.availability_index import AvailabilityIndex, availability_index
+from src.persistence.repositories import CampaignBillboardRepository
+from src.services import availability
+from src.services.availability import availability_index_current, load_availability_index
+
+JANUARY = (date(2030, 1, 1), date(2030, 1, 31))
+FEBRUARY = (date(2030, 2, 1), date(2030, 2, 28))
+
+
+def test_free_between_dates():
+    index = AvailabilityIndex()
+    index.replace([("bill_1", "cam_1", *JANUARY)])
+    assert not index.is_free("bill_1", date(2030, 1, 31), date(2030, 2, 5))
+    assert index.is_free("bill_1", *FEBRUARY)
+    assert index.is_free("bill_2", *JANUARY)
+    assert index.busy_billboards(*JANUARY) == {"bill_1"}
+
+
+def test_reload_keeps_updates_made_while_it_read_the_database():
+    index = AvailabilityIndex()
+    index.replace([("bill_1", "cam_1", *JANUARY), ("bill_2", "cam_2", *JANUARY)])
+
+    since = index.begin_replace()
+    # Read before these writes committed, so it still has cam_2 and not cam_3.
+    read = [("bill_1", "cam_1", *JANUARY), ("bill_2", "cam_2", *JANUARY)]
+    index.add("bill_3", "cam_3", *FEBRUARY)
+    index.remove_campaign("cam_2")
+    index.replace(read, since)
+    index.end_replace()
+
+    assert index.bookings() == {("bill_1", "cam_1", *JANUARY), ("bill_3", "cam_3", *FEBRUARY)}
+
+
+def test_reload_replays_onto_writes_it_already_saw():
+    index = AvailabilityIndex()
+    since = index.begin_replace()
+    index.add("bill_1", "cam_1", *JANUARY)
+    index.remove("bill_1", "cam_1")
+    index.add("bill_1", "cam_1", *FEBRUARY)
+    index.replace([("bill_1", "cam_1", *FEBRUARY)], since)
+    index.end_replace()
+
+    assert index.bookings() == {("bill_1", "cam_1", *FEBRUARY)}
+
+
+def test_updates_are_only_kept_while_a_reload_runs():
+    index = AvailabilityIndex()
+    index.add("bill_1", "cam_1", *JANUARY)
+    since = index.begin_replace()
+    index.replace([], since)
+    index.end_replace()
+    index.add("bill_2", "cam_2", *JANUARY)
+
+    assert index._journal == []
+    assert index.bookings() == {("bill_2", "cam_2", *JANUARY)}
+
+
+@pytest.fixture
+async def loaded_index(client, monkeypatch):
+    monkeypatch.setattr(availability, "_index_generation", None)
+    yield availability_index
+    availability_index.replace([])
+    availability_index.loaded = False
+
+
+@pytest.mark.anyio
+async def test_index_answers_only_while_it_has_every_booking_of_the_generation(
+    client, create, loaded_index
+):
+    location = await create("locations")
+    billboard_id = (await create("billboards", location_id=location["id"]))["id"]
+    mine = await create("campaigns", name="Mine")
+    theirs = await create(
+        "campaigns", name="Theirs", start_date="2030-03-01", end_date="2030-03-31"
+    )
+    await load_availability_index()
+
+    # This worker's own booking is applied to the index, which stays current.
+    response = await client.post(f"/api/v1/campaigns/{mine['id']}/add/{billboard_id}")
+    assert response.status_code == 200, response.text
+    assert await availability_index_current()
+
+    # Another worker's booking reaches the database and the shared generation, not this index.
+    async with new_session() as session:
+        await CampaignBillboardRepository(session).link_billboards_campaign(
+            theirs["id"], [billboard_id], date(2030, 3, 1), date(2030, 3, 31)
+        )
+        await session.commit()
+    await invalidate_cache("bookings")
+    assert not await availability_index_current()
+    response = await client.get(
+        "/api/v1/billboards/available",
+        params={"start_date": "2030-03-01", "end_date": "2030-03-31"},
+    )
+    assert response.json()["data"] == []
+
+    await load_availability_index()
+    assert await availability_index_current()
+    assert availability_index.busy_billboards(date(2030, 3, 1), date(2030, 3, 31)) == {billboard_id}
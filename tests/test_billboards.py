@@ -0,0 +1,53 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+def billboards_csv(rows):
+    lines = ["location_id,address,width_mt,height_mt,dollars_per_day"] + [
+        ",".join(str(value) for value in row) for row in rows
+    ]
+    return ("\n".join(lines) + "\n").encode()
+
+
+async def test_bulk_load_resolves_locations_and_strict_loads_all_or_nothing(
+    client, create, monkeypatch
+):
+    monkeypatch.setenv("BILLBOARDS_BULK_BATCH_SIZE", "2")
+    location = (await create("locations", address="1 Main St"))["id"]
+    for _ in range(2):
+        await create("locations", address="2 Main St")
+    upload = {
+        "file": (
+            "billboards.csv",
+            billboards_csv(
+                [
+                    (location, "", 10, 5, 100),
+                    ("loc_missing", "", 10, 5, 100),
+                    ("", "1 Main St", 12, 6, 150),
+                    ("", "9 Nowhere Rd", 10, 5, 100),
+                    ("", "2 Main St", 10, 5, 100),
+                    (location, "", -1, 5, 100),
+                ]
+            ),
+            "text/csv",
+        )
+    }
+
+    report = (await client.post("/api/v1/billboards/bulk_load?strict=true", files=upload)).json()
+    assert (report["data"]["created"], report["data"]["error_count"]) == (0, 4)
+    assert (await client.get("/api/v1/billboards/")).json()["data"] == []
+
+    report = (await client.post("/api/v1/billboards/bulk_load", files=upload)).json()["data"]
+    assert (report["rows"], report["created"], report["error_count"]) == (6, 2, 4)
+    assert report["errors"] == [
+        "Row 3: location 'loc_missing' not found",
+        "Row 5: no location at address '9 Nowhere Rd'",
+        "Row 6: address '2 Main St' matches 2 locations, use location_id",
+        "Row 7: invalid size or price width_mt='-1' height_mt='5' dollars_per_day='100'",
+    ]
+    stored = (await client.get("/api/v1/billboards/")).json()["data"]
+    assert sorted((item["location_id"], item["width_mt"]) for item in stored) == [
+        (location, 10.0),
+        (location, 12.0),
+    ]
@@ -0,0 +1,279 @@
+import asyncio
+import random
+import time
+from collections import Counter
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+from src.dependencies import get_db_engine, new_session
+from src.persistence.errors import BookingConflict
+from src.persistence.repositories import CampaignBillboardRepository
+
+pytestmark = pytest.mark.anyio
+
+CLIENTS = 200
+
+
+@pytest.mark.slow
+async def test_concurrent_bookings_never_double_book(client, create):
+    # 200 clients at once book 1 to 3 of 20 billboards into 40 campaigns of the same month, so
+    # nearly every request competes with others for its billboards. Each billboard must end up
+    # in exactly one campaign, and what the responses say was booked must be what was stored.
+    location = await create("locations")
+    billboards = [(await create("billboards", location_id=location["id"]))["id"] for _ in range(20)]
+    campaigns = [(await create("campaigns", name=f"Campaign {n}"))["id"] for n in range(40)]
+    rng = random.Random(16)
+
+    async def book(n):
+        campaign_id, wanted = (
+            campaigns[n % len(campaigns)],
+            rng.sample(billboards, rng.randint(1, 3)),
+        )
+        if len(wanted) == 1:
+            response = await client.post(f"/api/v1/campaigns/{campaign_id}/add/{wanted[0]}")
+            return response.status_code, wanted if response.status_code == 200 else []
+        mode = "best_effort" if n % 2 else "all_or_nothing"
+        response = await client.post(
+            f"/api/v1/campaigns/{campaign_id}/billboards",
+            json={"billboard_ids": wanted, "mode": mode},
+        )
+        return response.status_code, response.json()["data"][
+            "booked"
+        ] if response.status_code == 200 else []
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(book(n) for n in range(CLIENTS)))
+    elapsed = time.perf_counter() - started
+    statuses = Counter(status for status, _ in outcomes)
+    rate = CLIENTS / elapsed
+    print(f"{CLIENTS} concurrent bookings in {elapsed:.2f}s ({rate:.0f}/s): {dict(statuses)}")
+
+    assert set(statuses) <= {200, 400, 409}, statuses
+    reported = Counter(billboard_id for _, booked in outcomes for billboard_id in booked)
+    assert all(count == 1 for count in reported.values()), reported
+    async with get_db_engine().connect() as connection:
+        stored = Counter(
+            billboard_id
+            for (billboard_id,) in await connection.execute(
+                text("SELECT billboard_id FROM campaign_billboards WHERE is_active")
+            )
+        )
+    assert stored == reported
+    assert set(stored) == set(billboards)
+
+
+async def active_bookings(campaign_id):
+    async with get_db_engine().connect() as connection:
+        result = await connection.execute(
+            text(
+                "SELECT billboard_id FROM campaign_billboards "
+                "WHERE is_active AND campaign_id = :campaign_id"
+            ),
+            {"campaign_id": campaign_id},
+        )
+        return {billboard_id for (billboard_id,) in result}
+
+
+@pytest.fixture
+async def batch(client, create):
+    # A January campaign already holding one billboard, another billboard held by an overlapping
+    # campaign, and two free ones.
+    location = await create("locations")
+    held, taken, free, also_free = [
+        (await create("billboards", location_id=location["id"]))["id"] for _ in range(4)
+    ]
+    campaign = (await create("campaigns"))["id"]
+    other = (await create("campaigns", start_date="2030-01-20", end_date="2030-02-20"))["id"]
+    for campaign_id, billboard_id in ((campaign, held), (other, taken)):
+        response = await client.post(f"/api/v1/campaigns/{campaign_id}/add/{billboard_id}")
+        assert response.status_code == 200, response.text
+    return campaign, {"held": held, "taken": taken, "free": free, "also_free": also_free}
+
+
+async def test_all_or_nothing_refuses_the_whole_batch_and_writes_nothing(client, batch):
+    campaign, billboards = batch
+    wanted = [billboards["held"], billboards["taken"], billboards["free"], "bill_missing"]
+
+    response = await client.post(
+        f"/api/v1/campaigns/{campaign}/billboards",
+        json={"billboard_ids": wanted, "mode": "all_or_nothing"},
+    )
+
+    assert response.status_code == 409, response.text
+    assert response.json()["detail"]["results"] == [
+        {"billboard_id": billboards["held"], "status": "already_in_campaign"},
+        {"billboard_id": billboards["taken"], "status": "conflict"},
+        {"billboard_id": billboards["free"], "status": "skipped"},
+        {"billboard_id": "bill_missing", "status": "not_found"},
+    ]
+    assert await active_bookings(campaign) == {billboards["held"]}
+
+
+async def test_best_effort_books_what_it_can(client, batch):
+    campaign, billboards = batch
+    wanted = [
+        billboards["held"],
+        billboards["taken"],
+        billboards["free"],
+        "bill_missing",
+        billboards["also_free"],
+        billboards["free"],
+    ]
+
+    response = await client.post(
+        f"/api/v1/campaigns/{campaign}/billboards",
+        json={"billboard_ids": wanted, "mode": "best_effort"},
+    )
+
+    assert response.status_code == 200, response.text
+    data = response.json()["data"]
+    assert data["booked"] == [billboards["free"], billboards["also_free"]]
+    assert data["results"] == [
+        {"billboard_id": billboards["held"], "status": "already_in_campaign"},
+        {"billboard_id": billboards["taken"], "status": "conflict"},
+        {"billboard_id": billboards["free"], "status": "booked"},
+        {"billboard_id": "bill_missing", "status": "not_found"},
+        {"billboard_id": billboards["also_free"], "status": "booked"},
+    ]
+    assert await active_bookings(campaign) == {
+        billboards["held"],
+        billboards["free"],
+        billboards["also_free"],
+    }
+
+
+async def test_all_or_nothing_books_a_batch_that_is_all_free(client, batch):
+    campaign, billboards = batch
+    wanted = [billboards["free"], billboards["also_free"]]
+
+    response = await client.post(
+        f"/api/v1/campaigns/{campaign}/billboards", json={"billboard_ids": wanted}
+    )
+
+    assert response.status_code == 200, response.text
+    assert response.json()["data"]["booked"] == wanted
+    assert await active_bookings(campaign) == {billboards["held"], *wanted}
+
+
+async def link(campaign_id, billboard_ids, start, end, skip_conflicts=False):
+    # Straight to the insert, without the service's locks and checks: only the constraint decides.
+    async with new_session() as session:
+        return await CampaignBillboardRepository(session).link_billboards_campaign(
+            campaign_id,
+            billboard_ids,
+            date.fromisoformat(start),
+            date.fromisoformat(end),
+            skip_conflicts=skip_conflicts,
+        )
+
+
+async def test_exclusion_constraint_refuses_overlapping_bookings(client, create):
+    location = await create("locations")
+    billboard, other = [
+        (await create("billboards", location_id=location["id"]))["id"] for _ in range(2)
+    ]
+    january, overlapping = [(await create("campaigns"))["id"] for _ in range(2)]
+    assert await link(january, [billboard], "2030-01-01", "2030-01-31") == {billboard}
+
+    # Campaign dates are inclusive: sharing only the last day is an overlap.
+    with pytest.raises(BookingConflict):
+        await link(overlapping, [other, billboard], "2030-01-31", "2030-02-28")
+    assert await active_bookings(overlapping) == set()
+    # With skip_conflicts the overlapping billboard is left out and the rest booked.
+    assert await link(
+        overlapping, [other, billboard], "2030-01-31", "2030-02-28", skip_conflicts=True
+    ) == {other}
+
+
+async def test_exclusion_constraint_allows_back_to_back_bookings(client, create):
+    location = await create("locations")
+    billboard = (await create("billboards", location_id=location["id"]))["id"]
+    before, january, after = [(await create("campaigns"))["id"] for _ in range(3)]
+
+    await link(january, [billboard], "2030-01-01", "2030-01-31")
+    # [Dec 1, Jan 1) and [Feb 1, Mar 1) as stored: each end is the next booking's start.
+    await link(before, [billboard], "2029-12-01", "2029-12-31")
+    await link(after, [billboard], "2030-02-01", "2030-02-28")
+
+    async with get_db_engine().connect() as connection:
+        periods = (
+            await connection.execute(
+                text(
+                    "SELECT lower(booking_period), upper(booking_period) FROM campaign_billboards "
+                    "ORDER BY lower(booking_period)"
+                )
+            )
+        ).all()
+    assert [(str(lower), str(upper)) for lower, upper in periods] == [
+        ("2029-12-01", "2030-01-01"),
+        ("2030-01-01", "2030-02-01"),
+        ("2030-02-01", "2030-03-01"),
+    ]
+
+
+async def test_exclusion_constraint_ignores_inactive_bookings(client, create):
+    location = await create("locations")
+    billboard = (await create("billboards", location_id=location["id"]))["id"]
+    deleted, replacement = [(await create("campaigns"))["id"] for _ in range(2)]
+    await link(deleted, [billboard], "2030-01-01", "2030-01-31")
+    response = await client.delete(f"/api/v1/campaigns/{deleted}")
+    assert response.status_code == 204, response.text
+
+    assert await link(replacement, [billboard], "2030-01-01", "2030-01-31") == {billboard}
+
+
+def bookings_csv(rows):
+    return (
+        "\n".join(["campaign_id,billboard_id"] + [",".join(row) for row in rows]) + "\n"
+    ).encode()
+
+
+async def test_bookings_bulk_load_checks_references_and_overlaps(client, create, monkeypatch):
+    # Batches of 2, so the file's own bookings are checked across batches too.
+    monkeypatch.setenv("BOOKINGS_BULK_BATCH_SIZE", "2")
+    location = await create("locations")
+    free, later, held = [
+        (await create("billboards", location_id=location["id"]))["id"] for _ in range(3)
+    ]
+    january = (await create("campaigns"))["id"]
+    overlapping = (await create("campaigns", start_date="2030-01-20", end_date="2030-02-20"))["id"]
+    response = await client.post(f"/api/v1/campaigns/{january}/add/{held}")
+    assert response.status_code == 200, response.text
+    upload = {
+        "file": (
+            "bookings.csv",
+            bookings_csv(
+                [
+                    (january, free),
+                    ("cam_missing", free),
+                    (january, "bill_missing"),
+                    (overlapping, free),
+                    (january, free),
+                    (overlapping, held),
+                    (overlapping, later),
+                ]
+            ),
+            "text/csv",
+        )
+    }
+
+    response = await client.post("/api/v1/campaigns/bookings/bulk_load?strict=true", files=upload)
+    report = response.json()["data"]
+    assert (report["created"], report["bookings"], report["error_count"]) == (0, [], 5)
+    assert await active_bookings(january) == {held}
+    assert await active_bookings(overlapping) == set()
+
+    response = await client.post("/api/v1/campaigns/bookings/bulk_load", files=upload)
+    report = response.json()["data"]
+    assert (report["rows"], report["created"], report["error_count"]) == (7, 2, 5)
+    assert report["errors"] == [
+        "Row 3: campaign 'cam_missing' not found",
+        "Row 4: billboard 'bill_missing' not found",
+        f"Row 5: billboard {free!r} is already booked between 2030-01-20 and 2030-02-20",
+        f"Row 6: billboard {free!r} is already in campaign {january!r}",
+        f"Row 7: billboard {held!r} is already booked between 2030-01-20 and 2030-02-20",
+    ]
+    assert await active_bookings(january) == {held, free}
+    assert await active_bookings(overlapping) == {later}
@@ -0,0 +1,26 @@
+import pytest
+
+from src.cache import cache_redis_url, check_cache_setup, response_cache
+
+
+def test_several_workers_share_redis_url(monkeypatch):
+    monkeypatch.delenv("RESPONSE_CACHE_REDIS_URL", raising=False)
+    monkeypatch.setenv("REDIS_URL", "redis://redis:6379")
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+    assert cache_redis_url() is None
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    assert cache_redis_url() == "redis://redis:6379"
+    monkeypatch.setenv("RESPONSE_CACHE_REDIS_URL", "redis://cache:6379")
+    assert cache_redis_url() == "redis://cache:6379"
+
+
+def test_several_workers_without_redis_refuse_to_start(monkeypatch):
+    monkeypatch.setattr(response_cache, "redis", None)
+    monkeypatch.setenv("RESPONSE_CACHE_ENABLED", "true")
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+    check_cache_setup()
+    monkeypatch.setenv("WEB_CONCURRENCY", "2")
+    with pytest.raises(RuntimeError, match="needs Redis"):
+        check_cache_setup()
+    monkeypatch.setenv("RESPONSE_CACHE_ENABLED", "false")
+    check_cache_setup()
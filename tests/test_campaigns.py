@@ -0,0 +1,93 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_campaign_list_statement_count_does_not_grow_with_the_page(
+    client, create, max_queries
+):
+    # One statement for the page of campaigns, one for their billboards joined with locations.
+    locations = [await create("locations", address=f"{n} Main St") for n in range(3)]
+    billboards = [await create("billboards", location_id=locations[n % 3]["id"]) for n in range(6)]
+    for n in range(10):
+        year = 2030 + n
+        campaign = await create(
+            "campaigns", name=f"Campaign {n}", start_date=f"{year}-01-01", end_date=f"{year}-01-31"
+        )
+        booked = [billboard["id"] for billboard in billboards[: n % 4 + 1]]
+        response = await client.post(
+            f"/api/v1/campaigns/{campaign['id']}/billboards", json={"billboard_ids": booked}
+        )
+        assert response.status_code == 200, response.text
+
+    with max_queries(2) as requests:
+        response = await client.get("/api/v1/campaigns/")
+    assert response.status_code == 200
+    assert requests[0].statements == 2
+    campaigns = response.json()["data"]
+    assert len(campaigns) == 10
+    assert all(billboard["location"]["address"] for c in campaigns for billboard in c["billboards"])
+
+    with max_queries(2) as requests:
+        response = await client.get("/api/v1/campaigns/?limit=2")
+    assert len(response.json()["data"]) == 2
+    assert requests[0].statements == 2
+
+
+async def test_created_campaign_reads_back_the_same(client, create):
+    campaign = await create("campaigns")
+    response = await client.get(f"/api/v1/campaigns/{campaign['id']}")
+    assert response.status_code == 200
+    fetched = response.json()["data"]
+    assert fetched["created_at"].endswith("Z")
+    assert {key: value for key, value in campaign.items() if key != "links"} == {
+        key: value for key, value in fetched.items() if key in campaign and key != "links"
+    }
+
+
+async def test_summary_sums_in_the_database_what_the_detail_lists(client, create, max_queries):
+    location = await create("locations")
+    prices = [100, 49.99, 0.01]
+    billboards = [
+        (await create("billboards", location_id=location["id"], dollars_per_day=price))["id"]
+        for price in prices
+    ]
+    # 31 and 2 days, dates inclusive.
+    january = await create("campaigns", name="January")
+    two_days = await create(
+        "campaigns", name="Two days", start_date="2031-05-05", end_date="2031-05-06"
+    )
+    empty = await create("campaigns", name="Empty")
+    for campaign, booked in ((january, billboards), (two_days, billboards[:2])):
+        response = await client.post(
+            f"/api/v1/campaigns/{campaign['id']}/billboards", json={"billboard_ids": booked}
+        )
+        assert response.status_code == 200, response.text
+
+    with max_queries(1):
+        response = await client.get("/api/v1/campaigns/summary")
+    assert response.status_code == 200, response.text
+    summaries = {summary["id"]: summary for summary in response.json()["data"]}
+
+    expected = {
+        january["id"]: (31, 3, 31 * sum(prices)),
+        two_days["id"]: (2, 2, 2 * (100 + 49.99)),
+        empty["id"]: (31, 0, 0.0),
+    }
+    for id, (days, count, total) in expected.items():
+        summary = summaries[id]
+        assert (summary["days"], summary["billboard_count"]) == (days, count)
+        assert summary["total_dollar_amount"] == pytest.approx(total)
+        detail = (await client.get(f"/api/v1/campaigns/{id}")).json()["data"]
+        assert summary["total_dollar_amount"] == pytest.approx(detail["total_dollar_amount"])
+        assert len(detail["billboards"]) == count
+
+    response = await client.get(
+        "/api/v1/campaigns/summary", params={"ids": [empty["id"], "cam_missing"]}
+    )
+    [summary] = response.json()["data"]
+    assert (summary["id"], summary["billboard_count"], summary["total_dollar_amount"]) == (
+        empty["id"],
+        0,
+        0.0,
+    )
@@ -0,0 +1,143 @@
+import tracemalloc
+from datetime import datetime, timezone
+
+import anyio
+import asyncpg
+import orjson
+import pytest
+
+from src.dependencies import get_db_engine
+from src.main import app
+
+pytestmark = pytest.mark.anyio
+
+
+async def seed_locations(database_url: str, count: int) -> None:
+    created_at = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    connection = await asyncpg.connect(database_url.replace("postgresql+asyncpg", "postgresql"))
+    try:
+        await connection.copy_records_to_table(
+            "locations",
+            records=(
+                (
+                    f"loc_{n:07d}",
+                    f"{n} Main St",
+                    "Springfield",
+                    "IL",
+                    "US",
+                    39.78,
+                    -89.65,
+                    created_at,
+                    False,
+                )
+                for n in range(count)
+            ),
+            columns=[
+                "id",
+                "address",
+                "city",
+                "state",
+                "country_code",
+                "lat",
+                "lng",
+                "created_at",
+                "is_deleted",
+            ],
+        )
+    finally:
+        await connection.close()
+
+
+async def export(path: str, on_chunk=None) -> dict:
+    # Drives the app over ASGI directly: httpx's ASGI transport would hold the whole body in
+    # memory. on_chunk(response) may return True to have the client disconnect.
+    disconnected = anyio.Event()
+    response = {"status": None, "bytes": 0, "lines": 0, "first": b""}
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            if not response["first"]:
+                response["first"] = body
+            response["bytes"] += len(body)
+            response["lines"] += body.count(b"\n")
+            if on_chunk and body and on_chunk(response):
+                disconnected.set()
+
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": [(b"host", b"test")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("test", 80),
+    }
+    with anyio.fail_after(600):
+        await app(scope, receive, send)
+    return response
+
+
+async def test_export_formats(client, database_url):
+    await seed_locations(database_url, 3)
+
+    response = await client.get("/api/v1/export/locations")
+    assert response.status_code == 200
+    rows = [orjson.loads(line) for line in response.content.splitlines()]
+    assert [row["id"] for row in sorted(rows, key=lambda row: row["id"])] == [
+        "loc_0000000",
+        "loc_0000001",
+        "loc_0000002",
+    ]
+
+    response = await client.get("/api/v1/export/locations?format=csv")
+    assert response.text.splitlines()[0].startswith("id,address,")
+    assert len(response.text.splitlines()) == 4
+
+
+async def test_disconnect_releases_the_connection(client, database_url, monkeypatch):
+    monkeypatch.setenv("EXPORT_FETCH_SIZE", "10")
+    await seed_locations(database_url, 10_000)
+
+    response = await export(
+        "/api/v1/export/locations", on_chunk=lambda response: response["lines"] >= 50
+    )
+
+    assert response["status"] == 200
+    assert 50 <= response["lines"] < 10_000
+    assert get_db_engine().pool.checkedout() == 0
+
+
+@pytest.mark.slow
+async def test_export_of_a_million_rows_stays_within_memory(client, database_url):
+    await seed_locations(database_url, 1_000_000)
+
+    tracemalloc.start()
+    try:
+        response = await export("/api/v1/export/locations")
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    assert response["status"] == 200
+    assert response["lines"] == 1_000_000
+    assert response["bytes"] > 100 * 2**20
+    assert peak < 32 * 2**20, f"peak of {peak / 2**20:.0f} MiB"
+    assert get_db_engine().pool.checkedout() == 0
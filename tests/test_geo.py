@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from src.utils.geo import haversine_km, nearest_within
+
+
+def test_haversine_matches_a_known_distance():
+    # Paris to London.
+    distance = haversine_km(48.8566, 2.3522, np.array([51.5074]), np.array([-0.1278]))[0]
+    assert distance == pytest.approx(343.5, abs=0.5)
+
+
+def test_pages_of_equally_near_points_neither_overlap_nor_skip():
+    # Many billboards share a location, so ties at a page boundary are the common case.
+    rng = np.random.default_rng(7)
+    spots = rng.uniform(-0.05, 0.05, size=(5, 2))
+    lats = np.repeat(spots[:, 0], 40)
+    lngs = np.repeat(spots[:, 1], 40)
+    ids = [f"bill_{n:03d}" for n in rng.permutation(lats.size)]
+
+    pages = []
+    for offset in range(0, lats.size, 7):
+        positions, distances, total = nearest_within(0, 0, 50, lats, lngs, ids, offset, 7)
+        assert total == lats.size
+        pages.extend(
+            (float(distance), ids[position]) for position, distance in zip(positions, distances)
+        )
+
+    assert pages == sorted(pages)
+    assert len({id for _, id in pages}) == lats.size
+
+
+def test_points_out_of_range_are_left_out():
+    lats = np.array([0.0, 0.0, 10.0])
+    lngs = np.array([0.0, 0.01, 0.0])
+    positions, distances, total = nearest_within(0, 0, 5, lats, lngs, ["b", "a", "c"], 0, 10)
+    assert total == 2
+    assert positions.tolist() == [0, 1]
+    assert distances[0] == 0
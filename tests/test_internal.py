@@ -0,0 +1,135 @@
+import httpx
+import pytest
+from fastapi import Request
+
+from src.main import app
+from src.persistence import pool
+from src.security import get_current_user
+
+pytestmark = pytest.mark.anyio
+
+INTERNAL_ROUTES = [
+    ("GET", "/api/v1/internal/availability"),
+    ("POST", "/api/v1/internal/availability/rebuild"),
+    ("GET", "/api/v1/internal/cache"),
+    ("GET", "/api/v1/internal/executors"),
+    ("GET", "/api/v1/internal/jobs"),
+    ("GET", "/api/v1/internal/pool"),
+    ("GET", "/api/v1/internal/replicas"),
+]
+
+
+@pytest.fixture
+async def as_user():
+    # as_user(claims) is a client whose requests carry those verified claims.
+    clients = []
+
+    def client_for(claims):
+        def current_user(request: Request):
+            request.state.user = claims
+            return claims
+
+        app.dependency_overrides[get_current_user] = current_user
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+        clients.append(client)
+        return client
+
+    try:
+        yield client_for
+    finally:
+        app.dependency_overrides.clear()
+        for client in clients:
+            await client.aclose()
+
+
+@pytest.mark.parametrize("method,path", INTERNAL_ROUTES)
+async def test_internal_routes_refuse_ordinary_users(as_user, method, path):
+    client = as_user({"sub": "user-1", "role": "authenticated", "user_metadata": {"role": "admin"}})
+    response = await client.request(method, path)
+    assert response.status_code == 403, response.text
+
+
+@pytest.mark.parametrize(
+    "claims",
+    [
+        {"sub": "service", "role": "service_role"},
+        {"sub": "user-1", "role": "authenticated", "app_metadata": {"role": "admin"}},
+    ],
+)
+async def test_internal_routes_answer_operators(as_user, claims):
+    response = await as_user(claims).get("/api/v1/internal/cache")
+    assert response.status_code == 200, response.text
+
+
+async def test_internal_roles_are_configurable(as_user, monkeypatch):
+    monkeypatch.setenv("INTERNAL_ROLES", "ops")
+    client = as_user({"sub": "user-1", "role": "service_role", "app_metadata": {"role": "ops"}})
+    assert (await client.get("/api/v1/internal/cache")).status_code == 200
+    client = as_user({"sub": "service", "role": "service_role"})
+    assert (await client.get("/api/v1/internal/cache")).status_code == 403
+
+
+async def test_internal_routes_still_need_a_token():
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        assert (await client.get("/api/v1/internal/cache")).status_code == 401
+
+
+@pytest.mark.parametrize(
+    "profile,expected",
+    [
+        (
+            "pgbouncer-transaction",
+            {"pool_size": 5, "max_overflow": 10, "pool_timeout": 30.0, "pool_recycle": 1800},
+        ),
+        (
+            "direct",
+            {"pool_size": 10, "max_overflow": 10, "pool_timeout": 30.0, "pool_recycle": 3600},
+        ),
+        ("batch", {"pool_size": 2, "max_overflow": 2, "pool_timeout": 300.0, "pool_recycle": -1}),
+    ],
+)
+def test_pool_profiles_give_their_engine_options(monkeypatch, profile, expected):
+    monkeypatch.setenv("DB_POOL_PROFILE", profile)
+    options = pool.engine_options(pool.pool_settings())
+
+    assert options["poolclass"] is pool.InstrumentedAsyncPool
+    assert {key: options[key] for key in expected} == expected
+    assert options["pool_pre_ping"] is True
+    connect_args = options["connect_args"]
+    cache_size = pool.POOL_PROFILES[profile]["statement_cache_size"]
+    assert connect_args["statement_cache_size"] == cache_size
+    assert connect_args["prepared_statement_cache_size"] == cache_size
+    assert connect_args["server_settings"]["statement_timeout"] == (
+        "600s" if profile == "batch" else "60s"
+    )
+    # Behind PgBouncer nothing stays prepared, and names never repeat across clients.
+    name_func = connect_args.get("prepared_statement_name_func")
+    if profile == "pgbouncer-transaction":
+        assert cache_size == 0
+        assert name_func() != name_func()
+    else:
+        assert cache_size > 0 and name_func is None
+
+
+def test_pool_variables_override_single_profile_values(monkeypatch):
+    monkeypatch.setenv("DB_POOL_PROFILE", "batch")
+    monkeypatch.setenv("DB_POOL_SIZE", "7")
+    monkeypatch.setenv("DB_POOL_PRE_PING", "false")
+    monkeypatch.setenv("DB_STATEMENT_TIMEOUT", "5min")
+
+    options = pool.engine_options(pool.pool_settings())
+
+    assert (options["pool_size"], options["max_overflow"], options["pool_pre_ping"]) == (
+        7,
+        2,
+        False,
+    )
+    assert options["connect_args"]["server_settings"]["statement_timeout"] == "5min"
+
+
+def test_unknown_pool_profile_is_refused(monkeypatch):
+    monkeypatch.setenv("DB_POOL_PROFILE", "pgbouncer-session")
+    with pytest.raises(ValueError, match="Unknown DB_POOL_PROFILE"):
+        pool.pool_settings()
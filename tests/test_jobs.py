@@ -0,0 +1,16 @@
+import pytest
+
+from src.jobs import job_runner
+from src.main import app
+from src.services.locations import BULK_LOAD_JOB, run_bulk_load_job
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_handlers_are_registered_at_startup(client, monkeypatch):
+    # Importing the services registers nothing; the app does when it starts its workers.
+    monkeypatch.setitem(job_runner.handlers, BULK_LOAD_JOB, None)
+    monkeypatch.setenv("JOBS_ENABLED", "true")
+    async with app.router.lifespan_context(app):
+        assert job_runner.handlers[BULK_LOAD_JOB] is run_bulk_load_job
+        assert job_runner.snapshot()["running"]
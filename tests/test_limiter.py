@@ -0,0 +1,77 @@
+import time
+
+import httpx
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import Depends, FastAPI, Request
+from slowapi import Limiter, _rate_limit_exceeded_handler
+from slowapi.errors import RateLimitExceeded
+
+from src.limiter import get_rate_limit_key
+from src.security import JWTVerifier, get_current_user, get_jwt_verifier
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def signer():
+    # Signs tokens for a given sub with a key the app's verifier trusts.
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+    verifier = JWTVerifier(jwks={"keys": [{**jwk, "kid": "test-key", "alg": "RS256"}]})
+
+    def sign(sub: str) -> str:
+        claims = {"sub": sub, "aud": "authenticated", "exp": int(time.time() + 3600)}
+        return jwt.encode(claims, private_key, algorithm="RS256", headers={"kid": "test-key"})
+
+    sign.verifier = verifier
+    return sign
+
+
+@pytest.fixture
+def app(signer):
+    # The real key function and auth dependency behind a limit of 2, with counters of its own.
+    limiter = Limiter(key_func=get_rate_limit_key, storage_uri="memory://")
+    app = FastAPI()
+    app.state.limiter = limiter
+    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+    app.dependency_overrides[get_jwt_verifier] = lambda: signer.verifier
+
+    @app.get("/private")
+    @limiter.limit("2/minute")
+    async def private(request: Request, user=Depends(get_current_user)):
+        return {"sub": user["sub"]}
+
+    @app.get("/public")
+    @limiter.limit("2/minute")
+    async def public(request: Request):
+        return {}
+
+    return app
+
+
+async def statuses(app, path, count, token=None, ip="10.0.0.1"):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    transport = httpx.ASGITransport(app=app, client=(ip, 1234))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        return [(await http.get(path, headers=headers)).status_code for _ in range(count)]
+
+
+async def test_users_behind_one_address_have_separate_limits(app, signer):
+    alice, bob = signer("alice"), signer("bob")
+
+    assert await statuses(app, "/private", 3, alice) == [200, 200, 429]
+    assert await statuses(app, "/private", 3, bob) == [200, 200, 429]
+    # Alice stays limited from another address; the shared address kept its own allowance.
+    assert await statuses(app, "/private", 1, alice, ip="10.0.0.2") == [429]
+    assert await statuses(app, "/public", 1) == [200]
+
+
+async def test_unauthenticated_requests_are_limited_per_address(app, signer):
+    assert await statuses(app, "/public", 2) == [200, 200]
+    # A token the route never verifies does not buy a bucket of its own.
+    assert await statuses(app, "/public", 1, signer("alice")) == [429]
+    assert await statuses(app, "/public", 3, ip="10.0.0.2") == [200, 200, 429]
+    # Nor does one that fails verification, on a route that checks it.
+    assert await statuses(app, "/private", 1, "not a token") == [401]
@@ -0,0 +1,178 @@
+import copy
+import io
+from uuid import uuid4
+
+import pytest
+
+from src.dependencies import new_session
+from src.services.locations import LocationService
+
+pytestmark = pytest.mark.anyio
+
+LOCATION = {
+    "address": "1 Main St",
+    "city": "Springfield",
+    "state": "IL",
+    "country_code": "US",
+    "lat": 39.78,
+    "lng": -89.65,
+}
+
+
+async def test_create_and_get_location(client, max_queries):
+    with max_queries(1):
+        created = await client.post("/api/v1/locations/", json=LOCATION)
+    assert created.status_code == 201
+    location = created.json()["data"]
+    assert location["id"].startswith("loc_")
+
+    with max_queries(1):
+        response = await client.get(f"/api/v1/locations/{location['id']}")
+    assert response.status_code == 200
+    fetched = response.json()["data"]
+    assert fetched["address"] == LOCATION["address"]
+    assert fetched["created_at"].endswith("Z")
+    assert {key: value for key, value in location.items() if key != "links"} == {
+        key: value for key, value in fetched.items() if key in location and key != "links"
+    }
+
+
+async def test_max_queries_fails_requests_over_budget(client, max_queries):
+    await client.post("/api/v1/locations/", json=LOCATION)
+    with pytest.raises(AssertionError, match="Query budget of 0 exceeded"):
+        with max_queries(0):
+            await client.get("/api/v1/locations/")
+
+
+async def test_nearby_locations_are_nearest_first(client, create):
+    near = await create("locations", address="near", lat=0.0, lng=0.01)
+    far = await create("locations", address="far", lat=0.0, lng=0.1)
+    await create("locations", address="out of range", lat=5.0, lng=5.0)
+
+    response = await client.get(
+        "/api/v1/locations/nearby", params={"lat": 0, "lng": 0, "radius_km": 50}
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert [location["id"] for location in body["data"]] == [near["id"], far["id"]]
+    assert body["total"] == 2
+
+
+@pytest.mark.parametrize("resource", ["locations", "billboards"])
+async def test_nearby_search_over_too_many_candidates_is_ranked_by_the_database(
+    client, create, monkeypatch, resource
+):
+    # Ties at 0.02 and 0.03 degrees cross the page boundaries; the last point is out of range.
+    for lng in (0.03, 0.01, 0.02, 0.03, 0.0, 0.02, 0.6):
+        location = await create("locations", lat=0.0, lng=lng)
+        if resource == "billboards":
+            await create("billboards", location_id=location["id"])
+
+    async def pages():
+        bodies = []
+        for offset in (0, 2, 4, 6, 8):
+            response = await client.get(
+                f"/api/v1/{resource}/nearby",
+                params={"lat": 0, "lng": 0, "radius_km": 50, "offset": offset, "limit": 2},
+            )
+            assert response.status_code == 200, response.text
+            bodies.append(response.json())
+        return bodies
+
+    in_memory = await pages()
+    monkeypatch.setenv("NEARBY_MAX_CANDIDATES", "2")
+    in_database = await pages()
+
+    assert in_database == in_memory
+    assert [len(body["data"]) for body in in_memory] == [2, 2, 2, 0, 0]
+    assert {body["total"] for body in in_memory} == {6}
+    items = [item for body in in_memory for item in body["data"]]
+    assert [item["distance_km"] for item in items] == sorted(item["distance_km"] for item in items)
+    assert len({item["id"] for item in items}) == 6
+
+
+def locations_csv(rows):
+    lines = ["address,city,state,country_code,lat,lng"] + [
+        f"{n} Main St,Springfield,IL,US,{lat},-89.65" for n, lat in rows
+    ]
+    return ("\n".join(lines) + "\n").encode()
+
+
+async def test_bulk_load_reports_bad_rows_and_loads_the_rest(client, monkeypatch):
+    monkeypatch.setenv("LOCATIONS_BULK_BATCH_SIZE", "2")
+    upload = {
+        "file": (
+            "locations.csv",
+            locations_csv([(1, 39.7), (2, 91), (3, 39.8), (4, 39.9), (5, "x")]),
+            "text/csv",
+        )
+    }
+    report = (await client.post("/api/v1/locations/bulk_load", files=upload)).json()["data"]
+    assert (report["rows"], report["created"], report["error_count"]) == (5, 3, 2)
+    assert [error.split(":")[0] for error in report["errors"]] == ["Row 3", "Row 6"]
+
+    report = (await client.post("/api/v1/locations/bulk_load?strict=true", files=upload)).json()[
+        "data"
+    ]
+    assert (report["created"], report["locations"], report["error_count"]) == (0, [], 2)
+    assert len((await client.get("/api/v1/locations/?limit=100")).json()["data"]) == 3
+
+
+async def test_bulk_load_resumes_from_its_checkpoint(client, monkeypatch):
+    # As a job that stopped after its first batch and is run again: the first rows are skipped,
+    # and a batch loaded without being checkpointed is not loaded twice.
+    monkeypatch.setenv("LOCATIONS_BULK_BATCH_SIZE", "2")
+    csv_file = locations_csv([(n, 39.7) for n in range(1, 6)])
+    namespace, reports = uuid4(), []
+
+    async def on_progress(report):
+        reports.append(copy.deepcopy(report))
+
+    async with new_session() as session:
+        await LocationService(session).bulk_load_locations_from_csv(
+            io.BytesIO(csv_file), False, None, namespace, on_progress
+        )
+    assert [report["rows"] for report in reports] == [2, 4, 5]
+
+    async with new_session() as session:
+        report = await LocationService(session).bulk_load_locations_from_csv(
+            io.BytesIO(csv_file), False, reports[0], namespace
+        )
+    assert (report["rows"], report["created"], report["error_count"]) == (5, 5, 0)
+    assert len((await client.get("/api/v1/locations/?limit=100")).json()["data"]) == 5
+
+
+async def test_batch_applies_a_repeated_id_once(client, create):
+    # all_or_nothing: the repeat is reported, not refused.
+    first, second = await create("locations"), await create("locations", address="2 Main St")
+    items = [
+        {"id": first["id"], "city": "Chicago"},
+        {"id": first["id"], "city": "Peoria"},
+        {"id": second["id"], "city": "Chicago"},
+    ]
+    response = await client.patch("/api/v1/locations/batch", json={"items": items})
+    assert response.status_code == 200, response.text
+    report = response.json()["data"]
+    assert report["updated"] == 2
+    assert [result["status"] for result in report["results"]] == ["updated", "duplicate", "updated"]
+    assert (await client.get(f"/api/v1/locations/{first['id']}")).json()["data"][
+        "city"
+    ] == "Chicago"
+
+    response = await client.request(
+        "DELETE",
+        "/api/v1/locations/batch",
+        json={"ids": [second["id"], second["id"], "loc_missing"]},
+    )
+    assert response.status_code == 409
+    assert [result["status"] for result in response.json()["detail"]["results"]] == [
+        "skipped",
+        "duplicate",
+        "not_found",
+    ]
+
+    response = await client.request(
+        "DELETE", "/api/v1/locations/batch", json={"ids": [second["id"], second["id"]]}
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["data"]["deleted"] == 1
@@ -0,0 +1,56 @@
+import re
+
+import httpx
+import pytest
+
+from src.main import app
+
+pytestmark = pytest.mark.anyio
+
+
+async def scrape(client_host="127.0.0.1", **headers):
+    transport = httpx.ASGITransport(app=app, client=(client_host, 1234))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        return await http.get("/metrics", headers=headers)
+
+
+def sample(body, name, **labels):
+    # The value of one series, 0 if it has not been observed yet.
+    pattern = re.escape(name + "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}")
+    match = re.search(rf"^{pattern} (\S+)$", body, re.MULTILINE)
+    return float(match.group(1)) if match else 0
+
+
+async def test_a_request_is_counted_under_its_route_template(client, create):
+    location = await create("locations")
+    series = {"method": "GET", "route": "/api/v1/locations/{id}", "status": "200"}
+    before = (await scrape()).text
+
+    response = await client.get(f"/api/v1/locations/{location['id']}")
+    assert response.status_code == 200, response.text
+
+    after = (await scrape()).text
+    name = "http_request_duration_seconds_count"
+    assert sample(after, name, **series) == sample(before, name, **series) + 1
+    queries = {"method": "GET", "route": "/api/v1/locations/{id}"}
+    name = "http_request_db_queries_count"
+    assert sample(after, name, **queries) == sample(before, name, **queries) + 1
+    assert location["id"] not in after
+
+
+async def test_without_a_token_only_local_clients_are_answered():
+    assert (await scrape()).status_code == 200
+    assert (await scrape("::1")).status_code == 200
+    assert (await scrape("203.0.113.5")).status_code == 403
+    assert (await scrape("10.0.0.7")).status_code == 403
+
+
+async def test_with_a_token_every_scrape_must_present_it(monkeypatch):
+    monkeypatch.setenv("METRICS_TOKEN", "s3cret")
+
+    assert (await scrape()).status_code == 401
+    assert (await scrape(Authorization="Bearer wrong")).status_code == 401
+    assert (await scrape(Authorization="Basic s3cret")).status_code == 401
+    response = await scrape("203.0.113.5", Authorization="Bearer s3cret")
+    assert response.status_code == 200
+    assert "http_request_duration_seconds" in response.text
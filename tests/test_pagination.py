@@ -0,0 +1,82 @@
+import base64
+import json
+
+import pytest
+from sqlalchemy import text
+
+from src.dependencies import get_db_engine
+
+pytestmark = pytest.mark.anyio
+
+RESOURCES = ["locations", "billboards", "campaigns"]
+
+
+def cursor_of(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+async def create_many(create, resource, count):
+    location = await create("locations") if resource == "billboards" else None
+    fields = {"location_id": location["id"]} if location else {}
+    return [(await create(resource, **fields))["id"] for _ in range(count)]
+
+
+async def walk(client, path, limit):
+    # Every page from the first, as lists of ids, and the next_cursor of the last one.
+    pages, cursor = [], ""
+    while cursor is not None:
+        response = await client.get(path, params={"cursor": cursor, "limit": limit})
+        assert response.status_code == 200, response.text
+        body = response.json()
+        pages.append([item["id"] for item in body["data"]])
+        cursor = body["next_cursor"]
+        assert len(pages) <= 10, "pagination does not end"
+    return pages
+
+
+@pytest.mark.parametrize("resource", RESOURCES)
+async def test_rows_sharing_created_at_are_paged_by_id(client, create, resource):
+    ids = await create_many(create, resource, 5)
+    async with get_db_engine().begin() as connection:
+        await connection.execute(text(f"UPDATE {resource} SET created_at = '2030-01-01T00:00Z'"))
+
+    pages = await walk(client, f"/api/v1/{resource}/", limit=2)
+
+    # Each page cuts inside the tie; no row is skipped or repeated across the cuts.
+    assert pages == [sorted(ids)[:2], sorted(ids)[2:4], sorted(ids)[4:]]
+
+
+@pytest.mark.parametrize("resource", RESOURCES)
+async def test_last_page_has_no_next_cursor(client, create, resource):
+    ids = await create_many(create, resource, 4)
+
+    pages = await walk(client, f"/api/v1/{resource}/", limit=2)
+
+    # Exactly two full pages: the second one already knows nothing follows.
+    assert pages == [ids[:2], ids[2:]]
+
+
+@pytest.mark.parametrize("resource", RESOURCES)
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not a cursor",
+        "Zm9v",  # "foo"
+        "ñ",
+        cursor_of({"created_at": "2030-01-01T00:00:00+00:00"}),
+        cursor_of(["yesterday", "loc_1"]),
+        cursor_of(["2030-01-01T00:00:00+00:00", "loc_1", "extra"]),
+        # Decodable, but the query would choke on them or read them as something else.
+        cursor_of(["2030-01-01T00:00:00", "loc_1"]),
+        cursor_of(["0001-01-01T00:00:00+14:00", "loc_1"]),
+        cursor_of(["2030-01-01T00:00:00+00:00", "loc\u0000_1"]),
+        cursor_of(["2030-01-01T00:00:00+00:00", None]),
+    ],
+)
+async def test_malformed_cursor_is_a_bad_request(client, create, resource, cursor):
+    await create_many(create, resource, 1)
+
+    response = await client.get(f"/api/v1/{resource}/", params={"cursor": cursor})
+
+    assert response.status_code == 400, response.text
+    assert "Invalid cursor" in response.json()["detail"]
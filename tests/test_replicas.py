@@ -0,0 +1,194 @@
+import os
+import uuid
+from datetime import datetime
+
+import pytest
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.dependencies import get_replica_router
+from src.main import app
+from src.persistence import replicas as replicas_module
+from src.persistence.replicas import ReplicaRouter, check_replica_setup
+from src.security import get_current_user
+
+pytestmark = pytest.mark.anyio
+
+LOCATION = {"city": "Springfield", "state": "IL", "country_code": "US", "lat": 39.78, "lng": -89.65}
+
+
+@pytest.fixture
+async def engines(database_url):
+    # The test database stands in for the primary and, through an engine of its own, for a
+    # replica: it is not in recovery, so it is never behind.
+    primary = create_async_engine(database_url)
+    replica = create_async_engine(database_url)
+    down = create_async_engine(
+        "postgresql+asyncpg://postgres@127.0.0.1:1/down", connect_args={"timeout": 1}
+    )
+    yield primary, replica, down
+    for engine in (primary, replica, down):
+        await engine.dispose()
+
+
+def router_for(*engines):
+    return ReplicaRouter(list(engines), max_lag=5, sticky_seconds=10, check_interval=5, timeout=1)
+
+
+async def test_read_session_connects_at_its_first_statement(engines):
+    primary, replica, _ = engines
+    router = router_for(replica)
+    await router.check()
+
+    async with await router.read_session("user:reader", primary) as session:
+        assert replica.pool.checkedout() == 0 and primary.pool.checkedout() == 0
+        assert (await session.exec(text("SELECT 1"))).scalar() == 1
+        assert replica.pool.checkedout() == 1 and primary.pool.checkedout() == 0
+    assert router.reads["replica"] == 1
+
+
+async def test_read_session_falls_back_to_the_primary_when_the_replica_fails_to_connect(engines):
+    primary, _, down = engines
+    router = router_for(down)
+    # As if it went down since the last probe.
+    router.replicas[0].available = True
+
+    async with await router.read_session("user:reader", primary) as session:
+        assert (await session.exec(text("SELECT 1"))).scalar() == 1
+        assert primary.pool.checkedout() == 1
+    assert not router.replicas[0].available
+    assert router.reads == {
+        "replica": 0,
+        "primary_after_write": 0,
+        "primary_unavailable": 0,
+        "primary_connect_failed": 1,
+    }
+    assert await router.read_session("user:reader", primary) is None
+
+
+@pytest.fixture
+async def replicated(client, replica_database_url, monkeypatch):
+    # The app with a second database as its replica, so every response tells which one it read:
+    # the primary's locations are written through the API, the replica's straight into it.
+    # Requests name their user in X-User, and X-Role if not an ordinary one.
+    def current_user(request: Request):
+        request.state.user = {
+            "sub": request.headers.get("x-user", "writer"),
+            "role": request.headers.get("x-role", "authenticated"),
+        }
+        return request.state.user
+
+    app.dependency_overrides[get_current_user] = current_user
+    monkeypatch.setenv("READ_REPLICA_URLS", replica_database_url)
+    if os.getenv("TEST_REDIS_URL"):
+        monkeypatch.setenv("REDIS_URL", os.environ["TEST_REDIS_URL"])
+    get_replica_router.cache_clear()
+    router = get_replica_router()
+    await router.check()
+    replica = router.replicas[0]
+    async with replica.engine.begin() as connection:
+        await connection.execute(
+            text(
+                "INSERT INTO locations "
+                "(id, address, city, state, country_code, lat, lng, created_at, is_deleted) "
+                "VALUES ('loc_replica', 'On the replica', 'Springfield', 'IL', 'US', "
+                "39.78, -89.65, :now, false)"
+            ),
+            {"now": datetime.utcnow()},
+        )
+    yield router
+    async with replica.engine.begin() as connection:
+        await connection.execute(text("TRUNCATE locations CASCADE"))
+    await replica.engine.dispose()
+    if router.redis is not None:
+        await router.redis.aclose()
+    get_replica_router.cache_clear()
+
+
+async def addresses(client, user):
+    response = await client.get("/api/v1/locations/", headers={"x-user": user})
+    assert response.status_code == 200, response.text
+    return [location["address"] for location in response.json()["data"]]
+
+
+async def test_reads_go_to_the_replica_until_the_client_writes(client, replicated):
+    assert replicated.replicas[0].available
+    assert await addresses(client, "reader") == ["On the replica"]
+
+    response = await client.post(
+        "/api/v1/locations/",
+        json={**LOCATION, "address": "On the primary"},
+        headers={"x-user": "writer"},
+    )
+    assert response.status_code == 201, response.text
+    assert await addresses(client, "writer") == ["On the primary"]
+    assert await addresses(client, "reader") == ["On the replica"]
+    assert replicated.reads == {
+        "replica": 2,
+        "primary_after_write": 1,
+        "primary_unavailable": 0,
+        "primary_connect_failed": 0,
+    }
+
+    # Each engine's pool reports its own checkouts.
+    response = await client.get(
+        "/api/v1/internal/pool", headers={"x-user": "operator", "x-role": "service_role"}
+    )
+    pools = response.json()["data"]
+    assert [pool["name"] for pool in pools] == ["primary", replicated.replicas[0].name]
+    assert all(pool["checkouts"] > 0 for pool in pools)
+    metrics = (await client.get("/metrics")).text
+    assert 'db_pool_checkout_wait_seconds_count{pool="primary"}' in metrics
+    name, checkouts = pools[1]["name"], pools[1]["checkouts"]
+    assert f'db_pool_checkout_wait_seconds_count{{pool="{name}"}} {checkouts}' in metrics
+
+
+async def test_a_lagging_replica_gets_no_reads_until_it_catches_up(client, replicated, monkeypatch):
+    for lag in ("SELECT 60::float8", "SELECT NULL::float8"):
+        monkeypatch.setattr(replicas_module, "LAG_QUERY", text(lag))
+        await replicated.check()
+        assert not replicated.replicas[0].available
+        assert await addresses(client, "reader") == []
+    monkeypatch.setattr(replicas_module, "LAG_QUERY", text("SELECT 1::float8"))
+    await replicated.check()
+    assert replicated.replicas[0].lag_seconds == 1
+    assert await addresses(client, "reader") == ["On the replica"]
+    assert replicated.reads["primary_unavailable"] == 2
+
+
+async def test_a_write_through_one_worker_sticks_in_the_others(engines):
+    # Two routers sharing Redis, as two worker processes would.
+    url = os.getenv("TEST_REDIS_URL")
+    if not url:
+        pytest.skip("TEST_REDIS_URL is not set")
+    primary, replica, _ = engines
+    workers = [
+        ReplicaRouter(
+            [replica], max_lag=5, sticky_seconds=1, check_interval=5, timeout=1, redis_url=url
+        )
+        for _ in range(2)
+    ]
+    for worker in workers:
+        await worker.check()
+    writer = f"user:{uuid.uuid4()}"
+
+    await workers[0].mark_write(writer)
+    assert await workers[1].read_session(writer, primary) is None
+    assert workers[1].reads["primary_after_write"] == 1
+    assert await workers[1].read_session("user:reader", primary) is not None
+    # The marker expires with sticky_seconds.
+    assert 0 < await workers[1].redis.pttl(f"{workers[1].prefix}:{writer}") <= 1000
+    for worker in workers:
+        await worker.redis.aclose()
+
+
+def test_several_workers_with_replicas_need_redis(monkeypatch):
+    engine = create_async_engine("postgresql+asyncpg://postgres@127.0.0.1:1/replica")
+    monkeypatch.setenv("WEB_CONCURRENCY", "2")
+    with pytest.raises(RuntimeError, match="need Redis"):
+        check_replica_setup(router_for(engine))
+    check_replica_setup(ReplicaRouter([engine], 5, 10, 5, 1, redis_url="redis://127.0.0.1:1"))
+    check_replica_setup(router_for())
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+    check_replica_setup(router_for(engine))
@@ -0,0 +1,86 @@
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from src.security import JWTVerifier, TokenVerificationUnavailable
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def key_pair():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+    return private_key, {**jwk, "kid": "test-key", "alg": "RS256", "use": "sig"}
+
+
+def sign(private_key, kid: str = "test-key", expires_in: float = 3600, **claims) -> str:
+    payload = {
+        "sub": "user-1",
+        "aud": "authenticated",
+        "exp": int(time.time() + expires_in),
+        **claims,
+    }
+    return jwt.encode(payload, private_key, algorithm="RS256", headers={"kid": kid})
+
+
+def verifier_with_clock(**kwargs):
+    verifier = JWTVerifier(**kwargs)
+    clock = Clock()
+    verifier.claims_cache.timer = clock
+    return verifier, clock
+
+
+@pytest.mark.anyio
+async def test_verifies_token_signed_with_a_local_key(key_pair):
+    private_key, jwk = key_pair
+    verifier = JWTVerifier(jwks={"keys": [jwk]})
+    claims = await verifier.verify(sign(private_key))
+    assert claims["sub"] == "user-1"
+
+
+@pytest.mark.anyio
+async def test_rejects_token_with_unknown_kid(key_pair):
+    private_key, jwk = key_pair
+    verifier = JWTVerifier(jwks={"keys": [jwk]})
+    with pytest.raises(TokenVerificationUnavailable):
+        await verifier.verify(sign(private_key, kid="rotated"))
+
+
+def test_remote_claims_expire_with_the_token(key_pair):
+    private_key, _ = key_pair
+    verifier, clock = verifier_with_clock(cache_ttl=300)
+    token = sign(private_key, expires_in=60)
+    verifier.remember(token, {"sub": "user-1"})
+    key = verifier._cache_key(token)
+
+    clock.now = 55
+    assert verifier.claims_cache.get(key) == {"sub": "user-1"}
+    clock.now = 61
+    assert verifier.claims_cache.get(key) is None
+
+
+def test_remote_claims_never_outlive_the_cache_ttl(key_pair):
+    private_key, _ = key_pair
+    verifier, clock = verifier_with_clock(cache_ttl=30)
+    token = sign(private_key, expires_in=3600)
+    verifier.remember(token, {"sub": "user-1"})
+
+    clock.now = 31
+    assert verifier.claims_cache.get(verifier._cache_key(token)) is None
+
+
+def test_remote_claims_of_an_expired_token_are_not_cached(key_pair):
+    private_key, _ = key_pair
+    verifier, _ = verifier_with_clock()
+    token = sign(private_key, expires_in=-10)
+    verifier.remember(token, {"sub": "user-1"})
+    assert len(verifier.claims_cache) == 0
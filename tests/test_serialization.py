@@ -0,0 +1,178 @@
+from typing import Any, Dict, List
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+
+from src.dependencies import new_session
+from src.domain.models.billboards import Billboard, BillboardLocationInfo, NearbyBillboard
+from src.domain.models.campaigns import Campaign
+from src.domain.models.common import HATEOASLinkObject, HATEOASLinks
+from src.domain.models.locations import NearbyLocation
+from src.persistence.models import Billboard as BillboardDB
+from src.persistence.models import Campaign as CampaignDB
+from src.persistence.models import Location as LocationDB
+
+pytestmark = pytest.mark.anyio
+
+# The row path must answer byte for byte what the Pydantic models did when routes returned them
+# under response_model=Dict[str, Any]. These build the models as the services used to.
+
+
+def model_link(name: str, method: str, href: str) -> HATEOASLinkObject:
+    return HATEOASLinkObject(name=name, method=method, href=href)
+
+
+def billboard_model(
+    bill: BillboardDB, actions: List[HATEOASLinkObject], model=Billboard, **extra
+) -> Billboard:
+    location = bill.location
+    return model(
+        **bill.dict(),
+        location=BillboardLocationInfo(
+            address=location.address,
+            city=location.city,
+            state=location.state,
+            country_code=location.country_code,
+            lat=location.lat,
+            lng=location.lng,
+        ),
+        links=HATEOASLinks(
+            self=model_link("self", "GET", f"/api/v1/billboards/{bill.id}"),
+            actions=actions,
+            related=[model_link("location", "GET", f"/api/v1/locations/{bill.location_id}")],
+        ),
+        **extra,
+    )
+
+
+def campaign_model(camp: CampaignDB, bills: List[BillboardDB], detail: bool) -> Campaign:
+    billboards = []
+    for bill in bills:
+        actions = [
+            model_link(
+                "remove_from_campaign", "POST", f"/api/v1/campaigns/{camp.id}/remove/{bill.id}"
+            )
+        ]
+        if detail:
+            actions.insert(
+                0, model_link("search_billboards", "GET", f"/api/v1/availability/{bill.id}")
+            )
+        billboards.append(billboard_model(bill, actions))
+    days = (camp.end_date - camp.start_date).days + 1
+    return Campaign(
+        **camp.dict(),
+        billboards=billboards,
+        total_dollar_amount=sum(bill.dollars_per_day * days for bill in bills),
+        links=HATEOASLinks(
+            self=model_link("self", "GET", f"/api/v1/campaigns/{camp.id}"),
+            actions=[
+                model_link("search_billboards", "GET", f"/api/v1/availability/{camp.id}"),
+                model_link("update", "PATCH", f"/api/v1/campaigns/{camp.id}"),
+                model_link("delete", "DELETE", f"/api/v1/campaigns/{camp.id}"),
+            ],
+        ),
+    )
+
+
+async def model_path_body(content: Dict[str, Any]) -> bytes:
+    app = FastAPI()
+
+    @app.get("/", response_model=Dict[str, Any])
+    async def route():
+        return content
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        return (await http.get("/")).content
+
+
+async def test_row_path_matches_the_model_path_byte_for_byte(client, create):
+    # Floats orjson spells differently from repr, non-ASCII text and UTC datetimes.
+    location = await create("locations", address="Plaza Ñandú 1", lat=1e-05, lng=-89.65)
+    billboard_ids = [
+        (await create("billboards", location_id=location["id"], **fields))["id"]
+        for fields in (
+            {"width_mt": 1e16, "height_mt": 0.5, "dollars_per_day": 1e-05},
+            {"width_mt": 10, "height_mt": 5, "dollars_per_day": 123.456},
+        )
+    ]
+    booked = await create("campaigns", name="Campaña")
+    await create("campaigns", name="Empty", start_date="2031-01-01", end_date="2031-01-31")
+    response = await client.post(
+        f"/api/v1/campaigns/{booked['id']}/billboards", json={"billboard_ids": billboard_ids}
+    )
+    assert response.status_code == 200, response.text
+
+    campaigns = await client.get("/api/v1/campaigns/")
+    detail = await client.get(f"/api/v1/campaigns/{booked['id']}")
+    billboards = await client.get("/api/v1/billboards/")
+
+    async with new_session() as session:
+        by_id = {
+            bill.id: bill
+            for bill in (
+                await session.exec(select(BillboardDB).options(selectinload(BillboardDB.location)))
+            ).all()
+        }
+        camps = {camp.id: camp for camp in (await session.exec(select(CampaignDB))).all()}
+
+        def bills_of(campaign: Dict[str, Any]) -> List[BillboardDB]:
+            return [by_id[billboard["id"]] for billboard in campaign["billboards"]]
+
+        expected_campaigns = [
+            campaign_model(camps[campaign["id"]], bills_of(campaign), detail=False)
+            for campaign in campaigns.json()["data"]
+        ]
+        expected_detail = campaign_model(camps[booked["id"]], bills_of(detail.json()["data"]), True)
+        expected_billboards = [
+            billboard_model(
+                by_id[billboard["id"]],
+                [
+                    model_link("update", "PATCH", f"/api/v1/billboards/{billboard['id']}"),
+                    model_link("delete", "DELETE", f"/api/v1/billboards/{billboard['id']}"),
+                ],
+            )
+            for billboard in billboards.json()["data"]
+        ]
+
+    assert len(expected_campaigns) == 2 and len(expected_billboards) == 2
+    assert campaigns.content == await model_path_body({"data": expected_campaigns})
+    assert detail.content == await model_path_body({"data": expected_detail})
+    assert billboards.content == await model_path_body({"data": expected_billboards})
+
+
+async def test_nearby_rows_match_the_nearby_models_byte_for_byte(client, create):
+    location = await create("locations", address="Plaza Ñandú 1", lat=1e-05, lng=0.01)
+    await create("billboards", location_id=location["id"], width_mt=1e16, dollars_per_day=1e-05)
+    params = {"lat": 0, "lng": 0, "radius_km": 50}
+
+    locations = await client.get("/api/v1/locations/nearby", params=params)
+    billboards = await client.get("/api/v1/billboards/nearby", params=params)
+
+    [nearby_location], [nearby_billboard] = locations.json()["data"], billboards.json()["data"]
+    async with new_session() as session:
+        loc = await session.get(LocationDB, location["id"])
+        bill = (
+            await session.exec(select(BillboardDB).options(selectinload(BillboardDB.location)))
+        ).one()
+        expected_location = NearbyLocation(
+            **loc.dict(),
+            links=HATEOASLinks(self=model_link("self", "GET", f"/api/v1/locations/{loc.id}")),
+            distance_km=nearby_location["distance_km"],
+        )
+        expected_billboard = billboard_model(
+            bill,
+            [
+                model_link("update", "PATCH", f"/api/v1/billboards/{bill.id}"),
+                model_link("delete", "DELETE", f"/api/v1/billboards/{bill.id}"),
+            ],
+            model=NearbyBillboard,
+            distance_km=nearby_billboard["distance_km"],
+        )
+
+    assert nearby_location["distance_km"] == 1.112
+    assert locations.content == await model_path_body({"data": [expected_location], "total": 1})
+    assert billboards.content == await model_path_body({"data": [expected_billboard], "total": 1})
@@ -0,0 +1,53 @@
+import pytest
+from sqlalchemy import func, select
+
+from src.dependencies import new_session
+from src.persistence.models import Location
+from src.persistence.repositories import LocationRepository
+from src.persistence.transactions import unit_of_work
+
+pytestmark = pytest.mark.anyio
+
+
+def new_location(id):
+    return Location(
+        id=id,
+        address="1 Main St",
+        city="Springfield",
+        state="IL",
+        country_code="US",
+        lat=39.78,
+        lng=-89.65,
+    )
+
+
+async def committed_locations():
+    # Seen from another session, so only what was committed counts.
+    async with new_session() as session:
+        return (await session.exec(select(func.count()).select_from(Location))).scalar()
+
+
+async def test_nested_unit_of_work_commits_with_the_outermost(client):
+    async with new_session() as session:
+        repository = LocationRepository(Location, session)
+        async with unit_of_work(session):
+            await repository.create(new_location("loc_outer"))
+            async with unit_of_work(session):
+                await repository.create(new_location("loc_inner"))
+            await session.flush()
+            assert await committed_locations() == 0
+        assert await committed_locations() == 2
+
+
+async def test_failure_after_a_nested_unit_of_work_rolls_it_back(client):
+    async with new_session() as session:
+        repository = LocationRepository(Location, session)
+        with pytest.raises(RuntimeError):
+            async with unit_of_work(session):
+                async with unit_of_work(session):
+                    await repository.create(new_location("loc_inner"))
+                raise RuntimeError("outer step failed")
+        assert await committed_locations() == 0
+        # The session is usable again, and its writes commit on their own outside a unit.
+        await repository.create(new_location("loc_after"))
+    assert await committed_locations() == 1